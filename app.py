@@ -1,34 +1,49 @@
+import functools
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+_rerun_started = time.perf_counter()
+_rerun_done = False
+_trace = []  # (section, seconds) of this script run, see trace_section
+
 import streamlit as st
 import pandas as pd
 import plotly.express as px
 
+import charts
+import metrics
+import snapshot
+import warmer
+from config_async import gather_frames
 from config import (
     fetch_students,
+    fetch_student_options,
+    fetch_student_profile,
     fetch_instructors,
     fetch_presentations,
-    fetch_enrollment,
     fetch_assessments,
-    fetch_student_scores,
-    fetch_vle_activity,
     fetch_enrollments_all,
+    fetch_enrollment_counts,
     fetch_final_scores_all,
-    fetch_final_results_distribution,
     fetch_total_clicks_all,
     fetch_vle_avg_timeline_by_presentation,
-    fetch_assessment_scores_by_enrollment,
+    fetch_vle_weekly_by_type,
     fetch_students_by_module_counts,
-    ping_db,
+    fetch_summary_status,
+    fetch_final_score_box,
+    fetch_engagement_score_corr,
+    fetch_enrollment_trend,
+    coalesce_stats,
+    memory_report,
+    router,
+    CLASS_PAGE_FETCHES,
 )
 
 st.set_page_config(page_title="VLE Dashboard", layout="wide")
 
 st.title("📘 VLE Dashboard")
-try:
-    ok = ping_db()
-    if not ok:
-        st.warning("Database not reachable. Check secrets `DATABASE_URL` or `[db].url`.")
-except Exception as e:
-    st.error(f"DB init error: {e}")
 
 """
 I'll simplify and fix the dark styling to ensure readability.
@@ -71,52 +86,219 @@ UK_PALETTE = ["#1f3c88", "#e63946", "#f5f7fa", "#14213d", "#2a9d8f"]
 sidebar = st.sidebar
 page = sidebar.selectbox("Select Page", ["Overview", "Classes", "Students", "Analytics", "Instructors"])
 
+# Snapshot mode: serve bootstrap/whole-table data from local Arrow files and
+# keep them fresh from a background thread (one per process)
+@st.cache_resource
+def start_snapshot_refresher():
+    return snapshot.start_refresher()
+
+if snapshot.SNAPSHOT_DIR:
+    start_snapshot_refresher()
+
+# Metrics export (Prometheus text / JSON) on METRICS_PORT, one server per process
+@st.cache_resource
+def start_metrics_server():
+    return metrics.start_http_server()
+
+if metrics.METRICS_PORT:
+    start_metrics_server()
+
+CACHE_TTL = 300
+_warming = threading.local()  # set on the warmer thread while it fills an entry
+
+def cache_window(ahead=0):
+    # Windowed entries are keyed by the CACHE_TTL window they were computed
+    # for, so the warmer can fill the next window before it starts (warmer.py)
+    return int((time.time() + ahead) // CACHE_TTL)
+
+def cached(fn=None, *, windowed=False):
+    # st.cache_data(ttl=CACHE_TTL) that also counts calls and misses for
+    # metrics.py. windowed=True is only for what warmer.py fills: entries are
+    # keyed by cache_window() and live two windows, so one warmed ahead of
+    # time still covers its whole window; .warm() fills them.
+    if fn is None:
+        return functools.partial(cached, windowed=windowed)
+    name = fn.__name__
+
+    @functools.wraps(fn)
+    def on_miss(*args, **kwargs):
+        if getattr(_warming, "active", False):
+            metrics.record_cache_warm(name)
+        else:
+            metrics.record_cache_miss(name)
+        return fn(*args[1:] if windowed else args, **kwargs)
+
+    inner = st.cache_data(ttl=2 * CACHE_TTL if windowed else CACHE_TTL)(on_miss)
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        metrics.record_cache_call(name)
+        if windowed:
+            return inner(cache_window(), *args, **kwargs)
+        return inner(*args, **kwargs)
+
+    wrapper.clear = inner.clear
+    if windowed:
+        def warm(*args, ahead=0, **kwargs):
+            # Fill the entry users will hit `ahead` seconds from now
+            _warming.active = True
+            try:
+                return inner(cache_window(ahead), *args, **kwargs)
+            finally:
+                _warming.active = False
+        wrapper.warm = warm
+    return wrapper
+
+@contextmanager
+def trace_section(name):
+    # Wall time of one part of this script run, for the debug panel trace
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _trace.append((name, time.perf_counter() - started))
+
+def fragment(name):
+    # st.fragment traced like a section. A widget change inside it reruns
+    # only this function, with this run's globals (_rerun_done is then True),
+    # so that run is recorded on its own as rerun "<page>/<name>".
+    def decorate(fn):
+        @st.fragment
+        @functools.wraps(fn)
+        def run(*args, **kwargs):
+            if not _rerun_done:
+                with trace_section(name):
+                    return fn(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                seconds = time.perf_counter() - started
+                metrics.record_rerun(f"{page}/{name}", seconds)
+                metrics.record_trace(page, "fragment", seconds, [(name, seconds)])
+        return run
+    return decorate
+
 # Cache wrappers to speed up UI (5 minutes)
-@st.cache_data(ttl=300)
+@cached
 def c_fetch_students():
     return fetch_students()
 
-@st.cache_data(ttl=300)
+@cached(windowed=warmer.WARM_CACHE)
 def c_fetch_presentations():
     return fetch_presentations()
 
-@st.cache_data(ttl=300)
-def c_fetch_enrollment(pres_id: int):
-    return fetch_enrollment(pres_id)
-
-@st.cache_data(ttl=300)
-def c_fetch_enrollments_all():
-    return fetch_enrollments_all()
-
-@st.cache_data(ttl=300)
-def c_fetch_final_scores_all(pres_id=None):
-    return fetch_final_scores_all(pres_id)
-
-@st.cache_data(ttl=300)
-def c_fetch_final_results_distribution(pres_id: int):
-    return fetch_final_results_distribution(pres_id)
-
-@st.cache_data(ttl=300)
-def c_fetch_total_clicks_all(pres_id=None):
-    return fetch_total_clicks_all(pres_id)
-
-@st.cache_data(ttl=300)
+@cached
+def c_fetch_student_options():
+    return fetch_student_options()
+
+@cached
+def c_fetch_instructors():
+    return fetch_instructors()
+
+# Sidebar filter options change only when presentations are added, so they
+# are cached longer than the data and derived once instead of every rerun
+@st.cache_data(ttl=3600)
+def c_fetch_filter_options():
+    df = c_fetch_presentations()
+    sem_options = (df["semester"].astype(str) + " " + df["year"].astype(str)).unique().tolist()
+    instr_options = sorted(df["instructor_name"].dropna().unique().tolist())
+    return sem_options, instr_options
+
+# `pids` is the tuple of presentation ids selected by the sidebar filters;
+# it is pushed down into SQL so only the filtered rows are transferred
+@cached
+def c_fetch_enrollments_all(pids=None):
+    return fetch_enrollments_all(pids)
+
+@cached
+def c_fetch_enrollment_counts(pids=None):
+    return fetch_enrollment_counts(pids)
+
+@cached
+def c_fetch_final_scores_all(pres_id=None, pids=None):
+    return fetch_final_scores_all(pres_id, pids)
+
+# Classes page: its independent queries are issued concurrently (config_async)
+@cached(windowed=warmer.WARM_CACHE)
+def c_fetch_class_page(pres_id: int):
+    return gather_frames({name: (fn, pres_id) for name, fn in CLASS_PAGE_FETCHES.items()})
+
+# VLE clicks come from rollup tables kept current on ingest, so a cache miss
+# costs one small indexed read instead of re-aggregating the whole history
+@cached(windowed=warmer.WARM_CACHE)
+def c_fetch_total_clicks_all(pres_id=None, pids=None):
+    return fetch_total_clicks_all(pres_id, pids)
+
+@cached(windowed=warmer.WARM_CACHE)
 def c_fetch_vle_avg_timeline_by_presentation(pres_id: int):
     return fetch_vle_avg_timeline_by_presentation(pres_id)
 
-@st.cache_data(ttl=300)
-def c_fetch_assessment_scores_by_enrollment(enr_id: int):
-    return fetch_assessment_scores_by_enrollment(enr_id)
+@cached(windowed=warmer.WARM_CACHE)
+def c_fetch_vle_weekly_by_type(pres_id: int):
+    return fetch_vle_weekly_by_type(pres_id)
 
-@st.cache_data(ttl=300)
+@cached
+def c_fetch_assessments(pres_id: int):
+    return fetch_assessments(pres_id)
+
+
+@cached
 def c_fetch_students_by_module_counts():
     return fetch_students_by_module_counts()
 
-# Now that cache wrappers exist, set up global filters
-df_presentations_all = c_fetch_presentations()
-df_instructors_all = fetch_instructors()
-sem_options = (df_presentations_all["semester"].astype(str) + " " + df_presentations_all["year"].astype(str)).unique().tolist()
-instr_options = sorted(df_presentations_all["instructor_name"].dropna().unique().tolist())
+# Analytics summaries, aggregated in Postgres
+@cached
+def c_fetch_final_score_box(group: str):
+    return fetch_final_score_box(group)
+
+@cached
+def c_fetch_engagement_score_corr(pids=None):
+    return fetch_engagement_score_corr(pids)
+
+@cached
+def c_fetch_enrollment_trend(pids=None):
+    return fetch_enrollment_trend(pids)
+
+@cached
+def c_fetch_summary_status():
+    return fetch_summary_status()
+
+# Cache warmer: keeps the Classes page caches of the most viewed and the
+# current semester's classes warm, one thread per process. Only the wrappers
+# it fills are windowed (see cached); with WARM_CACHE=0 none are.
+def warm_classes(pids, ahead):
+    c_fetch_presentations.warm(ahead=ahead)
+    for pid in pids:
+        c_fetch_class_page.warm(pid, ahead=ahead)
+        c_fetch_total_clicks_all.warm(pid, ahead=ahead)
+        c_fetch_vle_avg_timeline_by_presentation.warm(pid, ahead=ahead)
+        c_fetch_vle_weekly_by_type.warm(pid, ahead=ahead)
+
+def current_semester_pids():
+    df = c_fetch_presentations.warm()
+    if df.empty:
+        return []
+    latest = df.sort_values(["year", "semester"]).iloc[-1]
+    current = df[(df["year"] == latest["year"]) & (df["semester"] == latest["semester"])]
+    return current["presentation_id"].astype(int).tolist()
+
+@st.cache_resource
+def start_cache_warmer():
+    return warmer.start(warm_classes, current_semester_pids, CACHE_TTL)
+
+if warmer.WARM_CACHE:
+    start_cache_warmer()
+
+# Now that cache wrappers exist, set up global filters. This is the first
+# point that may touch the database (config opens its pool lazily).
+with trace_section("bootstrap"):
+    try:
+        df_presentations_all = c_fetch_presentations()
+        sem_options, instr_options = c_fetch_filter_options()
+    except Exception as e:
+        st.error(f"Database not reachable. Check secrets `DATABASE_URL` or `[db].url`. ({e})")
+        st.stop()
 selected_sems = sidebar.multiselect("Filter by Semester", sem_options, default=sem_options)
 selected_instrs = sidebar.multiselect("Filter by Instructor", instr_options, default=instr_options)
 
@@ -132,224 +314,301 @@ def apply_global_filters(df_pres: pd.DataFrame, df_enr: pd.DataFrame):
         df_enr_f = df_enr
     return df_pres_f.drop(columns=["sem_label"]), df_enr_f
 
+# Resolve the sidebar filters to presentation ids once per rerun. None when
+# nothing is filtered out (the default), so queries use their unfiltered
+# variant and cache entry instead of an array of every id
+df_presentations_f, _ = apply_global_filters(df_presentations_all, None)
+selected_pids = tuple(sorted(int(p) for p in df_presentations_f["presentation_id"]))
+if len(selected_pids) == len(df_presentations_all):
+    selected_pids = None
+
 if page == "Overview":
     st.header("Overview / Summary")
-
-    df_students = c_fetch_students()
-    df_presentations = c_fetch_presentations()
-    df_enroll_all = c_fetch_enrollments_all()
-    df_presentations, df_enroll_all = apply_global_filters(df_presentations, df_enroll_all)
-    df_instructors = fetch_instructors()
-
-    st.subheader("Total Users & Entities")
-    col1, col2, col3, col4 = st.columns(4)
-    col1.metric("Students", len(df_students))
-    col2.metric("Classes", len(df_presentations))
-    # module count
-    module_count = df_presentations["module_code"].nunique()
-    col3.metric("Modules", module_count)
-    col4.metric("Instructors", df_instructors.shape[0] if not df_instructors.empty else df_presentations["instructor_name"].nunique())
-
-    c1, c2 = st.columns(2)
-    with c1:
-        st.subheader("Students by Region")
-        fig = px.histogram(df_students, x="region", title="Distribusi Mahasiswa per Region", color_discrete_sequence=UK_PALETTE)
-        st.plotly_chart(fig, use_container_width=True)
-    with c2:
-        st.subheader("Students by Gender")
-        fig2 = px.pie(df_students, names="gender", title="Distribusi Gender Mahasiswa", color_discrete_sequence=UK_PALETTE)
-        st.plotly_chart(fig2, use_container_width=True)
-
-    st.subheader("Students per Module")
-    df_by_mod = fetch_students_by_module_counts()
-    if not df_by_mod.empty:
-        figm = px.bar(df_by_mod, x="module_code", y="student_count", title="Jumlah Mahasiswa per Modul", color_discrete_sequence=UK_PALETTE)
-        st.plotly_chart(figm, use_container_width=True)
-    else:
-        st.info("Belum ada data enrollment untuk menghitung distribusi per modul.")
-
-    st.subheader("Students per Semester")
-    if not df_enroll_all.empty and not df_presentations.empty:
-        df_sem = df_enroll_all.merge(df_presentations[["presentation_id", "semester", "year"]], on="presentation_id", how="left")
-        df_sem["semester_label"] = df_sem["semester"].astype(str) + " " + df_sem["year"].astype(str)
-        sem_counts = df_sem.groupby("semester_label").size().reset_index(name="student_count")
-        fig_sem = px.bar(sem_counts, x="semester_label", y="student_count", title="Jumlah Mahasiswa per Semester", color_discrete_sequence=UK_PALETTE)
-        st.plotly_chart(fig_sem, use_container_width=True)
-
-    st.subheader("Students per Instructor")
-    if not df_enroll_all.empty and not df_presentations.empty:
-        df_instr = df_enroll_all.merge(df_presentations[["presentation_id", "instructor_name"]], on="presentation_id", how="left")
-        instr_counts = df_instr.groupby("instructor_name").size().reset_index(name="student_count")
-        fig_instr = px.bar(instr_counts, x="instructor_name", y="student_count", title="Jumlah Mahasiswa per Dosen", color_discrete_sequence=UK_PALETTE)
-        st.plotly_chart(fig_instr, use_container_width=True)
-
-    st.subheader("Demografi: Usia Mahasiswa")
-    if not df_students.empty and "date_of_birth" in df_students.columns:
-        today = pd.Timestamp.today().normalize()
-        ages = (today - pd.to_datetime(df_students["date_of_birth"]).dt.normalize()).dt.days // 365
-        df_age = pd.DataFrame({"age": ages})
-        a1, a2 = st.columns(2)
-        with a1:
-            st.metric("Median Age", int(df_age["age"].median()))
-        with a2:
-            st.metric("Avg Age", round(float(df_age["age"].mean()), 1))
-        fig_age = px.histogram(df_age, x="age", nbins=15, title="Distribusi Usia Mahasiswa", color_discrete_sequence=UK_PALETTE)
-        st.plotly_chart(fig_age, use_container_width=True)
-
-    st.subheader("Engagement KPI (Global)")
-    df_clicks_all = c_fetch_total_clicks_all()
-    if not df_clicks_all.empty and not df_enroll_all.empty:
-        df_clicks_f = df_clicks_all[df_clicks_all["presentation_id"].isin(df_presentations["presentation_id"])].merge(df_enroll_all[["enrollment_id","student_id"]], on="enrollment_id", how="left")
-        avg_clicks_per_student = df_clicks_f.groupby("student_id")["total_clicks"].sum().mean()
-        total_clicks = int(df_clicks_f["total_clicks"].sum())
-        k1, k2 = st.columns(2)
-        k1.metric("Avg Clicks per Student", round(avg_clicks_per_student, 1))
-        k2.metric("Total Clicks (Filtered)", total_clicks)
-
-elif page == "Classes":
-    st.header("Classes / Presentations")
-    df_pres = c_fetch_presentations()
-    df_pres, _ = apply_global_filters(df_pres, None)
-    sel = st.selectbox("Select a class", df_pres["presentation_id"].astype(str) + " – " + df_pres["module_code"] + " (" + df_pres["semester"].astype(str) + " " + df_pres["year"].astype(str) + ")")
-    pres_id = int(sel.split(" – ")[0])
-
-    df_enroll = c_fetch_enrollment(pres_id)
-    st.subheader("Students in Class")
-    st.dataframe(df_enroll)
-
-    # Jika ada assessment → nilai & distribusi
-    df_scores = []
-    for eid in df_enroll["enrollment_id"]:
-        df = fetch_student_scores(eid)
-        df["enrollment_id"] = eid
-        df_scores.append(df)
-    if df_scores:
-        df_all_scores = pd.concat(df_scores, ignore_index=True)
-        st.subheader("Assessment Scores Distribution")
-        fig3 = px.histogram(df_all_scores, x="score", nbins=20, title="Distribusi Nilai", color_discrete_sequence=UK_PALETTE)
-        st.plotly_chart(fig3)
-
-    # Final score (weighted) per enrollment
-    df_final = c_fetch_final_scores_all(pres_id)
-    if not df_final.empty:
-        # KPI metrics
-        df_clicks_p = c_fetch_total_clicks_all(pres_id)
-        avg_score = round(df_final["final_score"].dropna().mean(), 2) if not df_final.empty else None
-        pass_rate = None
-        if not df_enroll.empty and "final_result" in df_enroll.columns:
-            pass_rate = round(
-                (df_enroll["final_result"].astype(str).str.lower().isin(["pass", "distinction"]).mean()) * 100,
-                1,
-            )
-        total_clicks_avg = round(df_clicks_p["total_clicks"].mean(), 1) if not df_clicks_p.empty else 0
-
-        m1, m2, m3 = st.columns(3)
-        m1.metric("Avg Final Score", avg_score if avg_score is not None else "-")
-        m2.metric("Pass Rate", f"{pass_rate}%" if pass_rate is not None else "-")
-        m3.metric("Avg Total Clicks", total_clicks_avg)
+    with trace_section("overview"):
+
+        df_students = c_fetch_students()
+        df_presentations = df_presentations_f
+        df_counts = c_fetch_enrollment_counts(selected_pids)
+        df_instructors = c_fetch_instructors()
+
+        st.subheader("Total Users & Entities")
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Students", len(df_students))
+        col2.metric("Classes", len(df_presentations))
+        # module count
+        module_count = df_presentations["module_code"].nunique()
+        col3.metric("Modules", module_count)
+        col4.metric("Instructors", df_instructors.shape[0] if not df_instructors.empty else df_presentations["instructor_name"].nunique())
 
         c1, c2 = st.columns(2)
         with c1:
-            st.subheader("Final Scores (Weighted)")
-            f1 = px.histogram(df_final, x="final_score", nbins=20, title="Sebaran Skor Akhir", color_discrete_sequence=UK_PALETTE)
-            st.plotly_chart(f1, use_container_width=True)
+            st.subheader("Students by Region")
+            df_region = df_students["region"].value_counts(sort=False).rename_axis("region").reset_index(name="count")
+            fig = px.bar(df_region, x="region", y="count", title="Distribusi Mahasiswa per Region", color_discrete_sequence=UK_PALETTE)
+            st.plotly_chart(fig, use_container_width=True)
         with c2:
-            st.subheader("Final Result Distribution")
-            df_res = c_fetch_final_results_distribution(pres_id)
-            f2 = px.pie(df_res, names="final_result", values="cnt", title="Final Result", color_discrete_sequence=UK_PALETTE)
-            st.plotly_chart(f2, use_container_width=True)
-
-    # VLE average timeline (by date)
-    df_tl = c_fetch_vle_avg_timeline_by_presentation(pres_id)
-    if not df_tl.empty:
-        st.subheader("Rata-rata Klik VLE per Tanggal")
-        f3 = px.line(df_tl, x="activity_date", y="avg_clicks", markers=True, color_discrete_sequence=UK_PALETTE)
-        st.plotly_chart(f3, use_container_width=True)
-
-    # ================= Assessments Section =================
-    st.subheader("Assessments Overview")
-    df_ass_w = fetch_assessments(pres_id)
-    if not df_ass_w.empty:
-        cA, cB = st.columns(2)
-        with cA:
-            donut = px.pie(df_ass_w, names="assessment_name", values="weight", hole=0.5,
-                           title="Komposisi Bobot Assessment", color_discrete_sequence=UK_PALETTE)
-            st.plotly_chart(donut, use_container_width=True)
-        with cB:
-            # Completion rate per assessment: submitted vs missing
-            enroll_ids = df_enroll["enrollment_id"].tolist()
-            submitted_counts = []
-            for aid in df_ass_w["assessment_id"].tolist():
-                # build submitted count by checking student_assessment fetched earlier or re-fetch
-                cnt = 0
-                for eid in enroll_ids:
-                    s = fetch_student_scores(eid)
-                    if not s.empty and (s["assessment_id"] == aid).any():
-                        cnt += 1
-                submitted_counts.append(cnt)
-            comp_df = pd.DataFrame({
-                "assessment_name": df_ass_w["assessment_name"],
-                "submitted": submitted_counts,
-            })
-            comp_df["missing"] = len(enroll_ids) - comp_df["submitted"]
-            comp_melt = comp_df.melt(id_vars=["assessment_name"], value_vars=["submitted","missing"],
-                                     var_name="status", value_name="count")
-            bar_comp = px.bar(comp_melt, x="assessment_name", y="count", color="status",
-                              title="Completion Rate per Assessment", barmode="stack",
-                              color_discrete_sequence=UK_PALETTE)
-            st.plotly_chart(bar_comp, use_container_width=True)
-
-        st.subheader("Score vs Weight")
-        # Collect all student scores for this class
-        df_scores_all = []
-        for eid in df_enroll["enrollment_id"]:
-            sc = fetch_student_scores(eid)
-            if not sc.empty:
-                sc["enrollment_id"] = eid
-                df_scores_all.append(sc)
-        if df_scores_all:
-            df_scores_all = pd.concat(df_scores_all, ignore_index=True)
-            # Merge final_result for coloring context
-            df_scores_all = df_scores_all.merge(df_enroll[["enrollment_id","final_result"]], on="enrollment_id", how="left")
-            scatter_sw = px.scatter(df_scores_all, x="weight", y="score", color="final_result",
-                                    title="Skor vs Bobot Assessment", color_discrete_sequence=UK_PALETTE)
-            st.plotly_chart(scatter_sw, use_container_width=True)
+            st.subheader("Students by Gender")
+            df_gender = df_students["gender"].value_counts().rename_axis("gender").reset_index(name="count")
+            fig2 = px.pie(df_gender, names="gender", values="count", title="Distribusi Gender Mahasiswa", color_discrete_sequence=UK_PALETTE)
+            st.plotly_chart(fig2, use_container_width=True)
+
+        st.subheader("Students per Module")
+        df_by_mod = c_fetch_students_by_module_counts()
+        if not df_by_mod.empty:
+            figm = px.bar(df_by_mod, x="module_code", y="student_count", title="Jumlah Mahasiswa per Modul", color_discrete_sequence=UK_PALETTE)
+            st.plotly_chart(figm, use_container_width=True)
         else:
-            st.info("Belum ada skor assessment untuk kelas ini.")
-
-        st.subheader("Assessment Status Grid (Per Student)")
-        # Build student x assessment matrix with Submitted/Missing
-        grid = []
-        assess_ids = df_ass_w[["assessment_id","assessment_name"]].values.tolist()
-        for _, row in df_enroll.iterrows():
-            eid = row["enrollment_id"]
-            name = row["name"]
-            sc = fetch_student_scores(eid)
-            for aid, aname in assess_ids:
-                submitted = (not sc.empty) and (sc["assessment_id"] == aid).any()
-                grid.append({"student": name, "assessment": aname, "status": "Submitted" if submitted else "Missing"})
-        df_grid = pd.DataFrame(grid)
-        if not df_grid.empty:
-            # Display as pivot-like table
-            pivot = df_grid.pivot_table(index="student", columns="assessment", values="status", aggfunc="first")
-            st.dataframe(pivot)
+            st.info("Belum ada data enrollment untuk menghitung distribusi per modul.")
+
+        st.subheader("Students per Semester")
+        if not df_counts.empty and not df_presentations.empty:
+            df_sem = df_counts.merge(df_presentations[["presentation_id", "semester", "year"]], on="presentation_id", how="left")
+            df_sem["semester_label"] = df_sem["semester"].astype(str) + " " + df_sem["year"].astype(str)
+            sem_counts = df_sem.groupby("semester_label")["enrolled"].sum().reset_index(name="student_count")
+            fig_sem = px.bar(sem_counts, x="semester_label", y="student_count", title="Jumlah Mahasiswa per Semester", color_discrete_sequence=UK_PALETTE)
+            st.plotly_chart(fig_sem, use_container_width=True)
+
+        st.subheader("Students per Instructor")
+        if not df_counts.empty and not df_presentations.empty:
+            df_instr = df_counts.merge(df_presentations[["presentation_id", "instructor_name"]], on="presentation_id", how="left")
+            instr_counts = df_instr.groupby("instructor_name")["enrolled"].sum().reset_index(name="student_count")
+            fig_instr = px.bar(instr_counts, x="instructor_name", y="student_count", title="Jumlah Mahasiswa per Dosen", color_discrete_sequence=UK_PALETTE)
+            st.plotly_chart(fig_instr, use_container_width=True)
+
+        st.subheader("Demografi: Usia Mahasiswa")
+        if not df_students.empty and "date_of_birth" in df_students.columns:
+            today = pd.Timestamp.today().normalize()
+            ages = (today - pd.to_datetime(df_students["date_of_birth"]).dt.normalize()).dt.days // 365
+            df_age = pd.DataFrame({"age": ages})
+            a1, a2 = st.columns(2)
+            with a1:
+                st.metric("Median Age", int(df_age["age"].median()))
+            with a2:
+                st.metric("Avg Age", round(float(df_age["age"].mean()), 1))
+            fig_age = charts.histogram(df_age["age"], 15, "age", title="Distribusi Usia Mahasiswa", color_discrete_sequence=UK_PALETTE)
+            st.plotly_chart(fig_age, use_container_width=True)
+
+        st.subheader("Engagement KPI (Global)")
+        df_clicks_f = c_fetch_total_clicks_all(pids=selected_pids)
+        if not df_clicks_f.empty:
+            df_enroll_f = c_fetch_enrollments_all(selected_pids)
+            df_clicks_f = df_clicks_f.merge(df_enroll_f[["enrollment_id","student_id"]], on="enrollment_id", how="left")
+            avg_clicks_per_student = df_clicks_f.groupby("student_id")["total_clicks"].sum().mean()
+            total_clicks = int(df_clicks_f["total_clicks"].sum())
+            k1, k2 = st.columns(2)
+            k1.metric("Avg Clicks per Student", round(avg_clicks_per_student, 1))
+            k2.metric("Total Clicks (Filtered)", total_clicks)
+
+        df_summary = c_fetch_summary_status()
+        if not df_summary.empty:
+            oldest = pd.to_datetime(df_summary["refreshed_at"]).min()
+            st.caption(f"Data ringkasan diperbarui: {oldest:%Y-%m-%d %H:%M} ({int(df_summary['age_seconds'].max() // 60)} menit lalu)")
+
+elif page == "Classes":
+    st.header("Classes / Presentations")
+    with trace_section("class"):
+        df_pres = df_presentations_f
+        sel = st.selectbox("Select a class", df_pres["presentation_id"].astype(str) + " – " + df_pres["module_code"].astype(str) + " (" + df_pres["semester"].astype(str) + " " + df_pres["year"].astype(str) + ")")
+        pres_id = int(sel.split(" – ")[0])
+        warmer.record_view(pres_id)
+
+        class_frames = c_fetch_class_page(pres_id)
+        df_enroll = class_frames["enroll"]
+        st.subheader("Students in Class")
+        st.dataframe(df_enroll)
+
+        # Semua skor assessment kelas ini dalam satu query
+        df_class_scores = class_frames["class_scores"]
+        df_class_scores = df_class_scores[df_class_scores["enrollment_id"].isin(df_enroll["enrollment_id"])]
+        if not df_enroll.empty:
+            st.subheader("Assessment Scores Distribution")
+            fig3 = charts.binned_bar(class_frames["score_hist"], "score", title="Distribusi Nilai", color_discrete_sequence=UK_PALETTE)
+            st.plotly_chart(fig3)
+
+        # Final score (weighted) per enrollment
+        df_final = class_frames["final"]
+        if not df_final.empty:
+            # KPI metrics
+            df_clicks_p = c_fetch_total_clicks_all(pres_id)
+            avg_score = round(df_final["final_score"].dropna().mean(), 2) if not df_final.empty else None
+            pass_rate = None
+            if not df_enroll.empty and "final_result" in df_enroll.columns:
+                pass_rate = round(
+                    (df_enroll["final_result"].astype(str).str.lower().isin(["pass", "distinction"]).mean()) * 100,
+                    1,
+                )
+            total_clicks_avg = round(df_clicks_p["total_clicks"].mean(), 1) if not df_clicks_p.empty else 0
+
+            m1, m2, m3 = st.columns(3)
+            m1.metric("Avg Final Score", avg_score if avg_score is not None else "-")
+            m2.metric("Pass Rate", f"{pass_rate}%" if pass_rate is not None else "-")
+            m3.metric("Avg Total Clicks", total_clicks_avg)
+
+            c1, c2 = st.columns(2)
+            with c1:
+                st.subheader("Final Scores (Weighted)")
+                f1 = charts.binned_bar(class_frames["final_hist"], "final_score", title="Sebaran Skor Akhir", color_discrete_sequence=UK_PALETTE)
+                st.plotly_chart(f1, use_container_width=True)
+            with c2:
+                st.subheader("Final Result Distribution")
+                df_res = class_frames["results"]
+                f2 = px.pie(df_res, names="final_result", values="cnt", title="Final Result", color_discrete_sequence=UK_PALETTE)
+                st.plotly_chart(f2, use_container_width=True)
+
+        # VLE average timeline (by date)
+        df_tl = c_fetch_vle_avg_timeline_by_presentation(pres_id)
+        if not df_tl.empty:
+            st.subheader("Rata-rata Klik VLE per Tanggal")
+            f3 = charts.timeline(df_tl, "activity_date", "avg_clicks", markers=True, color_discrete_sequence=UK_PALETTE)
+            st.plotly_chart(f3, use_container_width=True)
+
+        df_wk = c_fetch_vle_weekly_by_type(pres_id)
+        if not df_wk.empty:
+            st.subheader("Klik VLE per Minggu per Tipe")
+            fw = px.area(df_wk, x="week_start", y="clicks", color="vle_type", color_discrete_sequence=UK_PALETTE)
+            st.plotly_chart(fw, use_container_width=True)
+
+        # ================= Assessments Section =================
+        st.subheader("Assessments Overview")
+        df_ass_w = class_frames["assessments"]
+        if not df_ass_w.empty:
+            cA, cB = st.columns(2)
+            with cA:
+                donut = px.pie(df_ass_w, names="assessment_name", values="weight", hole=0.5,
+                               title="Komposisi Bobot Assessment", color_discrete_sequence=UK_PALETTE)
+                st.plotly_chart(donut, use_container_width=True)
+            with cB:
+                # Completion rate per assessment: submitted vs missing
+                submitted_counts = (
+                    df_class_scores.groupby("assessment_id")["enrollment_id"].nunique()
+                    .reindex(df_ass_w["assessment_id"], fill_value=0)
+                )
+                comp_df = pd.DataFrame({
+                    "assessment_name": df_ass_w["assessment_name"].values,
+                    "submitted": submitted_counts.values,
+                })
+                comp_df["missing"] = len(df_enroll) - comp_df["submitted"]
+                comp_melt = comp_df.melt(id_vars=["assessment_name"], value_vars=["submitted","missing"],
+                                         var_name="status", value_name="count")
+                bar_comp = px.bar(comp_melt, x="assessment_name", y="count", color="status",
+                                  title="Completion Rate per Assessment", barmode="stack",
+                                  color_discrete_sequence=UK_PALETTE)
+                st.plotly_chart(bar_comp, use_container_width=True)
+
+            st.subheader("Score vs Weight")
+            if not df_class_scores.empty:
+                # Merge final_result for coloring context
+                df_scores_all = df_class_scores.merge(df_enroll[["enrollment_id","final_result"]], on="enrollment_id", how="left")
+                scatter_sw = charts.scatter(df_scores_all, "weight", "score", color="final_result",
+                                            title="Skor vs Bobot Assessment", color_discrete_sequence=UK_PALETTE)
+                st.plotly_chart(scatter_sw, use_container_width=True)
+            else:
+                st.info("Belum ada skor assessment untuk kelas ini.")
+
+            st.subheader("Assessment Status Grid (Per Student)")
+            # Build student x assessment matrix with Submitted/Missing
+            df_grid = df_enroll[["enrollment_id", "name"]].merge(df_ass_w[["assessment_id", "assessment_name"]], how="cross")
+            done = df_class_scores[["enrollment_id", "assessment_id"]].drop_duplicates()
+            df_grid = df_grid.merge(done, on=["enrollment_id", "assessment_id"], how="left", indicator=True)
+            df_grid["status"] = df_grid["_merge"].eq("both").map({True: "Submitted", False: "Missing"})
+            df_grid = df_grid.rename(columns={"name": "student", "assessment_name": "assessment"})
+            if not df_grid.empty:
+                # Display as pivot-like table
+                pivot = df_grid.pivot_table(index="student", columns="assessment", values="status", aggfunc="first")
+                st.dataframe(pivot)
+            else:
+                st.info("Belum ada data status assessment.")
         else:
-            st.info("Belum ada data status assessment.")
-    else:
-        st.info("Tidak ada assessment untuk kelas ini.")
+            st.info("Tidak ada assessment untuk kelas ini.")
 
 elif page == "Students":
     st.header("Student Profile & Activity")
 
-    df_students = fetch_students()
+    df_students = c_fetch_student_options()
     sel = st.selectbox("Pick a student", df_students["student_id"].astype(str) + " – " + df_students["name"])
     stud_id = int(sel.split(" – ")[0])
 
+    # Everything below comes from one query (config keeps an LRU per student)
+    with trace_section("profile"):
+        profile = fetch_student_profile(stud_id)
+    df_enr_s = profile["enrollments"]
+    if selected_pids is not None:
+        df_enr_s = df_enr_s[df_enr_s["presentation_id"].isin(selected_pids)].reset_index(drop=True)
+    if not df_enr_s.empty:
+        df_enr_s["label"] = df_enr_s.apply(lambda r: f"{int(r['enrollment_id'])} – {r['module_code']} ({r['semester']} {r['year']})", axis=1)
+
+    # Tabs with their own enrollment picker are fragments: changing the
+    # picker reruns only that tab, not the sidebar or the other tabs
+    @fragment("activity")
+    def student_activity(df_enr_s, df_activity):
+        st.subheader("VLE Activity")
+        if df_enr_s.empty:
+            st.write("Tidak ada enrollment untuk mahasiswa ini.")
+            return
+        sel_enr = st.selectbox("Pilih Enrollment", df_enr_s["label"])
+        first_enrollment_id = int(str(sel_enr).split(" – ")[0])
+
+        # Engagement features come precomputed with the profile
+        # (mv_enrollment_engagement); only the timeline needs the daily rows
+        rec_enr = df_enr_s[df_enr_s["enrollment_id"] == first_enrollment_id].iloc[0]
+        mc1, mc2, mc3, mc4, mc5 = st.columns(5)
+        mc1.metric("Total Klik", int(rec_enr["total_clicks"]))
+        mc2.metric("Engagement / Minggu", rec_enr["clicks_per_week"] if pd.notna(rec_enr["clicks_per_week"]) else "-")
+        mc3.metric("Hari Aktif", int(rec_enr["active_days"]) if pd.notna(rec_enr["active_days"]) else "-")
+        mc4.metric("Streak Terpanjang (hari)", int(rec_enr["max_streak_days"]) if pd.notna(rec_enr["max_streak_days"]) else "-")
+        mc5.metric("Hari Sejak Aktivitas Terakhir", int(rec_enr["days_since_last"]) if pd.notna(rec_enr["days_since_last"]) else "-")
+
+        c1, c2 = st.columns(2)
+        with c1:
+            df_vle = df_activity[df_activity["enrollment_id"] == first_enrollment_id]
+            if not df_vle.empty:
+                fig4 = charts.timeline(df_vle, "activity_date", "clicks", color="vle_type", color_discrete_sequence=UK_PALETTE,
+                                       title="Timeline Aktivitas VLE")
+                st.plotly_chart(fig4, use_container_width=True)
+            else:
+                st.write("Tidak ada data aktivitas VLE untuk enrollment ini.")
+        with c2:
+            st.write("Ringkasan Skor vs Klik")
+            st.dataframe(df_enr_s.loc[df_enr_s["enrollment_id"] == first_enrollment_id, ["final_score", "total_clicks"]])
+            share = rec_enr["type_share"]
+            if isinstance(share, dict) and share:
+                df_share = pd.DataFrame({"vle_type": list(share), "share": [float(v) for v in share.values()]})
+                fs = px.pie(df_share, names="vle_type", values="share", title="Porsi Klik per Tipe VLE",
+                            color_discrete_sequence=UK_PALETTE)
+                st.plotly_chart(fs, use_container_width=True)
+
+    @fragment("assessments")
+    def student_assessments(df_enr_s, df_scores):
+        st.subheader("Assessments & Scores")
+        if df_enr_s.empty:
+            return
+        sel_enr2 = st.selectbox("Pilih Enrollment untuk Assessment", df_enr_s["label"])
+        enr_id2 = int(str(sel_enr2).split(" – ")[0])
+        df_ass = df_scores.loc[df_scores["enrollment_id"] == enr_id2, ["assessment_id", "assessment_name", "weight", "score"]]
+        if not df_ass.empty:
+            st.dataframe(df_ass)
+            # Visual: bar score vs weight
+            if "score" in df_ass.columns:
+                b1, b2 = st.columns(2)
+                with b1:
+                    bar1 = px.bar(df_ass.fillna({"score": 0}), x="assessment_name", y="score", title="Skor per Assessment", color_discrete_sequence=UK_PALETTE)
+                    st.plotly_chart(bar1, use_container_width=True)
+                with b2:
+                    bar2 = px.bar(df_ass.fillna({"weight": 0}), x="assessment_name", y="weight", title="Bobot per Assessment", color_discrete_sequence=UK_PALETTE)
+                    st.plotly_chart(bar2, use_container_width=True)
+        else:
+            st.write("Belum ada data assessment.")
+
     tab_info, tab_enroll, tab_activity, tab_assess = st.tabs(["Info", "Enrollments", "Activity", "Assessments"])
 
-    with tab_info:
+    with tab_info, trace_section("info"):
         st.subheader("Basic Info")
-        rec = df_students[df_students["student_id"] == stud_id].iloc[0]
+        if profile["student"].empty:
+            # Picked from a stale option list: the student has no row (anymore)
+            st.warning(f"Data siswa {stud_id} tidak ditemukan.")
+            rec = pd.Series({"student_id": stud_id})
+        else:
+            rec = profile["student"].iloc[0]
                 # Compute age
         age_val = None
         try:
@@ -385,7 +644,7 @@ elif page == "Students":
                                 </div>
                                 <div style="background:#10192b;border:1px solid #14213d;border-radius:10px;padding:10px;">
                                     <div style="color:#a9b4c7;font-size:0.85rem;">Date of Birth</div>
-                                    <div style="color:#f5f7fa;font-weight:600;">{rec.get('date_of_birth','-')}</div>
+                                    <div style="color:#f5f7fa;font-weight:600;">{dob.date() if age_val is not None else '-'}</div>
                                 </div>
                             </div>
                         </div>
@@ -393,150 +652,94 @@ elif page == "Students":
                         unsafe_allow_html=True,
                 )
 
-    with tab_enroll:
+    with tab_enroll, trace_section("enrollments"):
         st.subheader("Enrollments")
-    # Ambil semua enrollment & gabungkan dengan kelas
-    df_pres_all = fetch_presentations()
-    df_enr_all = c_fetch_enrollments_all()
-    df_pres_all, df_enr_all = apply_global_filters(df_pres_all, df_enr_all)
-    df_enr = df_enr_all[df_enr_all["student_id"] == stud_id]
-    if not df_enr.empty:
-            df_enr = df_enr.merge(df_pres_all, on="presentation_id", how="left")
-            st.dataframe(df_enr[["enrollment_id","module_code","module_name","semester","year","final_result","studied_credits"]])
-    else:
-        st.write("Tidak ada data enrollment.")
-
-    with tab_activity:
-        st.subheader("VLE Activity")
-        # Pilih enrollment spesifik (jika ada)
-        df_pres_all = fetch_presentations()
-        df_enr_all = c_fetch_enrollments_all()
-        df_pres_all, df_enr_all = apply_global_filters(df_pres_all, df_enr_all)
-        df_enr_s = df_enr_all[df_enr_all["student_id"] == stud_id].merge(df_pres_all, on="presentation_id", how="left")
         if not df_enr_s.empty:
-            enr_labels = df_enr_s.apply(lambda r: f"{int(r['enrollment_id'])} – {r['module_code']} ({r['semester']} {r['year']})", axis=1)
-            sel_enr = st.selectbox("Pilih Enrollment", enr_labels)
-            first_enrollment_id = int(str(sel_enr).split(" – ")[0])
-
-            c1, c2 = st.columns(2)
-            with c1:
-                df_vle = fetch_vle_activity(first_enrollment_id)
-                if not df_vle.empty:
-                    t_clicks = int(df_vle["clicks"].sum())
-                    days = df_vle["activity_date"].astype("datetime64[ns]").dt.date.nunique()
-                    weeks = max(1, days // 7)
-                    engagement_per_week = round(t_clicks / weeks, 2)
-                    mc1, mc2 = st.columns(2)
-                    mc1.metric("Total Klik", t_clicks)
-                    mc2.metric("Engagement / Minggu", engagement_per_week)
-                    fig4 = px.line(df_vle.sort_values("activity_date"), x="activity_date", y="clicks", color="vle_type", color_discrete_sequence=UK_PALETTE,
-                                  title="Timeline Aktivitas VLE")
-                    st.plotly_chart(fig4, use_container_width=True)
-                else:
-                    st.write("Tidak ada data aktivitas VLE untuk enrollment ini.")
-            with c2:
-                df_scores = c_fetch_final_scores_all()
-                df_clicks = c_fetch_total_clicks_all()
-                if not df_scores.empty and not df_clicks.empty:
-                    df_sc = df_scores.merge(df_clicks, on=["enrollment_id", "presentation_id"], how="left")
-                    df_sc_s = df_sc[df_sc["enrollment_id"] == first_enrollment_id]
-                    if not df_sc_s.empty:
-                        st.write("Ringkasan Skor vs Klik")
-                        st.dataframe(df_sc_s[["final_score", "total_clicks"]])
+            st.dataframe(df_enr_s[["enrollment_id","module_code","module_name","semester","year","final_result","studied_credits"]])
         else:
-            st.write("Tidak ada enrollment untuk mahasiswa ini.")
+            st.write("Tidak ada data enrollment.")
+
+    with tab_activity:
+        student_activity(df_enr_s, profile["activity"])
 
     with tab_assess:
-        st.subheader("Assessments & Scores")
-        df_pres_all = fetch_presentations()
-        df_enr_all = c_fetch_enrollments_all()
-        df_pres_all, df_enr_all = apply_global_filters(df_pres_all, df_enr_all)
-        df_enr_s = df_enr_all[df_enr_all["student_id"] == stud_id].merge(df_pres_all, on="presentation_id", how="left")
-        if not df_enr_s.empty:
-            enr_labels = df_enr_s.apply(lambda r: f"{int(r['enrollment_id'])} – {r['module_code']} ({r['semester']} {r['year']})", axis=1)
-            sel_enr2 = st.selectbox("Pilih Enrollment untuk Assessment", enr_labels)
-            enr_id2 = int(str(sel_enr2).split(" – ")[0])
-            df_ass = c_fetch_assessment_scores_by_enrollment(enr_id2)
-            if not df_ass.empty:
-                st.dataframe(df_ass)
-                # Visual: bar score vs weight
-                if "score" in df_ass.columns:
-                    b1, b2 = st.columns(2)
-                    with b1:
-                        bar1 = px.bar(df_ass.fillna({"score": 0}), x="assessment_name", y="score", title="Skor per Assessment", color_discrete_sequence=UK_PALETTE)
-                        st.plotly_chart(bar1, use_container_width=True)
-                    with b2:
-                        bar2 = px.bar(df_ass.fillna({"weight": 0}), x="assessment_name", y="weight", title="Bobot per Assessment", color_discrete_sequence=UK_PALETTE)
-                        st.plotly_chart(bar2, use_container_width=True)
-            else:
-                st.write("Belum ada data assessment.")
+        student_assessments(df_enr_s, profile["assessments"])
 
 elif page == "Analytics":
     st.header("Learning Analytics & Insights")
 
     # Scatter: total clicks vs final_score (semua enrollment)
-    df_scores = c_fetch_final_scores_all()
-    df_clicks = c_fetch_total_clicks_all()
-    if not df_scores.empty and not df_clicks.empty:
-        df_pres_f, _ = apply_global_filters(c_fetch_presentations(), None)
-        df_sc = df_scores.merge(df_clicks, on=["enrollment_id", "presentation_id"], how="left")
-        df_sc = df_sc[df_sc["presentation_id"].isin(df_pres_f["presentation_id"])]
-        fig = px.scatter(df_sc, x="total_clicks", y="final_score",
-                         title="Total Klik VLE vs Skor Akhir")
-        st.plotly_chart(fig, use_container_width=True)
-        # Correlation metric
-        try:
-            corr = df_sc[["total_clicks", "final_score"]].dropna().corr().iloc[0, 1]
-            st.metric("Correlation (Clicks vs Score)", f"{corr:.2f}")
-        except Exception:
-            pass
-    else:
-        st.info("Data skor atau klik belum tersedia.")
-
-    # Boxplot by gender
-    df_students = c_fetch_students()
-    if not df_scores.empty:
-        df_enrollments_all = c_fetch_enrollments_all()
-        df_sg = df_scores.merge(df_enrollments_all, on=["enrollment_id", "presentation_id", "student_id"], how="left")
-        df_sg = df_sg.merge(df_students, on="student_id", how="left")
+    with trace_section("clicks vs score"):
+        df_scores = c_fetch_final_scores_all(pids=selected_pids)
+        df_clicks = c_fetch_total_clicks_all(pids=selected_pids)
+        if not df_scores.empty and not df_clicks.empty:
+            df_sc = df_scores.merge(df_clicks, on=["enrollment_id", "presentation_id"], how="left")
+            fig = charts.scatter(df_sc, "total_clicks", "final_score", title="Total Klik VLE vs Skor Akhir")
+            st.plotly_chart(fig, use_container_width=True)
+            # Correlations of the precomputed engagement features (corr() in Postgres)
+            df_corr = c_fetch_engagement_score_corr(selected_pids)
+            clicks_corr = df_corr.loc[df_corr["feature"] == "total_clicks", "corr"].dropna()
+            if not clicks_corr.empty:
+                st.metric("Correlation (Clicks vs Score)", f"{clicks_corr.iloc[0]:.2f}")
+            if not df_corr.empty:
+                fc = px.bar(df_corr, x="feature", y="corr", title="Korelasi Fitur Engagement vs Skor Akhir",
+                            hover_data=["n"], color_discrete_sequence=UK_PALETTE)
+                st.plotly_chart(fc, use_container_width=True)
+                # Features other than total_clicks are as of the last refresh_summaries()
+                df_summary = c_fetch_summary_status()
+                refreshed = df_summary.loc[df_summary["view_name"] == "mv_enrollment_engagement"]
+                if not refreshed.empty:
+                    r = refreshed.iloc[0]
+                    st.caption(f"Fitur engagement diperbarui: {pd.to_datetime(r['refreshed_at']):%Y-%m-%d %H:%M} "
+                               f"({int(r['age_seconds'] // 60)} menit lalu); total_clicks selalu terkini.")
+        else:
+            st.info("Data skor atau klik belum tersedia.")
+
+    # Boxplot by gender/region (all classes, independent of the sidebar
+    # filters) from quartiles computed in Postgres
+    with trace_section("score boxplots"):
         c1, c2 = st.columns(2)
         with c1:
-            fb = px.box(df_sg.dropna(subset=["final_score", "gender"]), x="gender", y="final_score", title="Skor Akhir per Gender", color_discrete_sequence=UK_PALETTE)
-            st.plotly_chart(fb, use_container_width=True)
+            df_box_g = c_fetch_final_score_box("gender")
+            if not df_box_g.empty:
+                fb = charts.box(df_box_g, "gender", title="Skor Akhir per Gender", colors=UK_PALETTE)
+                st.plotly_chart(fb, use_container_width=True)
         with c2:
-            fr = px.box(df_sg.dropna(subset=["final_score", "region"]), x="region", y="final_score", title="Skor Akhir per Region", color_discrete_sequence=UK_PALETTE)
-            st.plotly_chart(fr, use_container_width=True)
+            df_box_r = c_fetch_final_score_box("region")
+            if not df_box_r.empty:
+                fr = charts.box(df_box_r, "region", title="Skor Akhir per Region", colors=UK_PALETTE)
+                st.plotly_chart(fr, use_container_width=True)
 
     # Trend enrollment & withdrawn per semester/year
-    df_pres = c_fetch_presentations()
-    df_enr_all = c_fetch_enrollments_all()
-    df_pres, df_enr_all = apply_global_filters(df_pres, df_enr_all)
-    if not df_pres.empty and not df_enr_all.empty:
-        df_enr_tr = df_enr_all.merge(df_pres[["presentation_id", "semester", "year"]], on="presentation_id", how="left")
-        df_enr_tr["sem_label"] = df_enr_tr["semester"].astype(str) + " " + df_enr_tr["year"].astype(str)
-        trend = df_enr_tr.groupby("sem_label").size().reset_index(name="enrolled")
-        withdraw = df_enr_tr[df_enr_tr["final_result"].astype(str).str.lower().eq("withdrawn")].groupby("sem_label").size().reset_index(name="withdrawn")
-        tdf = trend.merge(withdraw, on="sem_label", how="left").fillna(0)
-        tl = px.line(tdf, x="sem_label", y=["enrolled", "withdrawn"], title="Trend Enrollment vs Withdrawn per Semester", color_discrete_sequence=UK_PALETTE)
-        st.plotly_chart(tl, use_container_width=True)
-
-    # Distribusi bobot assessment
-    st.subheader("Distribusi Bobot Assessment per Kelas")
-    sel2 = st.selectbox("Pilih kelas untuk melihat bobot assessment", df_pres["presentation_id"].astype(str) + " – " + df_pres["module_code"] + " (" + df_pres["semester"].astype(str) + " " + df_pres["year"].astype(str) + ")")
-    pid2 = int(sel2.split(" – ")[0])
-    df_ass_w = fetch_assessments(pid2)
-    if not df_ass_w.empty:
-        hw = px.histogram(df_ass_w, x="weight", nbins=10, title="Distribusi Bobot Assessment", color_discrete_sequence=UK_PALETTE)
-        st.plotly_chart(hw, use_container_width=True)
-    else:
-        st.write("Tidak ada data assessment untuk kelas ini.")
+    with trace_section("enrollment trend"):
+        tdf = c_fetch_enrollment_trend(selected_pids)
+        if not tdf.empty:
+            tdf["sem_label"] = tdf["semester"].astype(str) + " " + tdf["year"].astype(str)
+            tl = px.line(tdf, x="sem_label", y=["enrolled", "withdrawn"], title="Trend Enrollment vs Withdrawn per Semester", color_discrete_sequence=UK_PALETTE)
+            st.plotly_chart(tl, use_container_width=True)
+
+    # Distribusi bobot assessment: its own class picker, rerun as a fragment
+    @fragment("assessment weights")
+    def assessment_weights(df_pres):
+        st.subheader("Distribusi Bobot Assessment per Kelas")
+        sel2 = st.selectbox("Pilih kelas untuk melihat bobot assessment", df_pres["presentation_id"].astype(str) + " – " + df_pres["module_code"].astype(str) + " (" + df_pres["semester"].astype(str) + " " + df_pres["year"].astype(str) + ")")
+        pid2 = int(sel2.split(" – ")[0])
+        df_ass_w = c_fetch_assessments(pid2)
+        if not df_ass_w.empty:
+            hw = px.histogram(df_ass_w, x="weight", nbins=10, title="Distribusi Bobot Assessment", color_discrete_sequence=UK_PALETTE)
+            st.plotly_chart(hw, use_container_width=True)
+        else:
+            st.write("Tidak ada data assessment untuk kelas ini.")
+
+    assessment_weights(df_presentations_f)
 
 elif page == "Instructors":
     st.header("Instructor / Pengajar")
     df_pres = c_fetch_presentations()
-    if df_pres.empty:
-        st.info("Belum ada data presentasi.")
-    else:
+
+    # The instructor picker only drives this section; rerun it as a fragment
+    @fragment("instructor")
+    def instructor_detail(df_pres):
         instr_names = sorted(df_pres["instructor_name"].dropna().unique().tolist())
         instr = st.selectbox("Pilih Instructor", instr_names)
         df_instr_classes = df_pres[df_pres["instructor_name"] == instr]
@@ -544,15 +747,16 @@ elif page == "Instructors":
         st.dataframe(df_instr_classes[["module_code", "module_name", "semester", "year"]])
 
         # Statistik per kelas: rata-rata skor & pass rate
-        df_scores = c_fetch_final_scores_all()
-        df_enr = c_fetch_enrollments_all()
+        instr_pids = tuple(sorted(int(p) for p in df_instr_classes["presentation_id"]))
+        df_scores = c_fetch_final_scores_all(pids=instr_pids)
+        df_enr = c_fetch_enrollments_all(instr_pids)
         if not df_scores.empty and not df_enr.empty:
             df_join = df_instr_classes[["presentation_id", "module_code"]].merge(df_scores, on="presentation_id", how="left")
             df_pass = df_enr[df_enr["presentation_id"].isin(df_instr_classes["presentation_id"])].copy()
             # pass rate: final_result == 'Pass' or similar
             df_pass["is_pass"] = df_pass["final_result"].str.lower().isin(["pass", "distinction"]).astype(int)
             pass_rate = df_pass.groupby("presentation_id")["is_pass"].mean().reset_index(name="pass_rate")
-            df_stat = df_join.groupby(["presentation_id", "module_code"]).agg(avg_score=("final_score", "mean")).reset_index()
+            df_stat = df_join.groupby(["presentation_id", "module_code"], observed=True).agg(avg_score=("final_score", "mean")).reset_index()
             df_stat = df_stat.merge(pass_rate, on="presentation_id", how="left")
 
             # KPIs for the instructor
@@ -565,3 +769,55 @@ elif page == "Instructors":
             figi = px.bar(df_stat, x="module_code", y=["avg_score", "pass_rate"], barmode="group", color_discrete_sequence=UK_PALETTE)
             st.plotly_chart(figi, use_container_width=True)
 
+    if df_pres.empty:
+        st.info("Belum ada data presentasi.")
+    else:
+        instructor_detail(df_pres)
+
+# ================= Debug panel (?debug=1 or DEBUG_PANEL=1) =================
+if os.environ.get("DEBUG_PANEL") == "1" or st.query_params.get("debug") == "1":
+    metrics.measure_bytes()
+    with sidebar.expander("Debug: query metrics", expanded=False):
+        m = metrics.snapshot()
+        if m["queries"]:
+            df_q = pd.DataFrame(m["queries"]).sort_values("wall_seconds", ascending=False)
+            st.dataframe(df_q[["query", "source", "count", "avg_wall_ms", "max_wall_seconds", "db_seconds", "rows", "bytes"]])
+        if m["caches"]:
+            st.dataframe(pd.DataFrame(m["caches"]))
+        st.write("Single-flight", coalesce_stats())
+        if router.replicas:
+            st.write(f"Replicas ({router.strategy}, max lag {router.max_lag:.0f}s), "
+                     f"primary fallbacks: {router.primary_fallbacks}")
+            st.dataframe(pd.DataFrame(router.status()))
+        if warmer.WARM_CACHE:
+            w = warmer.status()
+            st.write(f"Cache warmer: {w['runs']} runs, last {w['last_seconds']} s, "
+                     f"next window ahead: {w['ahead']}, errors: {w['errors']}")
+            st.write("Warmed classes", w["warmed"], "Most viewed", w["hot"])
+        if m["cold_start"]:
+            st.write(f"Cold start: {m['cold_start']['seconds'] * 1000:.0f} ms "
+                     f"(budget {metrics.COLD_START_BUDGET_MS:.0f} ms)")
+        if m["reruns"]:
+            st.write(f"Reruns (budget {metrics.RERUN_BUDGET_MS:.0f} ms)")
+            st.dataframe(pd.DataFrame(m["reruns"])[["page", "count", "avg_ms", "max_seconds", "over_budget"]])
+        if m["slow_queries"]:
+            st.write(f"Slow queries (>= {metrics.SLOW_QUERY_MS:.0f} ms)")
+            st.dataframe(pd.DataFrame(m["slow_queries"]))
+        # Memory of the frames every page shares, compact vs default dtypes
+        mem = memory_report({"presentations": df_presentations_all, "students": c_fetch_students(),
+                             "enrollments_all": c_fetch_enrollments_all(selected_pids)})
+        st.write("Memory (MB)", mem.groupby("frame")[["bytes", "default_bytes"]].sum().div(2**20).round(2))
+        # Latest reruns first; a fragment rerun lists only its own section.
+        # Shown as of the last full rerun (fragment reruns don't redraw this)
+        if m["traces"]:
+            st.write("Rerun trace")
+            st.dataframe(pd.DataFrame([
+                {"page": t["page"], "kind": t["kind"], "total_ms": t["total_ms"],
+                 "sections": ", ".join(f"{x['section']} {x['ms']:.0f}" for x in t["sections"])}
+                for t in reversed(m["traces"])
+            ]))
+
+_rerun_done = True
+_rerun_seconds = time.perf_counter() - _rerun_started
+metrics.record_rerun(page, _rerun_seconds)
+metrics.record_trace(page, "full", _rerun_seconds, _trace)
@@ -0,0 +1,256 @@
+"""Benchmark suite for the fetch_* queries and the app.py pages.
+
+Runs against a local Postgres (fill it with gen_data.py first) and writes
+machine-readable results that can be compared across commits:
+
+    python bench.py --dsn postgresql://postgres@localhost/tubes --out bench/$(git rev-parse --short HEAD).json
+    python bench.py --dsn ... --compare bench/abc123.json --threshold 20
+    python bench.py planning --dsn ...     # prepared vs unprepared config.QUERIES
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import psycopg
+
+HERE = Path(__file__).resolve().parent
+
+PAGES = ["Overview", "Classes", "Students", "Analytics", "Instructors"]
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def timed(fn, repeat):
+    samples, out = [], None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        out = fn()
+        samples.append(time.perf_counter() - started)
+    samples.sort()
+    return {
+        "median_ms": round(statistics.median(samples) * 1000, 2),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000, 2),
+        "min_ms": round(samples[0] * 1000, 2),
+        "rows": len(out) if hasattr(out, "__len__") else 0,
+    }, out
+
+
+def bench_fetch(config, conn, repeat):
+    from explain_check import call_variants, sample_args
+
+    samples = sample_args(conn)
+    results = []
+    fetchers = [(n, f) for n, f in vars(config).items() if n.startswith("fetch_") and callable(f)]
+    for name, fn in sorted(fetchers):
+        for kwargs in call_variants(fn, samples):
+            r, df = timed(lambda: fn(**kwargs), repeat)
+            mem = config.memory_report(df if isinstance(df, dict) else {name: df})
+            r["bytes"], r["default_bytes"] = int(mem["bytes"].sum()), int(mem["default_bytes"].sum())
+            label = ", ".join(f"{k}={v!r}" for k, v in kwargs.items())
+            results.append({"name": f"{name}({label})", **r})
+            print(f"  {results[-1]['name']:<70}{r['median_ms']:>10} ms{r['rows']:>10} rows"
+                  f"{r['bytes'] / 2**20:>9.1f} MB (default dtypes {r['default_bytes'] / 2**20:.1f} MB)", file=sys.stderr)
+    return results
+
+
+def _execute(conn, query, params, prepare):
+    with conn.cursor() as cur:
+        cur.execute(query, params, prepare=prepare)
+        return cur.fetchall()
+
+
+def bench_planning(config, dsn, repeat):
+    # For every config.QUERIES entry a fetch_* issues: planner time from
+    # EXPLAIN (SUMMARY), and execution time on a connection that never
+    # prepares vs one holding the prepared statement. Both are warmed up with
+    # 5 runs first, since Postgres keeps re-planning a prepared statement
+    # (custom plans) for its first 5 executions before settling on a generic plan.
+    from explain_check import call_variants, sample_args
+
+    by_text = {q: k for k, q in config.QUERIES.items()}
+    results, seen = [], set()
+    with psycopg.connect(dsn, autocommit=True, prepare_threshold=None) as plain, \
+            psycopg.connect(dsn, autocommit=True) as prepared:
+        samples = sample_args(plain)
+        fetchers = [(n, f) for n, f in vars(config).items() if n.startswith("fetch_") and callable(f)]
+        for name, fn in sorted(fetchers):
+            for kwargs in call_variants(fn, samples):
+                with config.capture_queries() as calls:
+                    fn(**kwargs)
+                for query, params in calls:
+                    key = by_text.get(query)
+                    if key is None or key in seen:
+                        continue
+                    seen.add(key)
+                    plan = plain.execute("EXPLAIN (SUMMARY, FORMAT JSON) " + query, params).fetchone()[0]
+                    plan = json.loads(plan) if isinstance(plan, str) else plan
+                    for _ in range(5):
+                        _execute(plain, query, params, False)
+                        _execute(prepared, query, params, True)
+                    unprep, _ = timed(lambda: _execute(plain, query, params, False), repeat)
+                    prep, _ = timed(lambda: _execute(prepared, query, params, True), repeat)
+                    r = {"name": key, "planning_ms": round(plan[0]["Planning Time"], 3),
+                         "unprepared_ms": unprep["median_ms"], "prepared_ms": prep["median_ms"],
+                         "saved_ms": round(unprep["median_ms"] - prep["median_ms"], 2)}
+                    results.append(r)
+                    print(f"  {key:<40}plan {r['planning_ms']:>8} ms  unprepared {r['unprepared_ms']:>9} ms"
+                          f"  prepared {r['prepared_ms']:>9} ms  saved {r['saved_ms']:>8} ms", file=sys.stderr)
+    return results
+
+
+def bench_pages(repeat):
+    # Each page is rendered headless with Streamlit's AppTest: a cold run
+    # (all st caches cleared) followed by warm reruns.
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+
+    import metrics
+
+    def last_sections():
+        # Per-section ms of the run that just finished (app.py trace_section)
+        traces = [t for t in metrics.snapshot()["traces"] if t["kind"] == "full"]
+        return {x["section"]: x["ms"] for x in traces[-1]["sections"]} if traces else {}
+
+    results = []
+    for page in PAGES:
+        st.cache_data.clear()
+        at = AppTest.from_file(str(HERE / "app.py"), default_timeout=600)
+        at.run()
+        at.sidebar.selectbox[0].set_value(page)
+        started = time.perf_counter()
+        at.run()
+        cold = time.perf_counter() - started
+        cold_sections = last_sections()
+        warm, warm_sections = [], {}
+        for _ in range(repeat):
+            started = time.perf_counter()
+            at.run()
+            warm.append(time.perf_counter() - started)
+            for name, ms in last_sections().items():
+                warm_sections.setdefault(name, []).append(ms)
+        errors = [str(e.value) for e in at.exception]
+        sections = {name: {"cold_ms": cold_sections.get(name),
+                           "warm_median_ms": round(statistics.median(warm_sections[name]), 2)
+                           if warm_sections.get(name) else None}
+                    for name in dict.fromkeys([*cold_sections, *warm_sections])}
+        results.append({
+            "name": page,
+            "cold_ms": round(cold * 1000, 2),
+            "warm_median_ms": round(statistics.median(warm) * 1000, 2) if warm else None,
+            "warm_over_budget": bool(warm) and statistics.median(warm) * 1000 > metrics.RERUN_BUDGET_MS,
+            "sections": sections,
+            "errors": errors,
+        })
+        print(f"  {page:<20} cold {results[-1]['cold_ms']:>10} ms  warm {results[-1]['warm_median_ms']:>10} ms", file=sys.stderr)
+        for name, sec in sections.items():
+            print(f"    {name:<18} cold {sec['cold_ms']!s:>10} ms  warm {sec['warm_median_ms']!s:>10} ms", file=sys.stderr)
+    return results
+
+
+def compare(current, baseline, threshold):
+    # Returns the list of regressions (median slower by more than threshold %)
+    regressions = []
+    for section, key in (("fetch", "median_ms"), ("pages", "cold_ms"), ("pages", "warm_median_ms")):
+        before = {r["name"]: r for r in baseline.get(section, [])}
+        for r in current.get(section, []):
+            old = before.get(r["name"])
+            if not old or not old.get(key) or r.get(key) is None:
+                continue
+            change = (r[key] - old[key]) / old[key] * 100
+            line = f"{section}:{r['name']} {key} {old[key]} -> {r[key]} ms ({change:+.1f}%)"
+            print(line)
+            if change > threshold:
+                regressions.append(line)
+    # Per-section page timings, so a page regression points at its section
+    before = {r["name"]: r.get("sections", {}) for r in baseline.get("pages", [])}
+    for r in current.get("pages", []):
+        for name, sec in r.get("sections", {}).items():
+            old = before.get(r["name"], {}).get(name)
+            for key in ("cold_ms", "warm_median_ms"):
+                if not old or not old.get(key) or sec.get(key) is None:
+                    continue
+                change = (sec[key] - old[key]) / old[key] * 100
+                line = f"pages:{r['name']}/{name} {key} {old[key]} -> {sec[key]} ms ({change:+.1f}%)"
+                print(line)
+                if change > threshold:
+                    regressions.append(line)
+    return regressions
+
+
+def write_result(result, out):
+    text = json.dumps(result, indent=2)
+    if out:
+        Path(out).parent.mkdir(parents=True, exist_ok=True)
+        Path(out).write_text(text)
+    else:
+        print(text)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark fetch_* queries and app.py pages")
+    ap.add_argument("mode", nargs="?", choices=["all", "planning"], default="all",
+                    help="planning: only compare prepared vs unprepared registry queries")
+    ap.add_argument("--dsn", default=os.environ.get("BENCH_DATABASE_URL") or os.environ.get("DATABASE_URL"))
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--skip-pages", action="store_true", help="only time fetch_* functions")
+    ap.add_argument("--out", help="write results JSON here (default: stdout)")
+    ap.add_argument("--compare", help="baseline JSON from an earlier run")
+    ap.add_argument("--threshold", type=float, default=20.0, help="regression threshold in percent")
+    args = ap.parse_args()
+    if not args.dsn:
+        ap.error("pass --dsn or set BENCH_DATABASE_URL")
+
+    # Measure the database, not the caches in front of it
+    os.environ["DATABASE_URL"] = args.dsn
+    os.environ.pop("QUERY_CACHE_URL", None)
+    os.environ.pop("SNAPSHOT_DIR", None)
+    os.environ["PROFILE_CACHE_SIZE"] = "0"
+    os.environ["WARM_CACHE"] = "0"
+    import config
+
+    if args.mode == "planning":
+        print("planning (config.QUERIES):", file=sys.stderr)
+        result = {"commit": git_commit(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                  "planning": bench_planning(config, args.dsn, args.repeat)}
+        write_result(result, args.out)
+        return
+
+    with psycopg.connect(args.dsn, autocommit=True) as conn:
+        scale = dict(conn.execute("""
+            SELECT 'enrollment', COUNT(*) FROM enrollment
+            UNION ALL SELECT 'student_assessment', COUNT(*) FROM student_assessment
+            UNION ALL SELECT 'student_vle_activity', COUNT(*) FROM student_vle_activity
+        """).fetchall())
+        print("fetch_*:", file=sys.stderr)
+        fetch = bench_fetch(config, conn, args.repeat)
+    pages = [] if args.skip_pages else (print("pages:", file=sys.stderr), bench_pages(args.repeat))[1]
+
+    result = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "rows": scale,
+        "fetch": fetch,
+        "pages": pages,
+    }
+    write_result(result, args.out)
+
+    if args.compare:
+        regressions = compare(result, json.loads(Path(args.compare).read_text()), args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) above {args.threshold}%", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
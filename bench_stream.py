@@ -0,0 +1,87 @@
+"""Peak RSS and throughput of get_df vs the streaming fetch modes.
+
+Each mode runs in a fresh subprocess so ru_maxrss reflects that mode alone.
+
+    python bench_stream.py                                  # student_vle_activity
+    python bench_stream.py --query "SELECT * FROM enrollment" --chunk-size 20000
+    python bench_stream.py --json > stream.json
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+MODES = ["get_df", "get_df_columnar", "iter_df"]
+
+DEFAULT_QUERY = """
+SELECT sva.enrollment_id, sva.vle_id, v.vle_type, sva.activity_date, sva.clicks
+FROM student_vle_activity sva
+  JOIN vle_item v ON sva.vle_id = v.vle_id
+"""
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+
+
+def run_mode(mode, query, chunk_size):
+    # No shared cache, so get_df really queries; single-flight has nothing to
+    # coalesce with one call per process. All three modes compact dtypes.
+    os.environ.pop("QUERY_CACHE_URL", None)
+    import config
+
+    base = peak_rss_mb()
+    started = time.perf_counter()
+    if mode == "get_df":
+        rows = len(config.get_df(query, name="bench_stream"))
+    elif mode == "get_df_columnar":
+        rows = len(config.get_df_columnar(query, chunk_size=chunk_size))
+    else:
+        rows = 0
+        for chunk in config.iter_df(query, chunk_size=chunk_size):
+            rows += len(chunk)  # consume and drop, as a streaming consumer would
+    elapsed = time.perf_counter() - started
+    return {
+        "mode": mode,
+        "rows": rows,
+        "seconds": round(elapsed, 3),
+        "rows_per_sec": round(rows / elapsed) if elapsed else None,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "peak_rss_delta_mb": round(peak_rss_mb() - base, 1),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark get_df vs streaming fetch modes")
+    ap.add_argument("--query", default=DEFAULT_QUERY)
+    ap.add_argument("--chunk-size", type=int, default=50000)
+    ap.add_argument("--modes", nargs="+", default=MODES, choices=MODES)
+    ap.add_argument("--json", action="store_true", help="print machine-readable results")
+    ap.add_argument("--child", choices=MODES, help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child:
+        print(json.dumps(run_mode(args.child, args.query, args.chunk_size)))
+        return
+
+    results = []
+    for mode in args.modes:
+        out = subprocess.run(
+            [sys.executable, __file__, "--child", mode, "--query", args.query, "--chunk-size", str(args.chunk_size)],
+            check=True, capture_output=True, text=True,
+        )
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'mode':<18}{'rows':>12}{'sec':>10}{'rows/s':>12}{'peak MB':>10}{'delta MB':>10}")
+    for r in results:
+        print(f"{r['mode']:<18}{r['rows']:>12}{r['seconds']:>10}{r['rows_per_sec']:>12}{r['peak_rss_mb']:>10}{r['peak_rss_delta_mb']:>10}")
+
+
+if __name__ == "__main__":
+    main()
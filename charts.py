@@ -0,0 +1,116 @@
+"""Aggregation-first Plotly figures for app.py.
+
+The browser should receive a bounded number of points whatever the size of
+the data behind a chart:
+
+- histograms are drawn from pre-binned frames (config.fetch_*_histogram bins
+  in SQL; `histogram` bins a Series with numpy),
+- scatters switch to WebGL above SCATTER_WEBGL_MIN points and to a 2D density
+  heatmap above SCATTER_DENSITY_MIN points,
+- box plots are drawn from precomputed quartiles (config.fetch_final_score_box),
+- timelines are downsampled with LTTB (Largest-Triangle-Three-Buckets) to at
+  most TIMELINE_MAX_POINTS points per series.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+SCATTER_WEBGL_MIN = int(os.environ.get("SCATTER_WEBGL_MIN", 2000))
+SCATTER_DENSITY_MIN = int(os.environ.get("SCATTER_DENSITY_MIN", 20000))
+DENSITY_BINS = int(os.environ.get("DENSITY_BINS", 60))
+TIMELINE_MAX_POINTS = int(os.environ.get("TIMELINE_MAX_POINTS", 500))
+
+
+def binned_bar(bins, x_label, title=None, **kwargs):
+    # bins: bin_start, bin_end, cnt (as returned by config.fetch_*_histogram)
+    mid = (bins["bin_start"] + bins["bin_end"]) / 2
+    fig = px.bar(x=mid, y=bins["cnt"], title=title, labels={"x": x_label, "y": "count"}, **kwargs)
+    if len(bins):
+        fig.update_traces(width=float(bins["bin_end"].iloc[0] - bins["bin_start"].iloc[0]))
+    fig.update_layout(bargap=0.02)
+    return fig
+
+
+def histogram(values, nbins, x_label, title=None, **kwargs):
+    values = pd.Series(values).dropna().astype(float)
+    cnt, edges = np.histogram(values, bins=nbins) if len(values) else (np.array([]), np.array([0.0]))
+    bins = pd.DataFrame({"bin_start": edges[:-1], "bin_end": edges[1:], "cnt": cnt})
+    return binned_bar(bins, x_label, title, **kwargs)
+
+
+def scatter(df, x, y, title=None, **kwargs):
+    data = df.dropna(subset=[x, y])
+    if len(data) > SCATTER_DENSITY_MIN:
+        return density(data, x, y, title)
+    render_mode = "webgl" if len(data) > SCATTER_WEBGL_MIN else "svg"
+    return px.scatter(data, x=x, y=y, title=title, render_mode=render_mode, **kwargs)
+
+
+def density(df, x, y, title=None, bins=DENSITY_BINS):
+    # Counts per cell of a bins x bins grid; empty cells stay transparent
+    counts, xedges, yedges = np.histogram2d(df[x].astype(float), df[y].astype(float), bins=bins)
+    z = np.where(counts.T > 0, counts.T, np.nan)
+    fig = go.Figure(go.Heatmap(
+        x=(xedges[:-1] + xedges[1:]) / 2,
+        y=(yedges[:-1] + yedges[1:]) / 2,
+        z=z,
+        colorscale="Blues",
+        colorbar={"title": "n"},
+        hovertemplate=f"{x}=%{{x:.1f}}<br>{y}=%{{y:.1f}}<br>n=%{{z}}<extra></extra>",
+    ))
+    fig.update_layout(title=title, xaxis_title=x, yaxis_title=y)
+    return fig
+
+
+def box(stats, group, title=None, y_label="final_score", colors=None):
+    # stats: one row per group with q1, median, q3, lowerfence, upperfence, mean
+    fig = go.Figure(go.Box(
+        x=stats[group].astype(str),
+        q1=stats["q1"], median=stats["median"], q3=stats["q3"],
+        lowerfence=stats["lowerfence"], upperfence=stats["upperfence"], mean=stats["mean"],
+        boxpoints=False,
+        marker_color=colors[0] if colors else None,
+    ))
+    fig.update_layout(title=title, xaxis_title=group, yaxis_title=y_label)
+    return fig
+
+
+def lttb(x, y, n_out):
+    # Indices of the n_out points that best preserve the shape of (x, y);
+    # x must be sorted. Keeps first and last point.
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        nxt_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x, avg_y = x[end:nxt_end].mean(), y[end:nxt_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(area.argmax())
+        keep[i + 1] = a
+    return keep
+
+
+def downsample(df, x, y, color=None, max_points=TIMELINE_MAX_POINTS):
+    # LTTB per series (one per `color` value), sorted by x
+    groups = [df] if color is None else [g for _, g in df.groupby(color, observed=True, sort=False)]
+    per_series = max(3, max_points // max(1, len(groups)))
+    out = []
+    for g in groups:
+        g = g.sort_values(x)
+        xs = g[x]
+        xs = xs.astype("datetime64[ns]").astype("int64") if pd.api.types.is_datetime64_any_dtype(xs) else xs
+        keep = lttb(xs.to_numpy(dtype=float), g[y].to_numpy(dtype=float), per_series)
+        out.append(g.iloc[keep])
+    return pd.concat(out) if out else df
+
+
+def timeline(df, x, y, title=None, color=None, max_points=TIMELINE_MAX_POINTS, **kwargs):
+    return px.line(downsample(df, x, y, color, max_points), x=x, y=y, color=color, title=title, **kwargs)
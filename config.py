@@ -1,7 +1,22 @@
+import json
 import os
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import contextmanager
+from decimal import Decimal
 from dotenv import load_dotenv
 import psycopg
+from psycopg_pool import ConnectionPool, PoolTimeout
+import numpy as np
 import pandas as pd
+import metrics
+import querycache
+import replicas
+import snapshot
 try:
   import streamlit as st
 except Exception:  # streamlit not always present at import time
@@ -38,44 +53,523 @@ DB_URL = (
   or DSN
 )
 
-conn = psycopg.connect(DB_URL)
+# Connection pool shared by all Streamlit sessions. Each query checks out its
+# own connection, so concurrent sessions no longer serialize on one socket.
+POOL_MIN_SIZE = int(os.environ.get("DB_POOL_MIN_SIZE", 1))
+POOL_MAX_SIZE = int(os.environ.get("DB_POOL_MAX_SIZE", 10))
+POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", 10))        # seconds to wait for a free connection
+POOL_MAX_IDLE = float(os.environ.get("DB_POOL_MAX_IDLE", 300))     # close connections idle longer than this
+POOL_MAX_LIFETIME = float(os.environ.get("DB_POOL_MAX_LIFETIME", 1800))  # recycle connections after this
+# Server-side prepared statements for the QUERIES registry. Transaction-mode
+# poolers (Supabase port 6543, PgBouncer < 1.21) hand each transaction a
+# different server connection, so set DB_PREPARE=0 there; that also disables
+# psycopg's automatic preparation of repeated ad-hoc queries.
+PREPARE_STATEMENTS = os.environ.get("DB_PREPARE", "1") != "0"
+PREPARE_THRESHOLD = 5 if PREPARE_STATEMENTS else None
 
+def _make_pool(dsn):
+    return ConnectionPool(
+      dsn,
+      min_size=POOL_MIN_SIZE,
+      max_size=POOL_MAX_SIZE,
+      timeout=POOL_TIMEOUT,
+      max_idle=POOL_MAX_IDLE,
+      max_lifetime=POOL_MAX_LIFETIME,
+      kwargs={"autocommit": True, "prepare_threshold": PREPARE_THRESHOLD},
+      check=ConnectionPool.check_connection,  # health check on every checkout
+      open=False,  # opened by the first query, see connection()
+    )
+
+
+pool = _make_pool(DB_URL)
+# Read replicas from DB_REPLICA_URLS (none by default); see replicas.py
+router = replicas.ReplicaRouter(replicas.REPLICA_URLS, _make_pool)
+_pool_lock = threading.Lock()
+
+
+def connection():
+    # Pooled connection context manager. The pool is opened on first use, so
+    # importing config (and rendering a page from snapshots/caches) costs no
+    # TCP+TLS round trip to the database.
+    if pool.closed:
+        with _pool_lock:
+            if pool.closed:
+                pool.open()
+    return pool.connection()
+
+
+_capture = threading.local()
+
+
+class _Captured(list):
+    # (query, params) per captured call; .frames holds the empty placeholder
+    # frame get_df returned for each, so callers can tell whether a fetch_*
+    # returned its query's frame unchanged (see config_async.afetch)
+
+    def __init__(self):
+        super().__init__()
+        self.frames = []
+
+    def add(self, query, params):
+        self.append((query, params))
+        df = pd.DataFrame()
+        self.frames.append(df)
+        return df
+
+
+@contextmanager
+def capture_queries():
+    # Record (query, params) issued by fetch_* calls in this thread instead of
+    # executing them. Used by tooling such as explain_check.py.
+    calls = _Captured()
+    _capture.calls = calls
+    try:
+        yield calls
+    finally:
+        _capture.calls = None
+
+
+def async_post(post):
+    # Marks a fetch_* that reshapes its query result: config_async.afetch runs
+    # the query and then post(df, *args) to return what the sync call does
+    def mark(fn):
+        fn.async_post = post
+        return fn
+    return mark
+
+
+_timing = threading.local()
+
+
+def get_df(query, params=None, name=None, primary=False):
+    # primary=True skips the read replicas (read-your-writes, summary status)
+    calls = getattr(_capture, "calls", None)
+    if calls is not None:
+        return calls.add(query, params)
+    # Metrics are labelled with the calling fetch_* function unless named
+    name = name or sys._getframe(1).f_code.co_name
+    _timing.db_seconds = 0.0
+    _timing.source = "coalesced"
+    started = time.perf_counter()
+    key = querycache.make_key(query, params)
+    df = _single_flight(key, lambda: _cached_query(key, query, params, primary))
+    wall = time.perf_counter() - started
+    metrics.record_query(name, _timing.source, wall, _timing.db_seconds, len(df), metrics.frame_bytes(df))
+    return df
+
+
+def _cached_query(key, query, params, primary=False):
+    if querycache.backend() is None:
+        return _timed_query(query, params, primary)
+    df = querycache.lookup(key)
+    if df is None:
+        df = _timed_query(query, params, primary)
+        querycache.store(key, df, querycache.tables_of(query))
+    else:
+        _timing.source = "shared_cache"
+    return df
+
+
+def _timed_query(query, params, primary=False):
+    started = time.perf_counter()
+    try:
+        return compact_dtypes(_query(query, params, primary))
+    finally:
+        _timing.db_seconds = time.perf_counter() - started
+        _timing.source = "db"
+
+
+# Schema-aware dtypes for query results, keyed by the column names the fetch_*
+# queries return. Integer targets follow the db.sql column types and are only
+# applied when the values fit, since aggregates (SUM, COUNT) may not.
+CATEGORY_COLUMNS = {"gender", "region", "highest_education", "final_result", "vle_type",
+                    "semester", "module_code", "role", "department", "top_vle_type"}
+INT_COLUMNS = {
+    "user_id": "int32", "student_id": "int32", "instructor_id": "int32", "module_id": "int32",
+    "presentation_id": "int32", "enrollment_id": "int32", "assessment_id": "int32",
+    "student_assessment_id": "int32", "vle_id": "int32", "activity_id": "int32", "clicks": "int32",
+    "year": "int16", "level": "int16", "credits": "int16", "studied_credits": "int16",
+    "weight": "int16", "score": "int16",
+}
+DATE_COLUMNS = {"date_of_birth", "activity_date", "week_start", "first_activity", "last_activity"}
+
+
+def compact_dtypes(df):
+    # Categoricals for enum-like strings, int32/int16 ids and small ints,
+    # datetime64 dates and float64 instead of Decimal objects (AVG, NUMERIC)
+    for col in df.columns:
+        s = df[col]
+        if col in INT_COLUMNS and pd.api.types.is_integer_dtype(s.dtype) and len(s):
+            info = np.iinfo(INT_COLUMNS[col])
+            if info.min <= s.min() and s.max() <= info.max:
+                df[col] = s.astype(INT_COLUMNS[col])
+        elif s.dtype != object:
+            continue
+        elif col in CATEGORY_COLUMNS:
+            df[col] = s.astype("category")
+        elif col in DATE_COLUMNS:
+            df[col] = pd.to_datetime(s)
+        else:
+            first = s.first_valid_index()
+            if first is not None and isinstance(s[first], Decimal):
+                df[col] = pd.to_numeric(s, errors="coerce")
+    return df
+
+
+def memory_report(frames):
+    # Per-column bytes of each frame as returned vs. the same data with the
+    # default read_sql dtypes (object strings/dates, int64). frames: name -> df
+    rows = []
+    for name, df in frames.items():
+        for col in df.columns:
+            s = df[col]
+            if isinstance(s.dtype, pd.CategoricalDtype):
+                wide = s.astype(object)
+            elif pd.api.types.is_datetime64_dtype(s.dtype):
+                wide = pd.Series(s.dt.date, dtype=object)
+            elif pd.api.types.is_integer_dtype(s.dtype):
+                wide = s.astype("int64")
+            else:
+                wide = s
+            rows.append({"frame": name, "column": col, "dtype": str(s.dtype),
+                         "bytes": int(s.memory_usage(deep=True, index=False)),
+                         "default_bytes": int(wide.memory_usage(deep=True, index=False))})
+    report = pd.DataFrame(rows, columns=["frame", "column", "dtype", "bytes", "default_bytes"])
+    report["saved_pct"] = (100 * (1 - report["bytes"] / report["default_bytes"])).round(1)
+    return report
+
+
+# Single-flight: concurrent get_df calls for the same (query, params) wait for
+# one in-flight execution and share its result.
+_inflight = {}
+_inflight_lock = threading.Lock()
+_coalesce_stats = {"executed": 0, "coalesced": 0}
+
+
+def _single_flight(key, run):
+    with _inflight_lock:
+        flight = _inflight.get(key)
+        leader = flight is None
+        if leader:
+            flight = _inflight[key] = Future()
+            flight.followers = 0
+            _coalesce_stats["executed"] += 1
+        else:
+            flight.followers += 1
+            _coalesce_stats["coalesced"] += 1
+    if not leader:
+        # Each follower gets its own frame so callers can't mutate a shared one
+        return flight.result().copy()
+    try:
+        df = run()
+    except BaseException as e:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+        flight.set_exception(e)
+        raise
+    # No new followers once the key is gone. Existing ones copy a frame that
+    # is never returned, so the leader's caller can mutate its own result
+    # (app.py adds columns) while they copy.
+    with _inflight_lock:
+        _inflight.pop(key, None)
+        followers = flight.followers
+    flight.set_result(df.copy() if followers else df)
+    return df
+
+
+def count_flight(leader):
+    # For config_async's single-flight, which shares these counters
+    with _inflight_lock:
+        _coalesce_stats["executed" if leader else "coalesced"] += 1
+
+
+def coalesce_stats():
+    with _inflight_lock:
+        return dict(_coalesce_stats)
+
+
+def prepare_mode(query):
+    # psycopg's `prepare` argument: True prepares now, None defers to the
+    # connection's prepare_threshold, False never prepares
+    if not PREPARE_STATEMENTS:
+        return False
+    return True if query in _REGISTERED else None
+
+
+def _read(conn, query, params=None):
+    # Registered queries are prepared on first use on each connection and
+    # then only executed; everything else follows psycopg's prepare_threshold.
+    with conn.cursor() as cur:
+        cur.execute(query, params, prepare=prepare_mode(query))
+        columns = [c.name for c in cur.description]
+        return pd.DataFrame(cur.fetchall(), columns=columns)
+
+
+def _query(query, params=None, primary=False):
+    replica = None if primary else router.pick()
+    if replica is not None:
+        try:
+            with replica.pool.connection() as conn:
+                return _read(conn, query, params)
+        except (psycopg.OperationalError, PoolTimeout) as e:
+            router.mark_failed(replica, e)
+        except psycopg.errors.SerializationFailure:
+            # Cancelled by a recovery conflict on the standby; the replica is
+            # fine, just rerun this one on the primary
+            pass
+    try:
+        with connection() as conn:
+            return _read(conn, query, params)
+    except psycopg.OperationalError as e:
+        if not retryable(e):
+            raise
+        # The server or pooler dropped us: discard broken connections and retry once
+        pool.check()
+        with connection() as conn:
+            return _read(conn, query, params)
+
+
+def retryable(error):
+    # Only connection-level failures are worth a retry: a lost connection has
+    # no SQLSTATE, a server shutdown is admin_shutdown. Pool exhaustion
+    # (PoolTimeout) would wait DB_POOL_TIMEOUT again and a statement timeout
+    # (QueryCanceled) would rerun the whole query, so both propagate.
+    if isinstance(error, (PoolTimeout, psycopg.errors.QueryCanceled)):
+        return False
+    return error.sqlstate is None or isinstance(error, psycopg.errors.AdminShutdown)
+
+# Streaming mode for very large results: a server-side (named) cursor with
+# binary transfer keeps at most one chunk of Python row tuples alive.
+STREAM_CHUNK_SIZE = int(os.environ.get("DB_STREAM_CHUNK_SIZE", 50000))
+
+
+def _read_connection(primary=False):
+    # For the streaming readers: a replica connection when one is healthy.
+    # A replica failing mid-stream is not retried, the caller sees the error.
+    replica = None if primary else router.pick()
+    return replica.pool.connection() if replica is not None else connection()
+
+
+# Result column type oids that decide stream_dtypes
+_INT_OID_BITS = {21: 16, 23: 32}    # int2, int4
+_NUMERIC_OID = 1700
+
+
+def stream_dtypes(columns):
+    # columns: [(name, type oid)] of a streamed result -> cast(df) that gives
+    # every chunk the same dtypes, decided once from the schema. Unlike
+    # compact_dtypes this never looks at the values: ids become nullable
+    # Int16/Int32 (a chunk with NULLs keeps the dtype), dates datetime64,
+    # NUMERIC float64, and strings stay object since per-chunk categories
+    # would differ and pd.concat would fall back to object anyway.
+    plan = {}
+    for name, oid in columns:
+        bits = _INT_OID_BITS.get(oid)
+        if name in INT_COLUMNS and bits and np.iinfo(INT_COLUMNS[name]).bits >= bits:
+            plan[name] = INT_COLUMNS[name].capitalize()
+        elif name in DATE_COLUMNS:
+            plan[name] = "datetime64[ns]"
+        elif oid == _NUMERIC_OID:
+            plan[name] = "float64"
 
-def get_df(query, params=None):
-    df = pd.read_sql_query(query, conn, params=params)
+    def cast(df):
+        for col, dtype in plan.items():
+            if dtype == "float64":
+                df[col] = pd.to_numeric(df[col], errors="coerce").astype("float64")
+            elif dtype == "datetime64[ns]":
+                df[col] = pd.to_datetime(df[col]).astype("datetime64[ns]")
+            else:
+                df[col] = df[col].astype(dtype)
+        return df
+
+    return cast
+
+
+def iter_df(query, params=None, chunk_size=STREAM_CHUNK_SIZE, primary=False):
+    # Yields the result as DataFrames of at most chunk_size rows, all with the
+    # same dtypes (stream_dtypes), so pd.concat of the chunks keeps them
+    with _read_connection(primary) as conn:
+        # named cursors live inside a transaction (the pool is autocommit)
+        with conn.transaction():
+            with conn.cursor(name=f"stream_{uuid.uuid4().hex}", binary=True) as cur:
+                cur.itersize = chunk_size
+                cur.execute(query, params)
+                columns = [c.name for c in cur.description]
+                cast = stream_dtypes([(c.name, c.type_code) for c in cur.description])
+                while True:
+                    rows = cur.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    yield cast(pd.DataFrame.from_records(rows, columns=columns))
+
+
+def get_df_columnar(query, params=None, chunk_size=STREAM_CHUNK_SIZE, primary=False):
+    # Like get_df, but converts each fetched chunk straight into per-column
+    # arrays, so peak memory is the final columns plus one chunk of rows.
+    calls = getattr(_capture, "calls", None)
+    if calls is not None:
+        return calls.add(query, params)
+    with _read_connection(primary) as conn:
+        with conn.transaction():
+            with conn.cursor(name=f"stream_{uuid.uuid4().hex}", binary=True) as cur:
+                cur.itersize = chunk_size
+                cur.execute(query, params)
+                columns = [c.name for c in cur.description]
+                chunks = [[] for _ in columns]
+                while True:
+                    rows = cur.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    for i, values in enumerate(zip(*rows)):
+                        chunks[i].append(pd.Series(values))
+                    del rows
+    data = {}
+    for name, parts in zip(columns, chunks):
+        data[name] = pd.concat(parts, ignore_index=True) if parts else pd.Series([], dtype=object)
+        parts.clear()
+    return compact_dtypes(pd.DataFrame(data, columns=columns, copy=False))
+
+
+def _from_snapshot(name):
+    # Local Arrow snapshot (snapshot.py) when SNAPSHOT_DIR is set, else None
+    if getattr(_capture, "calls", None) is not None:
+        return None
+    return snapshot.load(name)
+
+
+def _rows_for(df, presentation_id, presentation_ids=None):
+    if presentation_id is not None:
+        return df[df["presentation_id"] == presentation_id].reset_index(drop=True)
+    if presentation_ids is not None:
+        return df[df["presentation_id"].isin(list(presentation_ids))].reset_index(drop=True)
     return df
 
 def ping_db():
   try:
-    with conn.cursor() as cur:
-      cur.execute("SELECT 1")
+    with connection() as conn:
+      conn.execute("SELECT 1")
       return True
-  except Exception:
+  except (psycopg.Error, PoolTimeout):
     return False
 
 
-def fetch_students():
-    query = """
+# Quartiles (percentile_cont, same interpolation as pandas' quantile) and
+# Tukey whisker ends (furthest scores within 1.5 IQR) of final scores per
+# value of a user_account column
+_FINAL_SCORE_BOX = """
+    WITH s AS (
+        SELECT u.{group} AS grp, f.final_score::float8 AS score
+        FROM mv_enrollment_final_score f
+          JOIN user_account u ON u.user_id = f.student_id
+        WHERE f.final_score IS NOT NULL AND u.{group} IS NOT NULL
+    ), q AS (
+        SELECT grp, COUNT(*) AS n, AVG(score) AS mean,
+               percentile_cont(ARRAY[0.25, 0.5, 0.75]) WITHIN GROUP (ORDER BY score) AS qs
+        FROM s
+        GROUP BY grp
+    )
+    SELECT q.grp AS {group}, q.n, q.mean, q.qs[1] AS q1, q.qs[2] AS median, q.qs[3] AS q3,
+           MIN(s.score) FILTER (WHERE s.score >= q.qs[1] - 1.5 * (q.qs[3] - q.qs[1])) AS lowerfence,
+           MAX(s.score) FILTER (WHERE s.score <= q.qs[3] + 1.5 * (q.qs[3] - q.qs[1])) AS upperfence
+    FROM q
+      JOIN s ON s.grp = q.grp
+    GROUP BY q.grp, q.n, q.mean, q.qs
+    ORDER BY q.grp;
+    """
+
+# Pearson correlation of each engagement feature with the final score, one
+# row per feature
+_ENGAGEMENT_SCORE_CORR = """
+    SELECT v.feature, corr(v.value, f.final_score::float8) AS corr, COUNT(*) AS n
+    FROM mv_enrollment_engagement g
+      JOIN mv_enrollment_final_score f ON f.enrollment_id = g.enrollment_id
+      -- total_clicks live from the rollup, like the Analytics scatter next to it
+      LEFT JOIN vle_enrollment_total t ON t.enrollment_id = g.enrollment_id
+      CROSS JOIN LATERAL (VALUES
+          ('total_clicks', COALESCE(t.clicks, 0)::float8),
+          ('active_days', g.active_days::float8),
+          ('clicks_per_week', g.clicks_per_week::float8),
+          ('max_streak_days', g.max_streak_days::float8),
+          ('days_since_last', g.days_since_last::float8)
+      ) AS v(feature, value)
+    WHERE f.final_score IS NOT NULL AND v.value IS NOT NULL {where}
+    GROUP BY v.feature
+    ORDER BY v.feature;
+    """
+
+# Every query issued by the fetch_* functions, by name. The texts are fixed:
+# optional filters are separate variants ("<name>:presentation",
+# "<name>:presentations") rather than SQL assembled per call, so each text is
+# prepared once per pooled connection (see _read) and Postgres can reuse its
+# plan. `python bench.py planning` reports the planning time this saves.
+QUERIES = {
+    "students": """
     SELECT user_id AS student_id, name, gender, region, highest_education, date_of_birth
     FROM user_account
     WHERE role = 'student'
     ORDER BY name;
-    """
-    return get_df(query)
-
-
-def fetch_instructors():
-    query = """
+    """,
+    "student_options": """
+    SELECT user_id AS student_id, name
+    FROM user_account
+    WHERE role = 'student'
+    ORDER BY name;
+    """,
+    # One student's whole profile as a single JSON document (see
+    # fetch_student_profile); every part is an index lookup by student_id
+    "student_profile": """
+    SELECT json_build_object(
+        'student', (
+            SELECT row_to_json(s) FROM (
+                SELECT user_id AS student_id, name, gender, region, highest_education, date_of_birth
+                FROM user_account
+                WHERE user_id = %(student_id)s AND role = 'student'
+            ) s),
+        'enrollments', COALESCE((
+            SELECT json_agg(x ORDER BY x.year DESC, x.semester, x.enrollment_id) FROM (
+                SELECT e.enrollment_id, e.presentation_id, p.semester, p.year,
+                       m.module_code, m.module_name, i.name AS instructor_name,
+                       e.final_result, e.studied_credits, f.final_score,
+                       COALESCE(t.clicks, 0) AS total_clicks,
+                       g.active_days, g.clicks_per_week, g.max_streak_days, g.days_since_last,
+                       g.top_vle_type, g.type_share
+                FROM enrollment e
+                  JOIN presentation p ON p.presentation_id = e.presentation_id
+                  JOIN course_module m ON m.module_id = p.module_id
+                  JOIN user_account i ON i.user_id = p.instructor_id
+                  LEFT JOIN mv_enrollment_final_score f ON f.enrollment_id = e.enrollment_id
+                  LEFT JOIN vle_enrollment_total t ON t.enrollment_id = e.enrollment_id
+                  LEFT JOIN mv_enrollment_engagement g ON g.enrollment_id = e.enrollment_id
+                WHERE e.student_id = %(student_id)s
+            ) x), '[]'),
+        'assessments', COALESCE((
+            SELECT json_agg(x ORDER BY x.enrollment_id, x.assessment_id) FROM (
+                SELECT e.enrollment_id, a.assessment_id, a.assessment_name, a.weight, sa.score
+                FROM enrollment e
+                  JOIN assessment a ON a.presentation_id = e.presentation_id
+                  LEFT JOIN student_assessment sa
+                    ON sa.assessment_id = a.assessment_id
+                   AND sa.enrollment_id = e.enrollment_id
+                WHERE e.student_id = %(student_id)s
+            ) x), '[]'),
+        'activity', COALESCE((
+            SELECT json_agg(x ORDER BY x.enrollment_id, x.activity_date, x.vle_type) FROM (
+                SELECT sva.enrollment_id, sva.activity_date, v.vle_type, SUM(sva.clicks) AS clicks
+                FROM enrollment e
+                  JOIN student_vle_activity sva ON sva.enrollment_id = e.enrollment_id
+                  JOIN vle_item v ON v.vle_id = sva.vle_id
+                WHERE e.student_id = %(student_id)s
+                GROUP BY sva.enrollment_id, sva.activity_date, v.vle_type
+            ) x), '[]')
+    ) AS profile;
+    """,
+    "instructors": """
     SELECT user_id AS instructor_id, name, department
     FROM user_account
     WHERE role = 'instructor'
     ORDER BY name;
-    """
-    return get_df(query)
-
-
-def fetch_presentations():
-    query = """
+    """,
+    "presentations": """
     SELECT p.presentation_id, p.semester, p.year,
            m.module_code, m.module_name,
            i.name AS instructor_name,
@@ -84,128 +578,162 @@ def fetch_presentations():
       JOIN course_module m ON p.module_id = m.module_id
       JOIN user_account i ON p.instructor_id = i.user_id
     ORDER BY p.year DESC, p.semester ASC;
-    """
-    return get_df(query)
-
-
-def fetch_enrollment(presentation_id):
-    query = """
+    """,
+    "enrollment": """
     SELECT e.enrollment_id, e.presentation_id, s.user_id AS student_id, s.name,
            e.studied_credits, e.final_result
     FROM enrollment e
       JOIN user_account s ON e.student_id = s.user_id
     WHERE e.presentation_id = %s AND s.role = 'student'
     ORDER BY s.name;
-    """
-    return get_df(query, params=(presentation_id,))
-
-
-def fetch_assessments(presentation_id):
-    query = """
+    """,
+    "assessments": """
     SELECT a.assessment_id, a.assessment_name, a.weight
     FROM assessment a
     WHERE a.presentation_id = %s
     ORDER BY a.assessment_id;
-    """
-    return get_df(query, params=(presentation_id,))
-
-
-def fetch_student_scores(enrollment_id):
-    query = """
+    """,
+    "student_scores": """
     SELECT sa.student_assessment_id, a.assessment_id, a.assessment_name, sa.score, a.weight
     FROM student_assessment sa
       JOIN assessment a ON sa.assessment_id = a.assessment_id
     WHERE sa.enrollment_id = %s;
-    """
-    return get_df(query, params=(enrollment_id,))
-
-
-def fetch_vle_activity(enrollment_id):
-    query = """
+    """,
+    # All student_assessment rows of one class in a single round trip
+    # (replaces calling fetch_student_scores once per enrollment).
+    "class_scores": """
+    SELECT sa.enrollment_id, sa.student_assessment_id, a.assessment_id,
+           a.assessment_name, sa.score, a.weight
+    FROM student_assessment sa
+      JOIN assessment a ON sa.assessment_id = a.assessment_id
+      JOIN enrollment e ON e.enrollment_id = sa.enrollment_id
+    WHERE e.presentation_id = %s
+    ORDER BY sa.enrollment_id, a.assessment_id;
+    """,
+    "vle_activity": """
     SELECT sva.vle_id, v.vle_type, v.title, sva.activity_date, sva.clicks
     FROM student_vle_activity sva
       JOIN vle_item v ON sva.vle_id = v.vle_id
     WHERE sva.enrollment_id = %s
     ORDER BY sva.activity_date;
-    """
-    return get_df(query, params=(enrollment_id,))
-
-
-def fetch_enrollments_all():
-    query = """
+    """,
+    "enrollments_all": """
     SELECT e.enrollment_id, e.presentation_id, e.student_id,
            e.final_result, e.studied_credits
     FROM enrollment e;
-    """
-    return get_df(query)
-
-
-def fetch_final_scores_all(presentation_id=None):
-    params = tuple()
-    where = ""
-    if presentation_id is not None:
-        where = "WHERE e.presentation_id = %s"
-        params = (presentation_id,)
-    query = f"""
-    SELECT e.enrollment_id,
-           e.presentation_id,
-           e.student_id,
-           CASE WHEN NULLIF(SUM(a.weight),0) IS NOT NULL
-                THEN SUM(sa.score * a.weight)::DECIMAL / NULLIF(SUM(a.weight),0)
-                ELSE NULL END AS final_score
+    """,
+    "enrollments_all:presentations": """
+    SELECT e.enrollment_id, e.presentation_id, e.student_id,
+           e.final_result, e.studied_credits
     FROM enrollment e
-      JOIN student_assessment sa ON sa.enrollment_id = e.enrollment_id
-      JOIN assessment a ON a.assessment_id = sa.assessment_id
-    {where}
-    GROUP BY e.enrollment_id, e.presentation_id, e.student_id;
-    """
-    return get_df(query, params=params if params else None)
-
-
-def fetch_final_results_distribution(presentation_id):
-    query = """
+    WHERE e.presentation_id = ANY(%s::int[]);
+    """,
+    # Enrolled / withdrawn counts per presentation, aggregated in Postgres
+    "enrollment_counts": """
+    SELECT presentation_id,
+           COUNT(*) AS enrolled,
+           COUNT(*) FILTER (WHERE LOWER(final_result) = 'withdrawn') AS withdrawn
+    FROM enrollment
+    GROUP BY presentation_id;
+    """,
+    "enrollment_counts:presentations": """
+    SELECT presentation_id,
+           COUNT(*) AS enrolled,
+           COUNT(*) FILTER (WHERE LOWER(final_result) = 'withdrawn') AS withdrawn
+    FROM enrollment
+    WHERE presentation_id = ANY(%s::int[])
+    GROUP BY presentation_id;
+    """,
+    # Pre-aggregated in mv_enrollment_final_score (migrations/001_summary_views.sql)
+    "final_scores_all": """
+    SELECT e.enrollment_id, e.presentation_id, e.student_id, e.final_score
+    FROM mv_enrollment_final_score e;
+    """,
+    "final_scores_all:presentation": """
+    SELECT e.enrollment_id, e.presentation_id, e.student_id, e.final_score
+    FROM mv_enrollment_final_score e
+    WHERE e.presentation_id = %s;
+    """,
+    "final_scores_all:presentations": """
+    SELECT e.enrollment_id, e.presentation_id, e.student_id, e.final_score
+    FROM mv_enrollment_final_score e
+    WHERE e.presentation_id = ANY(%s::int[]);
+    """,
+    # Assessment scores of one class, binned with width_bucket
+    "score_histogram": """
+    SELECT GREATEST(1, LEAST(width_bucket(sa.score::float8, %s::float8, %s::float8, %s), %s)) AS bucket,
+           COUNT(*) AS cnt
+    FROM student_assessment sa
+      JOIN enrollment e ON e.enrollment_id = sa.enrollment_id
+    WHERE e.presentation_id = %s
+    GROUP BY 1
+    ORDER BY 1;
+    """,
+    "final_score_histogram": """
+    SELECT GREATEST(1, LEAST(width_bucket(e.final_score::float8, %s::float8, %s::float8, %s), %s)) AS bucket,
+           COUNT(*) AS cnt
+    FROM mv_enrollment_final_score e
+    WHERE e.final_score IS NOT NULL
+    GROUP BY 1
+    ORDER BY 1;
+    """,
+    "final_score_histogram:presentation": """
+    SELECT GREATEST(1, LEAST(width_bucket(e.final_score::float8, %s::float8, %s::float8, %s), %s)) AS bucket,
+           COUNT(*) AS cnt
+    FROM mv_enrollment_final_score e
+    WHERE e.final_score IS NOT NULL AND e.presentation_id = %s
+    GROUP BY 1
+    ORDER BY 1;
+    """,
+    "final_score_histogram:presentations": """
+    SELECT GREATEST(1, LEAST(width_bucket(e.final_score::float8, %s::float8, %s::float8, %s), %s)) AS bucket,
+           COUNT(*) AS cnt
+    FROM mv_enrollment_final_score e
+    WHERE e.final_score IS NOT NULL AND e.presentation_id = ANY(%s::int[])
+    GROUP BY 1
+    ORDER BY 1;
+    """,
+    "final_results_distribution": """
     SELECT final_result, COUNT(*) AS cnt
     FROM enrollment
     WHERE presentation_id = %s
     GROUP BY final_result
     ORDER BY cnt DESC;
-    """
-    return get_df(query, params=(presentation_id,))
-
-
-def fetch_total_clicks_all(presentation_id=None):
-    params = tuple()
-    where = ""
-    if presentation_id is not None:
-        where = "WHERE e.presentation_id = %s"
-        params = (presentation_id,)
-    query = f"""
-    SELECT e.enrollment_id,
-           e.presentation_id,
-           COALESCE(SUM(sva.clicks),0) AS total_clicks
-    FROM student_vle_activity sva
-      RIGHT JOIN enrollment e ON e.enrollment_id = sva.enrollment_id
-    {where}
-    GROUP BY e.enrollment_id, e.presentation_id;
-    """
-    return get_df(query, params=params if params else None)
-
-
-def fetch_vle_avg_timeline_by_presentation(presentation_id):
-    query = """
-    SELECT sva.activity_date::date AS activity_date,
-           AVG(sva.clicks) AS avg_clicks
-    FROM student_vle_activity sva
-      JOIN enrollment e ON e.enrollment_id = sva.enrollment_id
-    WHERE e.presentation_id = %s
+    """,
+    # Per-enrollment totals kept current on ingest (migrations/003_vle_partitioning.sql)
+    "total_clicks_all": """
+    SELECT e.enrollment_id, e.presentation_id, COALESCE(t.clicks, 0) AS total_clicks
+    FROM enrollment e
+      LEFT JOIN vle_enrollment_total t ON t.enrollment_id = e.enrollment_id;
+    """,
+    "total_clicks_all:presentation": """
+    SELECT e.enrollment_id, e.presentation_id, COALESCE(t.clicks, 0) AS total_clicks
+    FROM enrollment e
+      LEFT JOIN vle_enrollment_total t ON t.enrollment_id = e.enrollment_id
+    WHERE e.presentation_id = %s;
+    """,
+    "total_clicks_all:presentations": """
+    SELECT e.enrollment_id, e.presentation_id, COALESCE(t.clicks, 0) AS total_clicks
+    FROM enrollment e
+      LEFT JOIN vle_enrollment_total t ON t.enrollment_id = e.enrollment_id
+    WHERE e.presentation_id = ANY(%s::int[]);
+    """,
+    # Average clicks per activity row and day, from the daily rollup
+    "vle_avg_timeline_by_presentation": """
+    SELECT activity_date,
+           SUM(clicks)::float8 / NULLIF(SUM(n_rows), 0) AS avg_clicks
+    FROM vle_presentation_type_daily
+    WHERE presentation_id = %s
     GROUP BY activity_date
     ORDER BY activity_date;
-    """
-    return get_df(query, params=(presentation_id,))
-
-
-def fetch_assessment_scores_by_enrollment(enrollment_id):
-    query = """
+    """,
+    "vle_weekly_by_type": """
+    SELECT week_start, vle_type, clicks
+    FROM vle_presentation_type_weekly
+    WHERE presentation_id = %s AND n_rows > 0
+    ORDER BY week_start, vle_type;
+    """,
+    "assessment_scores_by_enrollment": """
     SELECT a.assessment_id,
            a.assessment_name,
            a.weight,
@@ -218,18 +746,354 @@ def fetch_assessment_scores_by_enrollment(enrollment_id):
         SELECT presentation_id FROM enrollment WHERE enrollment_id = %s
     )
     ORDER BY a.assessment_id;
-    """
-    return get_df(query, params=(enrollment_id, enrollment_id))
+    """,
+    "students_by_module_counts": """
+    SELECT module_code, student_count
+    FROM mv_module_student_counts
+    ORDER BY student_count DESC;
+    """,
+    # Analytics summaries: a few rows per group instead of every enrollment
+    "final_score_box:gender": _FINAL_SCORE_BOX.format(group="gender"),
+    "final_score_box:region": _FINAL_SCORE_BOX.format(group="region"),
+    "engagement_score_corr": _ENGAGEMENT_SCORE_CORR.format(where=""),
+    "engagement_score_corr:presentations": _ENGAGEMENT_SCORE_CORR.format(
+        where="AND f.presentation_id = ANY(%s::int[])"),
+    "enrollment_trend": """
+    SELECT p.year, p.semester,
+           COUNT(*) AS enrolled,
+           COUNT(*) FILTER (WHERE LOWER(e.final_result) = 'withdrawn') AS withdrawn
+    FROM enrollment e
+      JOIN presentation p ON p.presentation_id = e.presentation_id
+    GROUP BY p.year, p.semester
+    ORDER BY p.year, p.semester;
+    """,
+    "enrollment_trend:presentations": """
+    SELECT p.year, p.semester,
+           COUNT(*) AS enrolled,
+           COUNT(*) FILTER (WHERE LOWER(e.final_result) = 'withdrawn') AS withdrawn
+    FROM enrollment e
+      JOIN presentation p ON p.presentation_id = e.presentation_id
+    WHERE e.presentation_id = ANY(%s::int[])
+    GROUP BY p.year, p.semester
+    ORDER BY p.year, p.semester;
+    """,
+    # Engagement features per enrollment (migrations/004_engagement_features.sql)
+    "engagement_features": """
+    SELECT enrollment_id, presentation_id, total_clicks, active_days, active_weeks, clicks_per_week,
+           peak_week_clicks, max_streak_days, first_activity, last_activity, days_since_last, top_vle_type
+    FROM mv_enrollment_engagement;
+    """,
+    "engagement_features:presentation": """
+    SELECT enrollment_id, presentation_id, total_clicks, active_days, active_weeks, clicks_per_week,
+           peak_week_clicks, max_streak_days, first_activity, last_activity, days_since_last, top_vle_type
+    FROM mv_enrollment_engagement
+    WHERE presentation_id = %s;
+    """,
+    "engagement_features:presentations": """
+    SELECT enrollment_id, presentation_id, total_clicks, active_days, active_weeks, clicks_per_week,
+           peak_week_clicks, max_streak_days, first_activity, last_activity, days_since_last, top_vle_type
+    FROM mv_enrollment_engagement
+    WHERE presentation_id = ANY(%s::int[]);
+    """,
+    "summary_status": """
+    SELECT view_name, refreshed_at,
+           EXTRACT(EPOCH FROM now() - refreshed_at) AS age_seconds
+    FROM summary_refresh
+    ORDER BY view_name;
+    """,
+}
+_REGISTERED = frozenset(QUERIES.values())
+
+
+def _variant(name, presentation_id=None, presentation_ids=None):
+    # Registry key and params for the optional presentation filter
+    if presentation_id is not None:
+        return f"{name}:presentation", (presentation_id,)
+    if presentation_ids is not None:
+        return f"{name}:presentations", (list(presentation_ids),)
+    return name, ()
+
+
+def fetch_students():
+    df = _from_snapshot("students")
+    if df is not None:
+        return df
+    return get_df(QUERIES["students"])
+
+
+def fetch_student_options():
+    # student_id + name only, for pickers
+    df = _from_snapshot("students")
+    if df is not None:
+        return df[["student_id", "name"]]
+    return get_df(QUERIES["student_options"])
+
+
+def fetch_instructors():
+    df = _from_snapshot("instructors")
+    if df is not None:
+        return df
+    return get_df(QUERIES["instructors"])
+
+
+def fetch_presentations():
+    df = _from_snapshot("presentations")
+    if df is not None:
+        return df
+    return get_df(QUERIES["presentations"])
+
+
+def fetch_enrollment(presentation_id):
+    df_enr, df_stu = _from_snapshot("enrollments_all"), _from_snapshot("students")
+    if df_enr is not None and df_stu is not None:
+        df = _rows_for(df_enr, presentation_id).merge(df_stu[["student_id", "name"]], on="student_id")
+        cols = ["enrollment_id", "presentation_id", "student_id", "name", "studied_credits", "final_result"]
+        return df[cols].sort_values("name", ignore_index=True)
+    return get_df(QUERIES["enrollment"], params=(presentation_id,))
+
+
+def fetch_assessments(presentation_id):
+    return get_df(QUERIES["assessments"], params=(presentation_id,))
+
+
+def fetch_student_scores(enrollment_id):
+    return get_df(QUERIES["student_scores"], params=(enrollment_id,))
+
+
+def fetch_class_scores(presentation_id):
+    return get_df(QUERIES["class_scores"], params=(presentation_id,))
+
+
+def fetch_vle_activity(enrollment_id, chunk_size=None):
+    if chunk_size:
+        return get_df_columnar(QUERIES["vle_activity"], params=(enrollment_id,), chunk_size=chunk_size)
+    return get_df(QUERIES["vle_activity"], params=(enrollment_id,))
+
+
+def fetch_enrollments_all(presentation_ids=None, chunk_size=None):
+    df = _from_snapshot("enrollments_all")
+    if df is not None:
+        return _rows_for(df, None, presentation_ids)
+    key, params = _variant("enrollments_all", presentation_ids=presentation_ids)
+    if chunk_size:
+        return get_df_columnar(QUERIES[key], params=params or None, chunk_size=chunk_size)
+    return get_df(QUERIES[key], params=params or None)
+
+
+def fetch_enrollment_counts(presentation_ids=None):
+    key, params = _variant("enrollment_counts", presentation_ids=presentation_ids)
+    return get_df(QUERIES[key], params=params or None)
+
+
+def fetch_final_scores_all(presentation_id=None, presentation_ids=None):
+    df = _from_snapshot("final_scores_all")
+    if df is not None:
+        return _rows_for(df, presentation_id, presentation_ids)
+    key, params = _variant("final_scores_all", presentation_id, presentation_ids)
+    return get_df(QUERIES[key], params=params or None)
+
+
+# Histograms are binned in Postgres (width_bucket over a fixed score range),
+# so only `bins` rows are transferred however many scores there are.
+SCORE_RANGE = (0, 100)
+
+
+def _with_bin_edges(df, bins, lo=SCORE_RANGE[0], hi=SCORE_RANGE[1]):
+    # bucket (1..bins), cnt -> every bucket with its edges, empty ones as 0
+    width = (hi - lo) / bins
+    counts = df.set_index("bucket")["cnt"] if not df.empty else pd.Series(dtype="int64")
+    out = counts.reindex(range(1, bins + 1), fill_value=0).rename_axis("bucket").reset_index(name="cnt")
+    out["bin_start"] = lo + (out["bucket"] - 1) * width
+    out["bin_end"] = out["bin_start"] + width
+    return out[["bucket", "bin_start", "bin_end", "cnt"]]
+
+
+@async_post(lambda df, presentation_id, bins=20: _with_bin_edges(df, bins))
+def fetch_score_histogram(presentation_id, bins=20):
+    df = get_df(QUERIES["score_histogram"], params=(*SCORE_RANGE, bins, bins, presentation_id))
+    return _with_bin_edges(df, bins)
+
+
+@async_post(lambda df, presentation_id=None, presentation_ids=None, bins=20: _with_bin_edges(df, bins))
+def fetch_final_score_histogram(presentation_id=None, presentation_ids=None, bins=20):
+    # Weighted final scores (mv_enrollment_final_score) of one class or a set
+    df = _from_snapshot("final_scores_all")
+    if df is not None:
+        lo, hi = SCORE_RANGE
+        scores = _rows_for(df, presentation_id, presentation_ids)["final_score"].dropna().astype(float)
+        bucket = np.clip(np.floor((scores - lo) / (hi - lo) * bins) + 1, 1, bins).astype(int)
+        return _with_bin_edges(bucket.value_counts().rename_axis("bucket").reset_index(name="cnt"), bins)
+    key, params = _variant("final_score_histogram", presentation_id, presentation_ids)
+    return _with_bin_edges(get_df(QUERIES[key], params=(*SCORE_RANGE, bins, bins, *params)), bins)
+
+
+def fetch_final_results_distribution(presentation_id):
+    df = _from_snapshot("enrollments_all")
+    if df is not None:
+        counts = _rows_for(df, presentation_id)["final_result"].value_counts()
+        counts = counts[counts > 0]  # categorical value_counts lists unused categories too
+        return counts.rename_axis("final_result").reset_index(name="cnt")
+    return get_df(QUERIES["final_results_distribution"], params=(presentation_id,))
+
+
+# The Classes page's per-class frames, fetched concurrently with
+# config_async.gather_frames (each takes the presentation_id)
+CLASS_PAGE_FETCHES = {
+    "enroll": fetch_enrollment,
+    "class_scores": fetch_class_scores,
+    "final": fetch_final_scores_all,
+    "results": fetch_final_results_distribution,
+    "assessments": fetch_assessments,
+    "score_hist": fetch_score_histogram,
+    "final_hist": fetch_final_score_histogram,
+}
+
+
+def fetch_total_clicks_all(presentation_id=None, presentation_ids=None):
+    df = _from_snapshot("total_clicks_all")
+    if df is not None:
+        return _rows_for(df, presentation_id, presentation_ids)
+    key, params = _variant("total_clicks_all", presentation_id, presentation_ids)
+    return get_df(QUERIES[key], params=params or None)
+
+
+def fetch_vle_avg_timeline_by_presentation(presentation_id):
+    return get_df(QUERIES["vle_avg_timeline_by_presentation"], params=(presentation_id,))
+
+
+def fetch_vle_weekly_by_type(presentation_id):
+    return get_df(QUERIES["vle_weekly_by_type"], params=(presentation_id,))
+
+
+def fetch_assessment_scores_by_enrollment(enrollment_id):
+    return get_df(QUERIES["assessment_scores_by_enrollment"], params=(enrollment_id, enrollment_id))
 
 
 def fetch_students_by_module_counts():
-    query = """
-    SELECT m.module_code,
-           COUNT(*) AS student_count
-    FROM enrollment e
-      JOIN presentation p ON p.presentation_id = e.presentation_id
-      JOIN course_module m ON m.module_id = p.module_id
-    GROUP BY m.module_code
-    ORDER BY student_count DESC;
-    """
-    return get_df(query)
+    df = _from_snapshot("students_by_module_counts")
+    if df is not None:
+        return df
+    return get_df(QUERIES["students_by_module_counts"])
+
+
+BOX_COLUMNS = ["n", "mean", "q1", "median", "q3", "lowerfence", "upperfence"]
+
+
+def _box_stats(df, group, value):
+    # pandas equivalent of _FINAL_SCORE_BOX, for snapshot mode
+    rows = []
+    for key, s in df.dropna(subset=[group, value]).groupby(group, observed=True)[value]:
+        s = s.astype(float)
+        q1, median, q3 = s.quantile([0.25, 0.5, 0.75])
+        iqr = q3 - q1
+        rows.append({group: key, "n": len(s), "mean": s.mean(), "q1": q1, "median": median, "q3": q3,
+                     "lowerfence": s[s >= q1 - 1.5 * iqr].min(), "upperfence": s[s <= q3 + 1.5 * iqr].max()})
+    return pd.DataFrame(rows, columns=[group, *BOX_COLUMNS])
+
+
+def fetch_final_score_box(group="gender"):
+    # Box plot statistics of final scores per gender or region, all classes
+    df_scores, df_stu = _from_snapshot("final_scores_all"), _from_snapshot("students")
+    if df_scores is not None and df_stu is not None:
+        return _box_stats(df_scores.merge(df_stu[["student_id", group]], on="student_id"), group, "final_score")
+    return get_df(QUERIES[f"final_score_box:{group}"])
+
+
+def fetch_engagement_features(presentation_id=None, presentation_ids=None):
+    # Precomputed per-enrollment features (mv_enrollment_engagement):
+    # total_clicks, active_days, active_weeks, clicks_per_week,
+    # peak_week_clicks, max_streak_days, first/last_activity, days_since_last
+    # and top_vle_type. type_share is only in fetch_student_profile.
+    key, params = _variant("engagement_features", presentation_id, presentation_ids)
+    return get_df(QUERIES[key], params=params or None)
+
+
+def fetch_engagement_score_corr(presentation_ids=None):
+    # feature, corr, n: correlation of each engagement feature with final_score
+    key, params = _variant("engagement_score_corr", presentation_ids=presentation_ids)
+    return get_df(QUERIES[key], params=params or None)
+
+
+def fetch_enrollment_trend(presentation_ids=None):
+    # Enrolled / withdrawn per semester, in calendar order
+    df_enr, df_pres = _from_snapshot("enrollments_all"), _from_snapshot("presentations")
+    if df_enr is not None and df_pres is not None:
+        df = _rows_for(df_enr, None, presentation_ids).merge(
+            df_pres[["presentation_id", "year", "semester"]], on="presentation_id")
+        df["withdrawn"] = df["final_result"].astype(str).str.lower().eq("withdrawn")
+        out = df.groupby(["year", "semester"], observed=True).agg(
+            enrolled=("enrollment_id", "size"), withdrawn=("withdrawn", "sum"))
+        return out.reset_index().sort_values(["year", "semester"], ignore_index=True)
+    key, params = _variant("enrollment_trend", presentation_ids=presentation_ids)
+    return get_df(QUERIES[key], params=params or None)
+
+
+# fetch_student_profile keeps the last PROFILE_CACHE_SIZE profiles in process
+# (LRU), each for at most PROFILE_CACHE_TTL seconds.
+PROFILE_CACHE_SIZE = int(os.environ.get("PROFILE_CACHE_SIZE", 256))
+PROFILE_CACHE_TTL = float(os.environ.get("PROFILE_CACHE_TTL", 300))
+PROFILE_COLUMNS = {
+    "student": ["student_id", "name", "gender", "region", "highest_education", "date_of_birth"],
+    "enrollments": ["enrollment_id", "presentation_id", "semester", "year", "module_code", "module_name",
+                    "instructor_name", "final_result", "studied_credits", "final_score", "total_clicks",
+                    "active_days", "clicks_per_week", "max_streak_days", "days_since_last",
+                    "top_vle_type", "type_share"],
+    "assessments": ["enrollment_id", "assessment_id", "assessment_name", "weight", "score"],
+    "activity": ["enrollment_id", "activity_date", "vle_type", "clicks"],
+}
+_profiles = OrderedDict()  # student_id -> (loaded_at, frames)
+_profiles_lock = threading.Lock()
+
+
+def fetch_student_profile(student_id):
+    # One round trip for everything the Students page shows about a student:
+    # {"student": 1 row, "enrollments": with class, final_score and
+    # total_clicks, "assessments": every assessment of those classes with the
+    # score or NaN, "activity": clicks per enrollment, day and vle_type}
+    student_id = int(student_id)
+    with _profiles_lock:
+        hit = _profiles.get(student_id)
+        if hit is not None and time.monotonic() - hit[0] < PROFILE_CACHE_TTL:
+            _profiles.move_to_end(student_id)
+            return {k: v.copy() for k, v in hit[1].items()}
+    df = get_df(QUERIES["student_profile"], params={"student_id": student_id})
+    if getattr(_capture, "calls", None) is not None:
+        return {part: pd.DataFrame(columns=cols) for part, cols in PROFILE_COLUMNS.items()}
+    doc = df["profile"].iloc[0] if not df.empty else None
+    if isinstance(doc, str):
+        doc = json.loads(doc)
+    # doc may be shared with single-flight followers: read it, never mutate it.
+    # An unknown student_id gives empty frames.
+    doc = doc or {}
+    parts = {part: doc.get(part) or [] for part in PROFILE_COLUMNS}
+    parts["student"] = [doc["student"]] if doc.get("student") else []
+    frames = {part: compact_dtypes(pd.DataFrame(parts[part], columns=cols)) for part, cols in PROFILE_COLUMNS.items()}
+    with _profiles_lock:
+        _profiles[student_id] = (time.monotonic(), frames)
+        _profiles.move_to_end(student_id)
+        while len(_profiles) > PROFILE_CACHE_SIZE:
+            _profiles.popitem(last=False)
+    return {k: v.copy() for k, v in frames.items()}
+
+
+def refresh_summaries():
+    # Rebuilds the materialized summary views and stamps summary_refresh.
+    with connection() as conn:
+        conn.execute("SELECT refresh_summaries()")
+    invalidate_tables("mv_enrollment_final_score", "mv_module_student_counts", "mv_enrollment_engagement",
+                      "summary_refresh")
+
+
+def invalidate_tables(*tables):
+    # Drop every shared-cache entry whose query reads one of these tables
+    cache = querycache.backend()
+    if cache is not None and tables:
+        cache.invalidate_tables([t.lower() for t in tables])
+    if {t.lower() for t in tables} & set(querycache.tables_of(QUERIES["student_profile"])):
+        with _profiles_lock:
+            _profiles.clear()
+
+
+def fetch_summary_status():
+    # Read right after refresh_summaries(); a lagging replica would show the old stamp
+    return get_df(QUERIES["summary_status"], primary=True)
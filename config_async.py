@@ -0,0 +1,170 @@
+"""Asyncio counterpart of config.py.
+
+Runs the same fetch_* queries over psycopg's AsyncConnection and an
+AsyncConnectionPool so that a page's independent queries can be issued
+concurrently; page latency then approaches the slowest query instead of the
+sum of all of them.
+
+Streamlit executes scripts in plain threads without an event loop, so the pool
+lives on one background loop thread and `gather_frames` submits to it:
+
+    frames = gather_frames({
+        "enroll": (fetch_enrollment, pres_id),
+        "final": (fetch_final_scores_all, pres_id),
+    })
+"""
+import asyncio
+import threading
+import time
+
+import pandas as pd
+import psycopg
+from psycopg_pool import AsyncConnectionPool, PoolTimeout
+
+import config
+import metrics
+import querycache
+import snapshot
+
+_loop = None
+_loop_lock = threading.Lock()
+_pools = {}     # dsn -> (pool, open() task); the primary and each replica
+
+
+def _background_loop():
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="db-async-loop", daemon=True).start()
+    return _loop
+
+
+async def _get_pool(dsn=None):
+    # Everything runs on the one background loop, so the check-and-create
+    # below cannot interleave; later callers await the same open() task.
+    dsn = dsn or config.DB_URL
+    if dsn not in _pools:
+        pool = AsyncConnectionPool(
+            dsn,
+            min_size=config.POOL_MIN_SIZE,
+            max_size=config.POOL_MAX_SIZE,
+            timeout=config.POOL_TIMEOUT,
+            max_idle=config.POOL_MAX_IDLE,
+            max_lifetime=config.POOL_MAX_LIFETIME,
+            kwargs={"autocommit": True, "prepare_threshold": config.PREPARE_THRESHOLD},
+            check=AsyncConnectionPool.check_connection,
+            open=False,
+        )
+        _pools[dsn] = (pool, asyncio.ensure_future(pool.open()))
+    pool, opened = _pools[dsn]
+    await opened
+    return pool
+
+
+async def _fetch(pool, query, params):
+    async with pool.connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(query, params, prepare=config.prepare_mode(query))
+            rows = await cur.fetchall()
+            columns = [c.name for c in cur.description]
+    return config.compact_dtypes(pd.DataFrame(rows, columns=columns))
+
+
+async def _query(query, params=None, primary=False):
+    # Replica selection and fallback are shared with config.get_df (config.router)
+    replica = None if primary else config.router.pick()
+    if replica is not None:
+        try:
+            return await _fetch(await _get_pool(replica.dsn), query, params)
+        except (psycopg.OperationalError, PoolTimeout) as e:
+            config.router.mark_failed(replica, e)
+        except psycopg.errors.SerializationFailure:
+            pass
+    pool = await _get_pool()
+    for attempt in (1, 2):
+        try:
+            return await _fetch(pool, query, params)
+        except psycopg.OperationalError as e:
+            # Same policy as config.get_df: drop broken connections, retry once
+            if attempt == 2 or not config.retryable(e):
+                raise
+            await pool.check()
+
+
+async def _cached_query(key, query, params):
+    # -> (df, source, db seconds), the same bookkeeping as config._cached_query
+    if querycache.backend() is not None:
+        df = querycache.lookup(key)
+        if df is not None:
+            return df, "shared_cache", 0.0
+    started = time.perf_counter()
+    df = await _query(query, params)
+    db_seconds = time.perf_counter() - started
+    if querycache.backend() is not None:
+        querycache.store(key, df, querycache.tables_of(query))
+    return df, "db", db_seconds
+
+
+_inflight = {}  # key -> [asyncio.Future, followers]; only touched on the background loop
+
+
+async def get_df_async(query, params=None, name="get_df_async"):
+    # Instrumented like config.get_df: metrics per query name and source, and
+    # concurrent identical queries share one execution (counted in coalesce_stats)
+    started = time.perf_counter()
+    key = querycache.make_key(query, params)
+    entry = _inflight.get(key)
+    config.count_flight(entry is None)
+    if entry is not None:
+        entry[1] += 1
+        df, source, db_seconds = (await asyncio.shield(entry[0])).copy(), "coalesced", 0.0
+    else:
+        flight = asyncio.get_running_loop().create_future()
+        entry = _inflight[key] = [flight, 0]
+        try:
+            df, source, db_seconds = await _cached_query(key, query, params)
+        except BaseException as e:
+            flight.set_exception(e)
+            flight.exception()  # retrieved here, so an unawaited failure isn't logged twice
+            raise
+        else:
+            # Followers copy a frame the leader's caller never gets (see config._single_flight)
+            flight.set_result(df.copy() if entry[1] else df)
+        finally:
+            _inflight.pop(key, None)
+    metrics.record_query(name, source, time.perf_counter() - started, db_seconds, len(df), metrics.frame_bytes(df))
+    return df
+
+
+async def afetch(fn, *args):
+    # Async version of a config.fetch_* function that issues one query: the
+    # SQL is taken from the sync function itself so both paths always run the
+    # same query. A fetch_* that reshapes the result must declare how with
+    # @config.async_post; any other is rejected rather than returned raw.
+    if snapshot.enabled():
+        return await asyncio.to_thread(fn, *args)
+    with config.capture_queries() as calls:
+        try:
+            result = fn(*args)
+        except Exception as e:
+            raise ValueError(f"{fn.__name__} cannot be captured for afetch: {e}") from e
+    if len(calls) != 1:
+        raise ValueError(f"{fn.__name__} issues {len(calls)} queries; afetch expects one")
+    post = getattr(fn, "async_post", None)
+    if post is None and result is not calls.frames[0]:
+        raise ValueError(f"{fn.__name__} post-processes its query result; mark it with @config.async_post")
+    query, params = calls[0]
+    df = await get_df_async(query, params, name=fn.__name__)
+    return post(df, *args) if post is not None else df
+
+
+async def gather_frames_async(calls):
+    results = await asyncio.gather(*(afetch(fn, *args) for fn, *args in calls.values()))
+    return dict(zip(calls, results))
+
+
+def gather_frames(calls):
+    # calls: {name: (fetch_fn, *args)} -> {name: DataFrame}, run concurrently
+    future = asyncio.run_coroutine_threadsafe(gather_frames_async(calls), _background_loop())
+    return future.result()
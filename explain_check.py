@@ -0,0 +1,128 @@
+"""EXPLAIN regression check for every fetch_* query in config.py.
+
+Runs each query against a local Postgres with sequential scans disabled and
+fails if the planner still has to seq-scan one of the large tables, i.e. no
+index can serve the query.
+
+    python explain_check.py --dsn postgresql://postgres@localhost/tubes --load
+"""
+import argparse
+import inspect
+import json
+import os
+import sys
+from pathlib import Path
+
+import psycopg
+
+# Only used for its fetch_* functions under capture_queries(), which records
+# the SQL without running it; config's pool opens lazily on the first real
+# query, so neither the import nor the capture touches its database. Every
+# EXPLAIN below runs on the --dsn connection.
+import config
+
+HERE = Path(__file__).resolve().parent
+
+LARGE_TABLES = {"user_account", "enrollment", "student_assessment", "student_vle_activity",
+                "vle_enrollment_daily", "vle_enrollment_weekly", "vle_presentation_type_daily"}
+
+# Queries that read a whole table on purpose
+FULL_SCAN_OK = {
+    "fetch_enrollments_all": {"enrollment"},
+    "fetch_total_clicks_all": {"enrollment"},
+    "fetch_final_score_box": {"user_account"},
+    "fetch_enrollment_trend": {"enrollment"},
+}
+
+
+def load_schema(conn):
+    sql = (HERE / "db.sql").read_text()
+    # db.sql starts with CREATE DATABASE, which cannot run inside the target DB
+    sql = "\n".join(l for l in sql.splitlines() if not l.upper().startswith("CREATE DATABASE"))
+    conn.execute(sql)
+    for path in sorted((HERE / "migrations").glob("*.sql")):
+        conn.execute(path.read_text())
+
+
+def sample_args(conn):
+    pid, eid, sid = conn.execute(
+        "SELECT presentation_id, enrollment_id, student_id FROM enrollment ORDER BY enrollment_id LIMIT 1"
+    ).fetchone()
+    return {"presentation_id": pid, "presentation_ids": [pid], "enrollment_id": eid, "student_id": sid}
+
+
+def call_variants(fn, samples):
+    # Yields the keyword arguments each fetch_* should be checked with: the
+    # required args only, plus each optional filter set to a real value.
+    sig = inspect.signature(fn)
+    required, optional = {}, []
+    for name, param in sig.parameters.items():
+        if param.default is inspect.Parameter.empty:
+            if name not in samples:
+                return
+            required[name] = samples[name]
+        elif name in samples:
+            optional.append(name)
+    yield required
+    for name in optional:
+        yield {**required, name: samples[name]}
+
+
+def partition_parents(conn):
+    # Plans name the scanned partition; map it back to its partitioned table
+    return dict(conn.execute("""
+        SELECT c.relname, p.relname
+        FROM pg_inherits i
+          JOIN pg_class c ON c.oid = i.inhrelid
+          JOIN pg_class p ON p.oid = i.inhparent
+    """).fetchall())
+
+
+def seq_scans(plan, parents=None):
+    found = []
+    if plan.get("Node Type") == "Seq Scan":
+        name = plan.get("Relation Name")
+        found.append((parents or {}).get(name, name))
+    for child in plan.get("Plans", []):
+        found.extend(seq_scans(child, parents))
+    return found
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--dsn", default=os.environ.get("EXPLAIN_DATABASE_URL") or os.environ.get("DATABASE_URL"))
+    ap.add_argument("--load", action="store_true", help="load db.sql and migrations/ into the database first")
+    args = ap.parse_args()
+    if not args.dsn:
+        ap.error("pass --dsn or set EXPLAIN_DATABASE_URL")
+
+    failures = 0
+    with psycopg.connect(args.dsn, autocommit=True) as conn:
+        if args.load:
+            load_schema(conn)
+        conn.execute("SET enable_seqscan = off")
+        samples = sample_args(conn)
+        parents = partition_parents(conn)
+        fetchers = [(n, f) for n, f in vars(config).items() if n.startswith("fetch_") and callable(f)]
+        for name, fn in sorted(fetchers):
+            for call_args in call_variants(fn, samples):
+                with config.capture_queries() as calls:
+                    fn(**call_args)
+                for query, params in calls:
+                    plan = conn.execute("EXPLAIN (FORMAT JSON) " + query, params).fetchone()[0]
+                    if isinstance(plan, str):
+                        plan = json.loads(plan)
+                    scans = set(seq_scans(plan[0]["Plan"], parents)) & LARGE_TABLES
+                    scans -= FULL_SCAN_OK.get(name, set())
+                    status = "FAIL" if scans else "ok"
+                    failures += bool(scans)
+                    detail = f" seq scan on {', '.join(sorted(scans))}" if scans else ""
+                    args_repr = ", ".join(f"{k}={v!r}" for k, v in call_args.items())
+                    print(f"{status:4} {name}({args_repr}){detail}")
+
+    print(f"\n{failures} regression(s)")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
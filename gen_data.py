@@ -0,0 +1,227 @@
+"""Synthetic OULAD-scale data for the db.sql schema.
+
+Fills a (local) database that already has db.sql + migrations/ applied with
+realistic volumes and distributions. Scale 1.0 is roughly the public OULAD
+dataset: ~32.6k students/enrollments, 22 presentations, ~200 assessments,
+~6.4k VLE items and ~10.6M student_vle_activity rows.
+
+    python gen_data.py --dsn postgresql://postgres@localhost/tubes --scale 0.1 --reset
+"""
+import argparse
+import io
+import time
+
+import numpy as np
+import pandas as pd
+import psycopg
+
+OULAD_STUDENTS = 32593
+OULAD_PRESENTATIONS = 22
+ASSESSMENTS_PER_PRESENTATION = 9
+VLE_ITEMS_PER_PRESENTATION = 290
+VLE_ROWS_PER_ENROLLMENT = 325
+PRESENTATION_DAYS = 260
+
+MODULES = [
+    ("AAA", "Social Science Intro", 1, 30), ("BBB", "Psychology and Health", 1, 30),
+    ("CCC", "Engineering First", 1, 30), ("DDD", "Biological Science", 2, 60),
+    ("EEE", "Environmental Studies", 2, 60), ("FFF", "Data Analysis", 3, 60),
+    ("GGG", "Research Methods", 3, 60),
+]
+REGIONS = {
+    "Scotland": 0.106, "East Anglian Region": 0.102, "London Region": 0.099, "South Region": 0.094,
+    "North Western Region": 0.087, "West Midlands Region": 0.079, "South West Region": 0.074,
+    "East Midlands Region": 0.072, "South East Region": 0.065, "Wales": 0.065,
+    "Yorkshire Region": 0.062, "North Region": 0.055, "Ireland": 0.040,
+}
+EDUCATION = {
+    "A Level or Equivalent": 0.43, "Lower Than A Level": 0.40, "HE Qualification": 0.145,
+    "No Formal quals": 0.011, "Post Graduate Qualification": 0.014,
+}
+FINAL_RESULT = {"Pass": 0.379, "Withdrawn": 0.312, "Fail": 0.216, "Distinction": 0.093}
+# Relative activity level by outcome (withdrawn students stop early)
+ACTIVITY_BY_RESULT = {"Distinction": 1.6, "Pass": 1.2, "Fail": 0.6, "Withdrawn": 0.35}
+VLE_TYPES = {
+    "forumng": 0.23, "homepage": 0.20, "oucontent": 0.18, "subpage": 0.12, "resource": 0.10,
+    "url": 0.07, "quiz": 0.06, "ouwiki": 0.02, "oucollaborate": 0.02,
+}
+ASSESSMENT_KINDS = ["TMA", "TMA", "TMA", "CMA", "CMA", "CMA", "TMA", "CMA", "Exam"]
+
+
+def choice(rng, table, size):
+    keys = list(table)
+    p = np.array(list(table.values()), dtype=float)
+    return rng.choice(keys, size=size, p=p / p.sum())
+
+
+def copy_frame(conn, table, df):
+    # COPY ... FROM STDIN in CSV; much faster than row-by-row INSERT
+    buf = io.StringIO()
+    df.to_csv(buf, index=False, header=False, na_rep="")
+    with conn.cursor() as cur:
+        with cur.copy(f"COPY {table} ({', '.join(df.columns)}) FROM STDIN WITH (FORMAT csv)") as cp:
+            cp.write(buf.getvalue())
+    return len(df)
+
+
+def generate(conn, scale, seed, chunk_rows):
+    rng = np.random.default_rng(seed)
+    n_students = max(10, int(OULAD_STUDENTS * scale))
+    n_pres = max(2, int(round(OULAD_PRESENTATIONS * max(scale, 0.1))))
+    n_instr = max(5, n_pres // 4)
+    counts = {}
+
+    # user_account: instructors first, then students
+    instr_ids = np.arange(1, n_instr + 1)
+    instructors = pd.DataFrame({
+        "user_id": instr_ids, "role": "instructor",
+        "username": [f"inst_{i:04d}" for i in instr_ids],
+        "email": [f"inst{i:04d}@univ.ac.id" for i in instr_ids],
+        "name": [f"Instructor {i}" for i in instr_ids],
+        "date_of_birth": pd.to_datetime("1965-01-01") + pd.to_timedelta(rng.integers(0, 7000, n_instr), unit="D"),
+        "gender": rng.choice(["M", "F"], n_instr),
+        "department": rng.choice(["Science", "Maths", "Computing", "Psychology", "Social Science"], n_instr),
+    })
+    student_ids = np.arange(n_instr + 1, n_instr + n_students + 1)
+    students = pd.DataFrame({
+        "user_id": student_ids, "role": "student",
+        "username": [f"std_{i}" for i in student_ids],
+        "email": [f"{i}@student.univ.ac.id" for i in student_ids],
+        "name": [f"Student {i}" for i in student_ids],
+        # age bands skew young: most 20-35
+        "date_of_birth": pd.to_datetime("1996-01-01") - pd.to_timedelta(
+            np.clip(rng.gamma(2.0, 3000, n_students), 0, 20000).astype(int), unit="D"),
+        "gender": rng.choice(["M", "F"], n_students, p=[0.55, 0.45]),
+        "region": choice(rng, REGIONS, n_students),
+        "highest_education": choice(rng, EDUCATION, n_students),
+        "disability": rng.random(n_students) < 0.097,
+    })
+    counts["user_account"] = copy_frame(conn, "user_account", instructors) + copy_frame(conn, "user_account", students)
+    counts["course_module"] = copy_frame(conn, "course_module", pd.DataFrame(
+        [(i + 1, *m) for i, m in enumerate(MODULES)],
+        columns=["module_id", "module_code", "module_name", "level", "credits"]))
+
+    # presentation: modules cycled over years and B (Feb) / J (Oct) semesters
+    pres_ids = np.arange(1, n_pres + 1)
+    years = 2013 + (pres_ids - 1) // (2 * len(MODULES))
+    sem_code = np.where(((pres_ids - 1) // len(MODULES)) % 2 == 0, "B", "J")
+    presentations = pd.DataFrame({
+        "presentation_id": pres_ids,
+        "module_id": (pres_ids - 1) % len(MODULES) + 1,
+        "instructor_id": rng.choice(instr_ids, n_pres),
+        "semester": [f"{y}{c}" for y, c in zip(years, sem_code)],
+        "year": years,
+    })
+    counts["presentation"] = copy_frame(conn, "presentation", presentations)
+    pres_start = pd.to_datetime([f"{y}-{'02' if c == 'B' else '10'}-01" for y, c in zip(years, sem_code)])
+
+    # enrollment: one per student, class sizes skewed (popular modules are bigger)
+    class_weight = rng.lognormal(0, 0.6, n_pres)
+    enr_pres = rng.choice(pres_ids, n_students, p=class_weight / class_weight.sum())
+    results = choice(rng, FINAL_RESULT, n_students)
+    enrollments = pd.DataFrame({
+        "enrollment_id": np.arange(1, n_students + 1),
+        "student_id": student_ids,
+        "presentation_id": enr_pres,
+        "final_result": results,
+        "studied_credits": rng.choice([30, 60, 60, 90, 120], n_students),
+    })
+    counts["enrollment"] = copy_frame(conn, "enrollment", enrollments)
+
+    # assessment: ~9 per presentation, exam weight 100, TMA/CMA weights sum to 100
+    rows = []
+    aid = 1
+    for pid in pres_ids:
+        w = rng.dirichlet(np.ones(ASSESSMENTS_PER_PRESENTATION - 1)) * 100
+        for k, kind in enumerate(ASSESSMENT_KINDS):
+            rows.append((aid, pid, kind, 100 if kind == "Exam" else int(round(w[k]))))
+            aid += 1
+    assessments = pd.DataFrame(rows, columns=["assessment_id", "presentation_id", "assessment_name", "weight"])
+    counts["assessment"] = copy_frame(conn, "assessment", assessments)
+
+    # student_assessment: submission probability and score depend on outcome
+    by_pres = assessments.groupby("presentation_id")["assessment_id"].apply(np.array)
+    submit_p = enrollments["final_result"].map({"Distinction": 0.97, "Pass": 0.92, "Fail": 0.7, "Withdrawn": 0.25})
+    mean_score = enrollments["final_result"].map({"Distinction": 88, "Pass": 74, "Fail": 52, "Withdrawn": 60})
+    sa = []
+    for enr_id, pid, p, mu in zip(enrollments["enrollment_id"], enrollments["presentation_id"], submit_p, mean_score):
+        ids = by_pres[pid]
+        done = ids[rng.random(len(ids)) < p]
+        if len(done):
+            scores = np.clip(rng.normal(mu, 12, len(done)), 0, 100).astype(int)
+            sa.append(pd.DataFrame({"enrollment_id": enr_id, "assessment_id": done, "score": scores}))
+    sa = pd.concat(sa, ignore_index=True)
+    sa.insert(0, "student_assessment_id", np.arange(1, len(sa) + 1))
+    counts["student_assessment"] = copy_frame(conn, "student_assessment", sa)
+
+    # vle_item
+    n_items = VLE_ITEMS_PER_PRESENTATION * n_pres
+    items = pd.DataFrame({
+        "vle_id": np.arange(1, n_items + 1),
+        "presentation_id": np.repeat(pres_ids, VLE_ITEMS_PER_PRESENTATION),
+        "vle_type": choice(rng, VLE_TYPES, n_items),
+    })
+    items["title"] = items["vle_type"] + " " + items["vle_id"].astype(str)
+    counts["vle_item"] = copy_frame(conn, "vle_item", items)
+
+    # student_vle_activity, streamed in chunks of enrollments
+    activity_level = enrollments["final_result"].map(ACTIVITY_BY_RESULT).to_numpy()
+    n_rows = rng.poisson(VLE_ROWS_PER_ENROLLMENT * activity_level * rng.lognormal(0, 0.5, n_students))
+    next_id = 1
+    total = 0
+    per_chunk = max(1, chunk_rows // VLE_ROWS_PER_ENROLLMENT)
+    for start in range(0, n_students, per_chunk):
+        sl = slice(start, start + per_chunk)
+        reps = n_rows[sl]
+        enr = np.repeat(enrollments["enrollment_id"].to_numpy()[sl], reps)
+        pid = np.repeat(enrollments["presentation_id"].to_numpy()[sl], reps)
+        # withdrawn students' activity is concentrated early in the presentation
+        horizon = np.repeat(np.where(results[sl] == "Withdrawn", PRESENTATION_DAYS // 3, PRESENTATION_DAYS), reps)
+        day = (rng.random(len(enr)) * horizon).astype(int)
+        item = (pid - 1) * VLE_ITEMS_PER_PRESENTATION + rng.integers(1, VLE_ITEMS_PER_PRESENTATION + 1, len(enr))
+        chunk = pd.DataFrame({
+            "activity_id": np.arange(next_id, next_id + len(enr)),
+            "enrollment_id": enr,
+            "vle_id": item,
+            "clicks": rng.geometric(0.3, len(enr)),
+            "activity_date": (pres_start[pid - 1] + pd.to_timedelta(day, unit="D")).date,
+        })
+        total += copy_frame(conn, "student_vle_activity", chunk)
+        next_id += len(enr)
+    counts["student_vle_activity"] = total
+    return counts
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Generate synthetic OULAD-scale data")
+    ap.add_argument("--dsn", required=True)
+    ap.add_argument("--scale", type=float, default=0.1, help="1.0 ~ full OULAD volume")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--chunk-rows", type=int, default=500000, help="student_vle_activity rows per COPY chunk")
+    ap.add_argument("--reset", action="store_true", help="truncate all tables first")
+    args = ap.parse_args()
+
+    started = time.perf_counter()
+    with psycopg.connect(args.dsn) as conn:
+        if args.reset:
+            conn.execute("""
+                TRUNCATE student_vle_activity, student_assessment, vle_item, assessment,
+                         enrollment, presentation, course_module, user_account CASCADE
+            """)
+        counts = generate(conn, args.scale, args.seed, args.chunk_rows)
+        for table, id_col in [("user_account", "user_id"), ("course_module", "module_id"),
+                              ("presentation", "presentation_id"), ("enrollment", "enrollment_id"),
+                              ("assessment", "assessment_id"), ("student_assessment", "student_assessment_id"),
+                              ("vle_item", "vle_id"), ("student_vle_activity", "activity_id")]:
+            conn.execute(f"SELECT setval(pg_get_serial_sequence('{table}', '{id_col}'), COALESCE(MAX({id_col}), 1)) FROM {table}")
+        conn.commit()
+        conn.autocommit = True
+        conn.execute("SELECT refresh_summaries()")
+        conn.execute("ANALYZE")
+    for table, n in counts.items():
+        print(f"{table:<22}{n:>12}")
+    print(f"done in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,330 @@
+"""Bulk loader for the OULAD CSV export (courses.csv, assessments.csv, vle.csv,
+studentInfo.csv, studentAssessment.csv, studentVle.csv) into the db.sql tables.
+
+Every table is loaded with COPY FROM STDIN (CSV); the big files are read and
+written in chunks of --chunk-rows. Primary keys, unique constraints, foreign
+keys and indexes of the target tables are dropped before the load and
+recreated afterwards, so the tables are loaded in parallel (--jobs) without
+per-row index maintenance or FK checks. The captured DDL is written to
+--ddl-file first, so it can be replayed by hand if a load is interrupted.
+
+    python load_oulad.py --dsn postgresql://postgres@localhost/tubes --csv-dir ./oulad --replace
+
+OULAD has no instructors; --instructors synthetic accounts are created and
+assigned to presentations round-robin. Presentation '2013J' starts on
+2013-10-01 and '2013B' on 2013-02-01; studentVle day offsets are relative to
+that date.
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+import psycopg
+
+from gen_data import MODULES, copy_frame
+
+TABLES = ["user_account", "course_module", "presentation", "enrollment", "assessment",
+          "student_assessment", "vle_item", "student_vle_activity"]
+
+ID_COLUMNS = {"user_account": "user_id", "course_module": "module_id", "presentation": "presentation_id",
+              "enrollment": "enrollment_id", "assessment": "assessment_id",
+              "student_assessment": "student_assessment_id", "vle_item": "vle_id",
+              "student_vle_activity": "activity_id"}
+
+PRESENTATION_START_MONTH = {"B": 2, "J": 10}
+AGE_BAND_YEARS = {"0-35": 25, "35-55": 45, "55<=": 60}
+
+
+# ---------------------------------------------------------------- DDL handling
+
+def capture_ddl(conn):
+    # Constraints (PK/unique/FK) and the remaining indexes of the target tables
+    constraints = conn.execute("""
+        SELECT conrelid::regclass::text, conname, contype, pg_get_constraintdef(oid)
+        FROM pg_constraint
+        WHERE conrelid = ANY(%s::text[]::regclass[]) AND contype IN ('p', 'u', 'f')
+    """, (TABLES,)).fetchall()
+    indexes = conn.execute("""
+        SELECT i.indrelid::regclass::text, i.indexrelid::regclass::text, pg_get_indexdef(i.indexrelid)
+        FROM pg_index i
+        WHERE i.indrelid = ANY(%s::text[]::regclass[])
+          AND NOT EXISTS (SELECT 1 FROM pg_constraint c
+                          WHERE c.conindid = i.indexrelid AND c.conrelid = i.indrelid
+                            AND c.contype IN ('p', 'u', 'x'))
+    """, (TABLES,)).fetchall()
+    return constraints, indexes
+
+
+def restore_statements(constraints, indexes):
+    # Keys first (FKs need the referenced PK), then plain indexes, then FKs
+    keys = [(t, f"ALTER TABLE {t} ADD CONSTRAINT {n} {d}") for t, n, c, d in constraints if c != "f"]
+    # pg_get_indexdef gives "ON ONLY" for a partitioned parent (migrations/003).
+    # Replayed as is it would build an invalid parent index and none on the
+    # partitions (dropping the parent index dropped theirs), so recreate it
+    # on the whole partition tree.
+    idx = [(t, d.replace(" ON ONLY ", " ON ", 1)) for t, _, d in indexes]
+    fks = [(t, f"ALTER TABLE {t} ADD CONSTRAINT {n} {d}") for t, n, c, d in constraints if c == "f"]
+    return keys, idx, fks
+
+
+def invalid_indexes(conn):
+    # Indexes of the target tables (and their partitions) left invalid
+    return [r[0] for r in conn.execute("""
+        SELECT i.indexrelid::regclass::text
+        FROM pg_index i
+        WHERE NOT i.indisvalid
+          AND (i.indrelid = ANY(%s::text[]::regclass[])
+               OR i.indrelid IN (SELECT inhrelid FROM pg_inherits
+                                 WHERE inhparent = ANY(%s::text[]::regclass[])))
+    """, (TABLES, TABLES)).fetchall()]
+
+
+def drop_ddl(conn, constraints, indexes):
+    for table, name, kind, _ in sorted(constraints, key=lambda c: c[2] != "f"):
+        conn.execute(f"ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {name}")
+    for _, name, _ in indexes:
+        conn.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+def run_parallel(dsn, statements, jobs):
+    # statements: [(table, sql)]; one worker per table so a table's indexes
+    # are built one after another while different tables build concurrently
+    by_table = {}
+    for table, sql in statements:
+        by_table.setdefault(table, []).append(sql)
+
+    def build(table):
+        with psycopg.connect(dsn, autocommit=True) as conn:
+            for sql in by_table[table]:
+                conn.execute(sql)
+
+    with ThreadPoolExecutor(max_workers=jobs) as ex:
+        list(ex.map(build, by_table))
+
+
+# ------------------------------------------------------------------- mapping
+
+def read_small(csv_dir):
+    courses = pd.read_csv(csv_dir / "courses.csv")
+    info = pd.read_csv(csv_dir / "studentInfo.csv")
+    assessments = pd.read_csv(csv_dir / "assessments.csv")
+    vle = pd.read_csv(csv_dir / "vle.csv")
+    return courses, info, assessments, vle
+
+
+def build_frames(courses, info, assessments, vle, n_instructors):
+    names = {code: (name, level, credits) for code, name, level, credits in MODULES}
+    frames = {}
+
+    modules = pd.DataFrame({"module_code": sorted(courses["code_module"].unique())})
+    modules["module_id"] = range(1, len(modules) + 1)
+    modules["module_name"] = modules["module_code"].map(lambda c: names.get(c, (f"Module {c}",))[0])
+    modules["level"] = modules["module_code"].map(lambda c: names.get(c, (None, 1))[1])
+    modules["credits"] = modules["module_code"].map(lambda c: names.get(c, (None, 1, 60))[2])
+    frames["course_module"] = modules[["module_id", "module_code", "module_name", "level", "credits"]]
+
+    instructors = pd.DataFrame({"user_id": range(1, n_instructors + 1)})
+    instructors["role"] = "instructor"
+    instructors["username"] = instructors["user_id"].map(lambda i: f"inst_{i:02d}")
+    instructors["email"] = instructors["user_id"].map(lambda i: f"inst{i:02d}@univ.ac.id")
+    instructors["name"] = instructors["user_id"].map(lambda i: f"Instructor {i:02d}")
+    instructors["date_of_birth"] = "1975-01-01"
+    instructors["gender"] = ["M", "F"] * (n_instructors // 2) + ["M"] * (n_instructors % 2)
+    instructors["department"] = "Faculty"
+
+    pres = courses[["code_module", "code_presentation"]].drop_duplicates()
+    pres = pres.sort_values(["code_module", "code_presentation"], ignore_index=True)
+    pres["presentation_id"] = range(1, len(pres) + 1)
+    pres["module_id"] = pres["code_module"].map(modules.set_index("module_code")["module_id"])
+    pres["instructor_id"] = (pres.index % n_instructors) + 1
+    pres["semester"] = pres["code_presentation"]
+    pres["year"] = pres["code_presentation"].str[:4].astype(int)
+    pres["start"] = pd.to_datetime(pd.DataFrame({
+        "year": pres["year"],
+        "month": pres["code_presentation"].str[-1].map(PRESENTATION_START_MONTH).fillna(1).astype(int),
+        "day": 1,
+    }))
+    frames["presentation"] = pres[["presentation_id", "module_id", "instructor_id", "semester", "year"]]
+
+    students = info.drop_duplicates("id_student").sort_values("id_student", ignore_index=True)
+    students = students.assign(user_id=range(n_instructors + 1, n_instructors + 1 + len(students)))
+    age = students["age_band"].map(AGE_BAND_YEARS).fillna(30).astype(int)
+    frames["user_account"] = pd.concat([instructors, pd.DataFrame({
+        "user_id": students["user_id"],
+        "role": "student",
+        "username": "std_" + students["id_student"].astype(str),
+        "email": students["id_student"].astype(str) + "@student.univ.ac.id",
+        "name": "Student " + students["id_student"].astype(str),
+        "date_of_birth": (2014 - age).astype(str) + "-01-01",
+        "gender": students["gender"],
+        "region": students["region"],
+        "highest_education": students["highest_education"],
+        "disability": students["disability"].eq("Y"),
+    })], ignore_index=True)
+
+    enr = info.merge(pres[["code_module", "code_presentation", "presentation_id"]],
+                     on=["code_module", "code_presentation"])
+    enr["student_id"] = enr["id_student"].map(students.set_index("id_student")["user_id"])
+    enr = enr.sort_values(["presentation_id", "student_id"], ignore_index=True)
+    enr["enrollment_id"] = range(1, len(enr) + 1)
+    frames["enrollment"] = enr[["enrollment_id", "student_id", "presentation_id", "final_result", "studied_credits"]]
+
+    ass = assessments.merge(pres[["code_module", "code_presentation", "presentation_id"]],
+                            on=["code_module", "code_presentation"])
+    frames["assessment"] = pd.DataFrame({
+        "assessment_id": ass["id_assessment"],
+        "presentation_id": ass["presentation_id"],
+        "assessment_name": ass["assessment_type"],
+        "weight": pd.to_numeric(ass["weight"], errors="coerce").fillna(0).round().astype(int),
+    })
+
+    items = vle.merge(pres[["code_module", "code_presentation", "presentation_id"]],
+                      on=["code_module", "code_presentation"])
+    frames["vle_item"] = pd.DataFrame({
+        "vle_id": items["id_site"],
+        "presentation_id": items["presentation_id"],
+        "vle_type": items["activity_type"],
+        "title": items["activity_type"] + " " + items["id_site"].astype(str),
+    })
+
+    # Lookups used by the chunked loads
+    keys = {
+        "enrollment": enr.set_index(["presentation_id", "id_student"])["enrollment_id"],
+        "assessment_pres": ass.set_index("id_assessment")["presentation_id"],
+        "presentation": pres.set_index(["code_module", "code_presentation"])[["presentation_id", "start"]],
+    }
+    return frames, keys
+
+
+def student_assessment_chunks(path, keys, chunk_rows):
+    next_id = 1
+    for chunk in pd.read_csv(path, chunksize=chunk_rows, na_values=["?"]):
+        chunk["score"] = pd.to_numeric(chunk["score"], errors="coerce")
+        chunk = chunk.dropna(subset=["score"])
+        chunk["presentation_id"] = chunk["id_assessment"].map(keys["assessment_pres"]).fillna(0).astype(int)
+        idx = pd.MultiIndex.from_arrays([chunk["presentation_id"], chunk["id_student"]])
+        chunk["enrollment_id"] = keys["enrollment"].reindex(idx).to_numpy()
+        chunk = chunk.dropna(subset=["enrollment_id"])
+        out = pd.DataFrame({
+            "student_assessment_id": range(next_id, next_id + len(chunk)),
+            "enrollment_id": chunk["enrollment_id"].astype(int).to_numpy(),
+            "assessment_id": chunk["id_assessment"].to_numpy(),
+            "score": chunk["score"].round().astype(int).to_numpy(),
+        })
+        next_id += len(out)
+        yield out
+
+
+def student_vle_chunks(path, keys, chunk_rows):
+    next_id = 1
+    pres = keys["presentation"]
+    dtypes = {"code_module": "category", "code_presentation": "category",
+              "id_student": "int32", "id_site": "int32", "date": "int16", "sum_click": "int32"}
+    for chunk in pd.read_csv(path, chunksize=chunk_rows, dtype=dtypes):
+        p = pres.reindex(pd.MultiIndex.from_arrays([chunk["code_module"].astype(str),
+                                                    chunk["code_presentation"].astype(str)]))
+        idx = pd.MultiIndex.from_arrays([p["presentation_id"].fillna(0).astype(int).to_numpy(),
+                                         chunk["id_student"].to_numpy()])
+        enrollment_id = keys["enrollment"].reindex(idx).to_numpy()
+        out = pd.DataFrame({
+            "enrollment_id": enrollment_id,
+            "vle_id": chunk["id_site"].to_numpy(),
+            "clicks": chunk["sum_click"].to_numpy(),
+            "activity_date": (p["start"].to_numpy() + pd.to_timedelta(chunk["date"].to_numpy(), unit="D")),
+        }).dropna(subset=["enrollment_id"])
+        out["enrollment_id"] = out["enrollment_id"].astype(int)
+        out.insert(0, "activity_id", range(next_id, next_id + len(out)))
+        next_id += len(out)
+        yield out
+
+
+# --------------------------------------------------------------------- load
+
+def load_table(dsn, table, source):
+    # source: a DataFrame or an iterator of DataFrame chunks; one transaction
+    started = time.perf_counter()
+    rows = 0
+    with psycopg.connect(dsn) as conn:
+        for chunk in ([source] if isinstance(source, pd.DataFrame) else source):
+            rows += copy_frame(conn, table, chunk)
+        conn.commit()
+    return table, rows, time.perf_counter() - started
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Bulk-load the OULAD CSV export with COPY")
+    ap.add_argument("--dsn", required=True)
+    ap.add_argument("--csv-dir", required=True, type=Path, help="directory with the OULAD *.csv files")
+    ap.add_argument("--replace", action="store_true", help="truncate the target tables if they hold data")
+    ap.add_argument("--jobs", type=int, default=4, help="tables loaded / indexed concurrently")
+    ap.add_argument("--chunk-rows", type=int, default=500000, help="CSV rows per COPY chunk")
+    ap.add_argument("--instructors", type=int, default=5, help="synthetic instructor accounts")
+    ap.add_argument("--ddl-file", type=Path, default=Path("load_oulad_ddl.sql"),
+                    help="where the dropped constraints/indexes are saved before the load")
+    ap.add_argument("--keep-indexes", action="store_true", help="load with indexes and constraints in place")
+    args = ap.parse_args()
+
+    started = time.perf_counter()
+    with psycopg.connect(args.dsn, autocommit=True) as conn:
+        if conn.execute("SELECT EXISTS (SELECT 1 FROM enrollment)").fetchone()[0] and not args.replace:
+            ap.error("target tables are not empty; pass --replace to reload them")
+        constraints, indexes = capture_ddl(conn)
+        keys_sql, index_sql, fk_sql = restore_statements(constraints, indexes)
+        # VLE rollups (migrations/003) are rebuilt once at the end instead of
+        # per COPY chunk; their trigger joins tables that load concurrently
+        rollups = conn.execute("SELECT to_regproc('rebuild_vle_rollups') IS NOT NULL").fetchone()[0]
+        finish_sql = [(None, "ALTER TABLE student_vle_activity ENABLE TRIGGER USER"),
+                      (None, "SELECT rebuild_vle_rollups()")] if rollups else []
+        args.ddl_file.write_text("\n".join(sql + ";" for _, sql in keys_sql + index_sql + fk_sql + finish_sql) + "\n")
+        with conn.transaction():
+            conn.execute(f"TRUNCATE {', '.join(TABLES)}")
+            if rollups:
+                conn.execute("ALTER TABLE student_vle_activity DISABLE TRIGGER USER")
+            if not args.keep_indexes:
+                drop_ddl(conn, constraints, indexes)
+
+    print("reading CSVs ...")
+    frames, keys = build_frames(*read_small(args.csv_dir), args.instructors)
+    sources = dict(frames)
+    sources["student_assessment"] = student_assessment_chunks(args.csv_dir / "studentAssessment.csv", keys, args.chunk_rows)
+    sources["student_vle_activity"] = student_vle_chunks(args.csv_dir / "studentVle.csv", keys, args.chunk_rows)
+
+    # Without FKs in place the load order does not matter; biggest tables first
+    order = ["student_vle_activity", "student_assessment"] + [t for t in sources if t not in
+                                                             ("student_vle_activity", "student_assessment")]
+    load_started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.jobs) as ex:
+        results = list(ex.map(lambda t: load_table(args.dsn, t, sources[t]), order))
+    load_seconds = time.perf_counter() - load_started
+
+    print(f"{'table':<22}{'rows':>12}{'sec':>9}{'rows/s':>12}")
+    for table, rows, seconds in sorted(results, key=lambda r: -r[1]):
+        print(f"{table:<22}{rows:>12}{seconds:>9.1f}{rows / seconds if seconds else 0:>12.0f}")
+    total = sum(r[1] for r in results)
+    print(f"{'total':<22}{total:>12}{load_seconds:>9.1f}{total / load_seconds:>12.0f}")
+
+    if not args.keep_indexes:
+        index_started = time.perf_counter()
+        run_parallel(args.dsn, keys_sql, args.jobs)
+        run_parallel(args.dsn, index_sql, args.jobs)
+        run_parallel(args.dsn, fk_sql, args.jobs)
+        print(f"constraints and indexes rebuilt in {time.perf_counter() - index_started:.1f}s")
+
+    with psycopg.connect(args.dsn, autocommit=True) as conn:
+        invalid = invalid_indexes(conn)
+        if invalid:
+            raise SystemExit(f"invalid indexes after the rebuild: {', '.join(invalid)}; "
+                             f"fix them from {args.ddl_file}")
+        for _, sql in finish_sql:
+            conn.execute(sql)
+        for table, id_col in ID_COLUMNS.items():
+            conn.execute(f"SELECT setval(pg_get_serial_sequence('{table}', '{id_col}'), COALESCE(MAX({id_col}), 1)) FROM {table}")
+        conn.execute("ANALYZE")
+        conn.execute("SELECT refresh_summaries()")
+    print(f"done in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
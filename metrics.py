@@ -0,0 +1,251 @@
+"""In-process query and cache metrics.
+
+config.get_df records one sample per call (query name, wall time, DB time,
+rows, approximate bytes (see measure_bytes) and where the result came from), and app.py records
+calls and misses of its cached wrappers and the wall time of every script
+rerun against COLD_START_BUDGET_MS / RERUN_BUDGET_MS, with a per-section
+trace of the most recent ones. The numbers are exposed as a dict for
+the in-app debug panel and as Prometheus text / JSON over a small HTTP server:
+
+    METRICS_PORT=9108 streamlit run app.py
+    curl localhost:9108/metrics          # Prometheus text format
+    curl localhost:9108/metrics.json
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+log = logging.getLogger("vle.slow_query")
+rerun_log = logging.getLogger("vle.rerun")
+
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", 500))
+# Script rerun budgets: the first rerun of a process (cold start) and every
+# later one (widget clicks). Overruns are logged to vle.rerun.
+COLD_START_BUDGET_MS = float(os.environ.get("COLD_START_BUDGET_MS", 3000))
+RERUN_BUDGET_MS = float(os.environ.get("RERUN_BUDGET_MS", 300))
+METRICS_PORT = int(os.environ.get("METRICS_PORT", 0)) or None
+# Result bytes need a deep memory_usage walk over every string, so they are
+# only measured while someone reads them: with METRICS_PORT, DEBUG_PANEL=1,
+# or once the debug panel has been opened (measure_bytes)
+_measure_bytes = bool(METRICS_PORT) or os.environ.get("DEBUG_PANEL") == "1"
+
+# Upper bounds (seconds) of the wall-time histogram buckets
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_lock = threading.Lock()
+_queries = {}   # (name, source) -> stats dict
+_caches = {}    # wrapper name -> {"calls": n, "misses": n, "warmed": n}
+_slow = deque(maxlen=50)
+_reruns = {}    # page -> {"count", "seconds", "max_seconds", "over_budget"}
+_cold_start = None
+_gauges = {}    # metric -> {"help": text, "values": {labels tuple: value}}
+_traces = deque(maxlen=20)  # recent reruns with per-section wall times
+
+
+def _new_query_stats():
+    return {"count": 0, "wall_seconds": 0.0, "db_seconds": 0.0, "max_wall_seconds": 0.0,
+            "rows": 0, "bytes": 0, "buckets": [0] * len(BUCKETS)}
+
+
+def record_query(name, source, wall, db, rows, nbytes):
+    # source: "db", "shared_cache" or "coalesced"
+    with _lock:
+        q = _queries.setdefault((name, source), _new_query_stats())
+        q["count"] += 1
+        q["wall_seconds"] += wall
+        q["db_seconds"] += db
+        q["max_wall_seconds"] = max(q["max_wall_seconds"], wall)
+        q["rows"] += rows
+        q["bytes"] += nbytes
+        for i, bound in enumerate(BUCKETS):
+            if wall <= bound:
+                q["buckets"][i] += 1
+    if wall * 1000 >= SLOW_QUERY_MS:
+        entry = {"at": time.time(), "query": name, "source": source,
+                 "wall_ms": round(wall * 1000, 1), "db_ms": round(db * 1000, 1), "rows": rows}
+        _slow.append(entry)
+        log.warning("slow query %s: %.1f ms (db %.1f ms, %d rows, %s)", name, wall * 1000, db * 1000, rows, source)
+
+
+def measure_bytes():
+    global _measure_bytes
+    _measure_bytes = True
+
+
+def frame_bytes(df):
+    # 0 while bytes are not measured; deep=True only on small frames
+    if not _measure_bytes:
+        return 0
+    return int(df.memory_usage(deep=len(df) <= 100000).sum())
+
+
+def _new_cache_stats():
+    return {"calls": 0, "misses": 0, "warmed": 0}
+
+
+def record_cache_call(name):
+    with _lock:
+        _caches.setdefault(name, _new_cache_stats())["calls"] += 1
+
+
+def record_cache_miss(name):
+    with _lock:
+        _caches.setdefault(name, _new_cache_stats())["misses"] += 1
+
+
+def record_cache_warm(name):
+    # Entries computed by the cache warmer: not user calls, so kept out of
+    # calls/misses (and the hit ratio)
+    with _lock:
+        _caches.setdefault(name, _new_cache_stats())["warmed"] += 1
+
+
+def record_rerun(page, seconds):
+    # One sample per script run of app.py; the first one in the process is the cold start
+    global _cold_start
+    with _lock:
+        cold = _cold_start is None
+        if cold:
+            _cold_start = {"page": page, "seconds": seconds}
+        budget = (COLD_START_BUDGET_MS if cold else RERUN_BUDGET_MS) / 1000
+        r = _reruns.setdefault(page, {"count": 0, "seconds": 0.0, "max_seconds": 0.0, "over_budget": 0})
+        if not cold:
+            r["count"] += 1
+            r["seconds"] += seconds
+            r["max_seconds"] = max(r["max_seconds"], seconds)
+            r["over_budget"] += seconds > budget
+    if seconds > budget:
+        rerun_log.warning("%s %s took %.1f ms (budget %.0f ms)", "cold start" if cold else "rerun",
+                          page, seconds * 1000, budget * 1000)
+
+
+def record_trace(page, kind, seconds, sections):
+    # kind: "full" (whole script) or "fragment" (one st.fragment rerun);
+    # sections: [(name, seconds), ...] in execution order
+    with _lock:
+        _traces.append({"at": time.time(), "page": page, "kind": kind, "total_ms": round(seconds * 1000, 1),
+                        "sections": [{"section": n, "ms": round(s * 1000, 1)} for n, s in sections]})
+
+
+def set_gauge(metric, labels, value, help_text=""):
+    # Point-in-time values reported by other modules (e.g. replica lag)
+    with _lock:
+        g = _gauges.setdefault(metric, {"help": help_text, "values": {}})
+        g["values"][tuple(sorted(labels.items()))] = value
+
+
+def snapshot():
+    with _lock:
+        queries = [
+            {"query": name, "source": source, **{k: v for k, v in q.items() if k != "buckets"},
+             "avg_wall_ms": round(q["wall_seconds"] / q["count"] * 1000, 2) if q["count"] else 0.0}
+            for (name, source), q in sorted(_queries.items())
+        ]
+        caches = [
+            {"cache": name, "calls": c["calls"], "misses": c["misses"], "warmed": c["warmed"],
+             "hit_ratio": round(1 - c["misses"] / c["calls"], 3) if c["calls"] else None}
+            for name, c in sorted(_caches.items())
+        ]
+        reruns = [
+            {"page": page, **r, "avg_ms": round(r["seconds"] / r["count"] * 1000, 2) if r["count"] else 0.0}
+            for page, r in sorted(_reruns.items())
+        ]
+        gauges = [
+            {"gauge": metric, **dict(labels), "value": value}
+            for metric, g in sorted(_gauges.items()) for labels, value in sorted(g["values"].items())
+        ]
+        return {"queries": queries, "caches": caches, "slow_queries": list(_slow),
+                "reruns": reruns, "cold_start": dict(_cold_start) if _cold_start else None,
+                "gauges": gauges, "traces": list(_traces)}
+
+
+def to_json():
+    return json.dumps(snapshot(), default=str)
+
+
+def to_prometheus():
+    lines = []
+
+    def family(metric, kind, help_text):
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} {kind}")
+
+    with _lock:
+        queries = {k: dict(v, buckets=list(v["buckets"])) for k, v in _queries.items()}
+        caches = {k: dict(v) for k, v in _caches.items()}
+        reruns = {k: dict(v) for k, v in _reruns.items()}
+        cold_start = dict(_cold_start) if _cold_start else None
+        gauges = {k: dict(v, values=dict(v["values"])) for k, v in _gauges.items()}
+
+    family("vle_query_seconds", "histogram", "Wall time of config.get_df calls")
+    for (name, source), q in sorted(queries.items()):
+        labels = f'query="{name}",source="{source}"'
+        for bound, n in zip(BUCKETS, q["buckets"]):
+            lines.append(f'vle_query_seconds_bucket{{{labels},le="{bound}"}} {n}')
+        lines.append(f'vle_query_seconds_bucket{{{labels},le="+Inf"}} {q["count"]}')
+        lines.append(f"vle_query_seconds_sum{{{labels}}} {q['wall_seconds']}")
+        lines.append(f"vle_query_seconds_count{{{labels}}} {q['count']}")
+    for metric, key, help_text in (
+        ("vle_query_db_seconds_total", "db_seconds", "Time spent executing queries in Postgres"),
+        ("vle_query_rows_total", "rows", "Rows returned"),
+        ("vle_query_bytes_total", "bytes", "Approximate bytes of returned DataFrames"),
+    ):
+        family(metric, "counter", help_text)
+        for (name, source), q in sorted(queries.items()):
+            lines.append(f'{metric}{{query="{name}",source="{source}"}} {q[key]}')
+    family("vle_cache_calls_total", "counter", "Calls of cached fetch wrappers")
+    for name, c in sorted(caches.items()):
+        lines.append(f'vle_cache_calls_total{{cache="{name}"}} {c["calls"]}')
+    family("vle_cache_misses_total", "counter", "Misses of cached fetch wrappers")
+    for name, c in sorted(caches.items()):
+        lines.append(f'vle_cache_misses_total{{cache="{name}"}} {c["misses"]}')
+    family("vle_cache_warmed_total", "counter", "Entries computed by the cache warmer")
+    for name, c in sorted(caches.items()):
+        lines.append(f'vle_cache_warmed_total{{cache="{name}"}} {c["warmed"]}')
+    family("vle_rerun_seconds", "summary", "Wall time of app.py reruns after the cold start")
+    for page, r in sorted(reruns.items()):
+        lines.append(f'vle_rerun_seconds_sum{{page="{page}"}} {r["seconds"]}')
+        lines.append(f'vle_rerun_seconds_count{{page="{page}"}} {r["count"]}')
+    family("vle_rerun_over_budget_total", "counter", f"Reruns slower than RERUN_BUDGET_MS ({RERUN_BUDGET_MS:.0f} ms)")
+    for page, r in sorted(reruns.items()):
+        lines.append(f'vle_rerun_over_budget_total{{page="{page}"}} {r["over_budget"]}')
+    if cold_start:
+        family("vle_cold_start_seconds", "gauge", "Wall time of the first app.py run in this process")
+        lines.append(f'vle_cold_start_seconds{{page="{cold_start["page"]}"}} {cold_start["seconds"]}')
+    for metric, g in sorted(gauges.items()):
+        family(metric, "gauge", g["help"])
+        for labels, value in sorted(g["values"].items()):
+            label_str = ",".join(f'{k}="{v}"' for k, v in labels)
+            lines.append(f"{metric}{{{label_str}}} {value}")
+    return "\n".join(lines) + "\n"
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        if self.path.startswith("/metrics.json"):
+            body, ctype = to_json(), "application/json"
+        elif self.path.startswith("/metrics"):
+            body, ctype = to_prometheus(), "text/plain; version=0.0.4"
+        else:
+            self.send_error(404)
+            return
+        data = body.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_http_server(port=None):
+    server = ThreadingHTTPServer(("0.0.0.0", port or METRICS_PORT), _Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
@@ -0,0 +1,69 @@
+-- ==================================================
+-- SUMMARY LAYER (pre-aggregated dashboard KPIs)
+-- Jalankan setelah db.sql. Isi view diperbarui lewat refresh_summaries().
+-- ==================================================
+
+-- Skor akhir berbobot per enrollment
+CREATE MATERIALIZED VIEW mv_enrollment_final_score AS
+SELECT e.enrollment_id,
+       e.presentation_id,
+       e.student_id,
+       CASE WHEN NULLIF(SUM(a.weight),0) IS NOT NULL
+            THEN SUM(sa.score * a.weight)::DECIMAL / NULLIF(SUM(a.weight),0)
+            ELSE NULL END AS final_score
+FROM enrollment e
+  JOIN student_assessment sa ON sa.enrollment_id = e.enrollment_id
+  JOIN assessment a ON a.assessment_id = sa.assessment_id
+GROUP BY e.enrollment_id, e.presentation_id, e.student_id;
+
+CREATE UNIQUE INDEX mv_enrollment_final_score_pk ON mv_enrollment_final_score (enrollment_id);
+CREATE INDEX mv_enrollment_final_score_presentation ON mv_enrollment_final_score (presentation_id);
+
+-- Total klik VLE per enrollment (enrollment tanpa aktivitas = 0)
+CREATE MATERIALIZED VIEW mv_enrollment_total_clicks AS
+SELECT e.enrollment_id,
+       e.presentation_id,
+       COALESCE(SUM(sva.clicks),0) AS total_clicks
+FROM student_vle_activity sva
+  RIGHT JOIN enrollment e ON e.enrollment_id = sva.enrollment_id
+GROUP BY e.enrollment_id, e.presentation_id;
+
+CREATE UNIQUE INDEX mv_enrollment_total_clicks_pk ON mv_enrollment_total_clicks (enrollment_id);
+CREATE INDEX mv_enrollment_total_clicks_presentation ON mv_enrollment_total_clicks (presentation_id);
+
+-- Jumlah mahasiswa per modul
+CREATE MATERIALIZED VIEW mv_module_student_counts AS
+SELECT m.module_code,
+       COUNT(*) AS student_count
+FROM enrollment e
+  JOIN presentation p ON p.presentation_id = e.presentation_id
+  JOIN course_module m ON m.module_id = p.module_id
+GROUP BY m.module_code;
+
+CREATE UNIQUE INDEX mv_module_student_counts_pk ON mv_module_student_counts (module_code);
+
+-- Kapan tiap view terakhir diperbarui (untuk indikator staleness di dashboard)
+CREATE TABLE summary_refresh (
+    view_name VARCHAR(100) PRIMARY KEY,
+    refreshed_at TIMESTAMPTZ NOT NULL
+);
+
+INSERT INTO summary_refresh (view_name, refreshed_at) VALUES
+('mv_enrollment_final_score', now()),
+('mv_enrollment_total_clicks', now()),
+('mv_module_student_counts', now());
+
+-- CONCURRENTLY: pembaca tidak terblokir selama refresh (butuh unique index di atas).
+-- Jadwalkan misalnya dengan pg_cron:
+--   SELECT cron.schedule('refresh-summaries', '*/10 * * * *', 'SELECT refresh_summaries()');
+CREATE OR REPLACE FUNCTION refresh_summaries() RETURNS void AS $$
+BEGIN
+    REFRESH MATERIALIZED VIEW CONCURRENTLY mv_enrollment_final_score;
+    REFRESH MATERIALIZED VIEW CONCURRENTLY mv_enrollment_total_clicks;
+    REFRESH MATERIALIZED VIEW CONCURRENTLY mv_module_student_counts;
+    INSERT INTO summary_refresh (view_name, refreshed_at)
+    SELECT v, now()
+    FROM unnest(ARRAY['mv_enrollment_final_score', 'mv_enrollment_total_clicks', 'mv_module_student_counts']) AS v
+    ON CONFLICT (view_name) DO UPDATE SET refreshed_at = EXCLUDED.refreshed_at;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,30 @@
+-- ==================================================
+-- INDEXES untuk filter dan join yang dipakai config.py
+-- Cek regresi dengan: python explain_check.py
+-- ==================================================
+
+-- fetch_students / fetch_instructors: WHERE role = ... ORDER BY name
+CREATE INDEX IF NOT EXISTS user_account_role_name_idx ON user_account (role, name);
+
+-- fetch_presentations joins
+CREATE INDEX IF NOT EXISTS presentation_module_idx ON presentation (module_id);
+CREATE INDEX IF NOT EXISTS presentation_instructor_idx ON presentation (instructor_id);
+
+-- fetch_enrollment, fetch_final_results_distribution, timeline joins
+CREATE INDEX IF NOT EXISTS enrollment_presentation_idx ON enrollment (presentation_id) INCLUDE (final_result);
+CREATE INDEX IF NOT EXISTS enrollment_student_idx ON enrollment (student_id);
+
+-- fetch_assessments, fetch_assessment_scores_by_enrollment
+CREATE INDEX IF NOT EXISTS assessment_presentation_idx ON assessment (presentation_id);
+
+-- fetch_student_scores, fetch_class_scores, summary view refresh
+CREATE INDEX IF NOT EXISTS student_assessment_enrollment_idx ON student_assessment (enrollment_id, assessment_id) INCLUDE (score);
+CREATE INDEX IF NOT EXISTS student_assessment_assessment_idx ON student_assessment (assessment_id);
+
+-- fetch_vle_activity, fetch_vle_avg_timeline_by_presentation (covering: no heap visit for clicks)
+CREATE INDEX IF NOT EXISTS student_vle_activity_enrollment_date_idx ON student_vle_activity (enrollment_id, activity_date) INCLUDE (clicks);
+CREATE INDEX IF NOT EXISTS student_vle_activity_vle_idx ON student_vle_activity (vle_id);
+
+CREATE INDEX IF NOT EXISTS vle_item_presentation_idx ON vle_item (presentation_id);
+
+ANALYZE user_account, presentation, enrollment, assessment, student_assessment, student_vle_activity, vle_item;
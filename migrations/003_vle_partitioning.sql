@@ -0,0 +1,217 @@
+-- ==================================================
+-- student_vle_activity: PARTITION per tahun (activity_date) + ROLLUP klik
+-- Jalankan setelah 001 dan 002. Rollup diperbarui otomatis saat insert/update/
+-- delete (trigger per statement dengan transition table), sehingga timeline dan
+-- total klik tidak perlu memindai seluruh riwayat aktivitas.
+-- ==================================================
+BEGIN;
+
+-- 1) Tabel lama disingkirkan; nama constraint/index dibebaskan untuk tabel baru
+ALTER TABLE student_vle_activity RENAME TO student_vle_activity_old;
+ALTER TABLE student_vle_activity_old
+    DROP CONSTRAINT IF EXISTS student_vle_activity_pkey,
+    DROP CONSTRAINT IF EXISTS student_vle_activity_enrollment_id_fkey,
+    DROP CONSTRAINT IF EXISTS student_vle_activity_vle_id_fkey;
+DROP INDEX IF EXISTS student_vle_activity_enrollment_date_idx;
+DROP INDEX IF EXISTS student_vle_activity_vle_idx;
+-- sequence SERIAL lama dipakai ulang oleh tabel baru
+ALTER SEQUENCE student_vle_activity_activity_id_seq OWNED BY NONE;
+
+-- 2) Tabel partisi (kunci partisi harus ikut di primary key)
+CREATE TABLE student_vle_activity (
+    activity_id INT NOT NULL DEFAULT nextval('student_vle_activity_activity_id_seq'),
+    enrollment_id INT NOT NULL REFERENCES enrollment(enrollment_id),
+    vle_id INT NOT NULL REFERENCES vle_item(vle_id),
+    clicks INT NOT NULL,
+    activity_date DATE NOT NULL,
+    PRIMARY KEY (activity_id, activity_date)
+) PARTITION BY RANGE (activity_date);
+
+ALTER SEQUENCE student_vle_activity_activity_id_seq OWNED BY student_vle_activity.activity_id;
+
+-- Baris di luar partisi tahunan masuk ke sini; buat partisi tahun baru lebih
+-- dulu dengan ensure_vle_partitions() (mis. via pg_cron tiap Desember)
+CREATE TABLE student_vle_activity_default PARTITION OF student_vle_activity DEFAULT;
+
+CREATE OR REPLACE FUNCTION ensure_vle_partitions(from_year INT, to_year INT) RETURNS void AS $$
+DECLARE
+    y INT;
+BEGIN
+    FOR y IN from_year..to_year LOOP
+        EXECUTE format('CREATE TABLE IF NOT EXISTS %I PARTITION OF student_vle_activity FOR VALUES FROM (%L) TO (%L)',
+                       'student_vle_activity_y' || y, make_date(y, 1, 1), make_date(y + 1, 1, 1));
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT ensure_vle_partitions(
+    COALESCE((SELECT EXTRACT(YEAR FROM MIN(activity_date))::INT FROM student_vle_activity_old),
+             EXTRACT(YEAR FROM current_date)::INT),
+    EXTRACT(YEAR FROM current_date)::INT + 1
+);
+
+-- Index yang sama seperti 002, dibuat di parent dan diturunkan ke tiap partisi
+CREATE INDEX student_vle_activity_enrollment_date_idx ON student_vle_activity (enrollment_id, activity_date) INCLUDE (clicks);
+CREATE INDEX student_vle_activity_vle_idx ON student_vle_activity (vle_id);
+
+INSERT INTO student_vle_activity (activity_id, enrollment_id, vle_id, clicks, activity_date)
+SELECT activity_id, enrollment_id, vle_id, clicks, activity_date
+FROM student_vle_activity_old;
+
+-- 3) Rollup klik. n_rows = jumlah baris aktivitas (untuk rata-rata klik per baris)
+CREATE TABLE vle_enrollment_total (
+    enrollment_id INT PRIMARY KEY,
+    clicks BIGINT NOT NULL,
+    n_rows INT NOT NULL
+);
+
+CREATE TABLE vle_enrollment_daily (
+    enrollment_id INT NOT NULL,
+    activity_date DATE NOT NULL,
+    clicks BIGINT NOT NULL,
+    n_rows INT NOT NULL,
+    PRIMARY KEY (enrollment_id, activity_date)
+);
+
+CREATE TABLE vle_enrollment_weekly (
+    enrollment_id INT NOT NULL,
+    week_start DATE NOT NULL,
+    clicks BIGINT NOT NULL,
+    n_rows INT NOT NULL,
+    PRIMARY KEY (enrollment_id, week_start)
+);
+
+CREATE TABLE vle_presentation_type_daily (
+    presentation_id INT NOT NULL,
+    vle_type VARCHAR(50) NOT NULL,
+    activity_date DATE NOT NULL,
+    clicks BIGINT NOT NULL,
+    n_rows INT NOT NULL,
+    PRIMARY KEY (presentation_id, activity_date, vle_type)
+);
+
+CREATE TABLE vle_presentation_type_weekly (
+    presentation_id INT NOT NULL,
+    vle_type VARCHAR(50) NOT NULL,
+    week_start DATE NOT NULL,
+    clicks BIGINT NOT NULL,
+    n_rows INT NOT NULL,
+    PRIMARY KEY (presentation_id, week_start, vle_type)
+);
+
+-- Satu statement yang menambahkan delta (%s: query yang menghasilkan
+-- enrollment_id, vle_id, activity_date, clicks, sign) ke semua rollup.
+-- Dipakai oleh trigger dan oleh rebuild_vle_rollups().
+CREATE OR REPLACE FUNCTION vle_rollup_sql() RETURNS text AS $$
+SELECT $sql$
+WITH d AS (%s),
+de AS (
+    SELECT d.enrollment_id, e.presentation_id, v.vle_type, d.activity_date,
+           date_trunc('week', d.activity_date)::date AS week_start,
+           d.sign * d.clicks AS clicks, d.sign AS n_rows
+    FROM d
+      JOIN enrollment e ON e.enrollment_id = d.enrollment_id
+      JOIN vle_item v ON v.vle_id = d.vle_id
+),
+et AS (
+    INSERT INTO vle_enrollment_total AS t (enrollment_id, clicks, n_rows)
+    SELECT enrollment_id, SUM(clicks), SUM(n_rows) FROM de GROUP BY 1
+    ON CONFLICT (enrollment_id) DO UPDATE
+    SET clicks = t.clicks + EXCLUDED.clicks, n_rows = t.n_rows + EXCLUDED.n_rows
+),
+ed AS (
+    INSERT INTO vle_enrollment_daily AS t (enrollment_id, activity_date, clicks, n_rows)
+    SELECT enrollment_id, activity_date, SUM(clicks), SUM(n_rows) FROM de GROUP BY 1, 2
+    ON CONFLICT (enrollment_id, activity_date) DO UPDATE
+    SET clicks = t.clicks + EXCLUDED.clicks, n_rows = t.n_rows + EXCLUDED.n_rows
+),
+ew AS (
+    INSERT INTO vle_enrollment_weekly AS t (enrollment_id, week_start, clicks, n_rows)
+    SELECT enrollment_id, week_start, SUM(clicks), SUM(n_rows) FROM de GROUP BY 1, 2
+    ON CONFLICT (enrollment_id, week_start) DO UPDATE
+    SET clicks = t.clicks + EXCLUDED.clicks, n_rows = t.n_rows + EXCLUDED.n_rows
+),
+pd AS (
+    INSERT INTO vle_presentation_type_daily AS t (presentation_id, activity_date, vle_type, clicks, n_rows)
+    SELECT presentation_id, activity_date, vle_type, SUM(clicks), SUM(n_rows) FROM de GROUP BY 1, 2, 3
+    ON CONFLICT (presentation_id, activity_date, vle_type) DO UPDATE
+    SET clicks = t.clicks + EXCLUDED.clicks, n_rows = t.n_rows + EXCLUDED.n_rows
+),
+pw AS (
+    INSERT INTO vle_presentation_type_weekly AS t (presentation_id, week_start, vle_type, clicks, n_rows)
+    SELECT presentation_id, week_start, vle_type, SUM(clicks), SUM(n_rows) FROM de GROUP BY 1, 2, 3
+    ON CONFLICT (presentation_id, week_start, vle_type) DO UPDATE
+    SET clicks = t.clicks + EXCLUDED.clicks, n_rows = t.n_rows + EXCLUDED.n_rows
+)
+SELECT 1
+$sql$
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Transition table hanya terlihat oleh query di fungsi trigger ini sendiri,
+-- jadi template di atas dijalankan dengan EXECUTE di sini.
+CREATE OR REPLACE FUNCTION vle_rollup_trigger() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        EXECUTE format(vle_rollup_sql(), 'SELECT enrollment_id, vle_id, activity_date, clicks, 1 AS sign FROM new_rows');
+    ELSIF TG_OP = 'DELETE' THEN
+        EXECUTE format(vle_rollup_sql(), 'SELECT enrollment_id, vle_id, activity_date, clicks, -1 AS sign FROM old_rows');
+    ELSE
+        EXECUTE format(vle_rollup_sql(), 'SELECT enrollment_id, vle_id, activity_date, clicks, -1 AS sign FROM old_rows
+                                          UNION ALL
+                                          SELECT enrollment_id, vle_id, activity_date, clicks, 1 AS sign FROM new_rows');
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER vle_rollup_insert AFTER INSERT ON student_vle_activity
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION vle_rollup_trigger();
+CREATE TRIGGER vle_rollup_update AFTER UPDATE ON student_vle_activity
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION vle_rollup_trigger();
+CREATE TRIGGER vle_rollup_delete AFTER DELETE ON student_vle_activity
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION vle_rollup_trigger();
+
+CREATE OR REPLACE FUNCTION vle_rollup_truncate() RETURNS trigger AS $$
+BEGIN
+    TRUNCATE vle_enrollment_total, vle_enrollment_daily, vle_enrollment_weekly,
+             vle_presentation_type_daily, vle_presentation_type_weekly;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER vle_rollup_truncate AFTER TRUNCATE ON student_vle_activity
+    FOR EACH STATEMENT EXECUTE FUNCTION vle_rollup_truncate();
+
+-- Bangun ulang semua rollup dari data mentah (setelah bulk load dengan trigger
+-- dimatikan, atau untuk memperbaiki drift)
+CREATE OR REPLACE FUNCTION rebuild_vle_rollups() RETURNS void AS $$
+BEGIN
+    TRUNCATE vle_enrollment_total, vle_enrollment_daily, vle_enrollment_weekly,
+             vle_presentation_type_daily, vle_presentation_type_weekly;
+    EXECUTE format(vle_rollup_sql(), 'SELECT enrollment_id, vle_id, activity_date, clicks, 1 AS sign FROM student_vle_activity');
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT rebuild_vle_rollups();
+
+-- 4) Total klik kini dibaca langsung dari vle_enrollment_total (selalu segar),
+--    materialized view lamanya tidak diperlukan lagi
+DROP MATERIALIZED VIEW mv_enrollment_total_clicks;
+DROP TABLE student_vle_activity_old;
+DELETE FROM summary_refresh WHERE view_name = 'mv_enrollment_total_clicks';
+
+CREATE OR REPLACE FUNCTION refresh_summaries() RETURNS void AS $$
+BEGIN
+    REFRESH MATERIALIZED VIEW CONCURRENTLY mv_enrollment_final_score;
+    REFRESH MATERIALIZED VIEW CONCURRENTLY mv_module_student_counts;
+    INSERT INTO summary_refresh (view_name, refreshed_at)
+    SELECT v, now()
+    FROM unnest(ARRAY['mv_enrollment_final_score', 'mv_module_student_counts']) AS v
+    ON CONFLICT (view_name) DO UPDATE SET refreshed_at = EXCLUDED.refreshed_at;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMIT;
+
+ANALYZE student_vle_activity, vle_enrollment_total, vle_enrollment_daily, vle_enrollment_weekly,
+        vle_presentation_type_daily, vle_presentation_type_weekly;
@@ -0,0 +1,104 @@
+-- ==================================================
+-- FITUR ENGAGEMENT per enrollment (mv_enrollment_engagement)
+-- Jalankan setelah 003. Dihitung sekali untuk semua enrollment dari rollup
+-- klik (003) dan satu pass agregasi student_vle_activity per vle_type, lalu
+-- dibaca dashboard sebagai lookup per enrollment. Diperbarui oleh
+-- refresh_summaries().
+-- ==================================================
+BEGIN;
+
+CREATE MATERIALIZED VIEW mv_enrollment_engagement AS
+WITH daily AS (
+    SELECT enrollment_id, activity_date, clicks
+    FROM vle_enrollment_daily
+    WHERE clicks > 0
+),
+days AS (
+    SELECT enrollment_id, COUNT(*) AS active_days,
+           MIN(activity_date) AS first_activity, MAX(activity_date) AS last_activity
+    FROM daily
+    GROUP BY enrollment_id
+),
+-- Streak: hari aktif berturut-turut. Tanggal dikurangi nomor urutnya bernilai
+-- sama untuk satu rangkaian hari tanpa jeda (gaps and islands)
+streaks AS (
+    SELECT enrollment_id, MAX(len) AS max_streak_days
+    FROM (
+        SELECT enrollment_id, island, COUNT(*) AS len
+        FROM (
+            SELECT enrollment_id,
+                   activity_date - (ROW_NUMBER() OVER (PARTITION BY enrollment_id ORDER BY activity_date))::int AS island
+            FROM daily
+        ) d
+        GROUP BY enrollment_id, island
+    ) s
+    GROUP BY enrollment_id
+),
+weeks AS (
+    SELECT enrollment_id, COUNT(*) AS active_weeks, MAX(clicks) AS peak_week_clicks
+    FROM vle_enrollment_weekly
+    WHERE clicks > 0
+    GROUP BY enrollment_id
+),
+types AS (
+    SELECT enrollment_id,
+           jsonb_object_agg(vle_type, ROUND(clicks::numeric / NULLIF(total, 0), 4)) AS type_share,
+           (ARRAY_AGG(vle_type ORDER BY clicks DESC, vle_type))[1] AS top_vle_type
+    FROM (
+        SELECT sva.enrollment_id, v.vle_type, SUM(sva.clicks) AS clicks,
+               SUM(SUM(sva.clicks)) OVER (PARTITION BY sva.enrollment_id) AS total
+        FROM student_vle_activity sva
+          JOIN vle_item v ON v.vle_id = sva.vle_id
+        GROUP BY sva.enrollment_id, v.vle_type
+    ) t
+    GROUP BY enrollment_id
+),
+-- Tanggal aktivitas terakhir yang tercatat di tiap presentation: acuan
+-- days_since_last (data OULAD historis, jadi bukan now())
+presentation_end AS (
+    SELECT e.presentation_id, MAX(d.last_activity) AS last_date
+    FROM days d
+      JOIN enrollment e ON e.enrollment_id = d.enrollment_id
+    GROUP BY e.presentation_id
+)
+SELECT e.enrollment_id,
+       e.presentation_id,
+       COALESCE(t.clicks, 0) AS total_clicks,
+       COALESCE(d.active_days, 0) AS active_days,
+       COALESCE(w.active_weeks, 0) AS active_weeks,
+       -- sama dengan "Engagement / Minggu" di dashboard: klik / (hari aktif // 7)
+       ROUND(COALESCE(t.clicks, 0)::numeric / GREATEST(1, COALESCE(d.active_days, 0) / 7), 2) AS clicks_per_week,
+       COALESCE(w.peak_week_clicks, 0) AS peak_week_clicks,
+       COALESCE(s.max_streak_days, 0) AS max_streak_days,
+       d.first_activity,
+       d.last_activity,
+       pe.last_date - d.last_activity AS days_since_last,
+       ty.top_vle_type,
+       COALESCE(ty.type_share, '{}'::jsonb) AS type_share
+FROM enrollment e
+  LEFT JOIN vle_enrollment_total t ON t.enrollment_id = e.enrollment_id
+  LEFT JOIN days d ON d.enrollment_id = e.enrollment_id
+  LEFT JOIN weeks w ON w.enrollment_id = e.enrollment_id
+  LEFT JOIN streaks s ON s.enrollment_id = e.enrollment_id
+  LEFT JOIN types ty ON ty.enrollment_id = e.enrollment_id
+  LEFT JOIN presentation_end pe ON pe.presentation_id = e.presentation_id;
+
+CREATE UNIQUE INDEX mv_enrollment_engagement_pk ON mv_enrollment_engagement (enrollment_id);
+CREATE INDEX mv_enrollment_engagement_presentation ON mv_enrollment_engagement (presentation_id);
+
+INSERT INTO summary_refresh (view_name, refreshed_at) VALUES ('mv_enrollment_engagement', now())
+ON CONFLICT (view_name) DO UPDATE SET refreshed_at = EXCLUDED.refreshed_at;
+
+CREATE OR REPLACE FUNCTION refresh_summaries() RETURNS void AS $$
+BEGIN
+    REFRESH MATERIALIZED VIEW CONCURRENTLY mv_enrollment_final_score;
+    REFRESH MATERIALIZED VIEW CONCURRENTLY mv_module_student_counts;
+    REFRESH MATERIALIZED VIEW CONCURRENTLY mv_enrollment_engagement;
+    INSERT INTO summary_refresh (view_name, refreshed_at)
+    SELECT v, now()
+    FROM unnest(ARRAY['mv_enrollment_final_score', 'mv_module_student_counts', 'mv_enrollment_engagement']) AS v
+    ON CONFLICT (view_name) DO UPDATE SET refreshed_at = EXCLUDED.refreshed_at;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMIT;
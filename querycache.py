@@ -0,0 +1,267 @@
+"""Query result cache shared across processes.
+
+config.get_df stores results here keyed by query text + params, so every
+Streamlit replica on the host (SQLite backend) or in the deployment (Redis
+backend) reuses warm results instead of re-running the same query.
+
+Select the backend with QUERY_CACHE_URL:
+    sqlite:///query-cache.db        file store (relative path; sqlite:////abs/path
+                                    for absolute), memory-mapped, LRU by bytes
+    redis://localhost:6379/0        any Redis-protocol server (Redis, Valkey, ...)
+Unset disables the cache.
+
+Entries are pickled DataFrames and are unpickled on read, so whoever can
+write to the cache can run code in the app: the Redis server (and the
+SQLite file) must only be writable by the dashboard's own processes. Use a
+private Redis instance or database with AUTH/ACLs, never a shared one.
+
+A failing backend (Redis down, SQLite "database is locked") never fails a
+query: lookup()/store() log the error and get_df goes to the database. A
+backend that cannot be opened at all (unsupported URL, redis:// without the
+redis package) is logged once and the cache stays off for the process.
+"""
+import hashlib
+import logging
+import os
+import pickle
+import re
+import sqlite3
+import threading
+import time
+
+try:
+    import redis
+except Exception:  # redis client is optional
+    redis = None
+
+log = logging.getLogger(__name__)
+
+QUERY_CACHE_URL = os.environ.get("QUERY_CACHE_URL")
+QUERY_CACHE_TTL = int(os.environ.get("QUERY_CACHE_TTL", 300))
+QUERY_CACHE_MAX_BYTES = int(os.environ.get("QUERY_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+# Hits only note their access time in memory; it is written to SQLite (for
+# LRU eviction) at most this often, or with the next set()
+QUERY_CACHE_TOUCH_SECONDS = float(os.environ.get("QUERY_CACHE_TOUCH_SECONDS", 30))
+
+_TABLE_RE = re.compile(r"\b(?:from|join)\s+([a-z_][a-z0-9_]*)", re.IGNORECASE)
+
+
+def make_key(query, params=None):
+    text = " ".join(query.split()) + "|" + repr(params)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def tables_of(query):
+    return sorted({t.lower() for t in _TABLE_RE.findall(query)})
+
+
+class SQLiteCache:
+
+    def __init__(self, path, max_bytes=QUERY_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._touched = {}      # key -> last access not yet written
+        self._touch_lock = threading.Lock()
+        self._flushed_at = time.time()
+        with self._conn() as db:
+            db.executescript("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    value BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    expires_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access);
+                CREATE TABLE IF NOT EXISTS entry_tables (
+                    key TEXT NOT NULL,
+                    table_name TEXT NOT NULL,
+                    PRIMARY KEY (table_name, key)
+                );
+            """)
+
+    def _conn(self):
+        # sqlite3 connections are per thread; WAL lets processes read while one writes
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute(f"PRAGMA mmap_size={self.max_bytes}")
+            self._local.db = db
+        return db
+
+    def get(self, key):
+        db = self._conn()
+        now = time.time()
+        row = db.execute("SELECT value FROM entries WHERE key = ? AND expires_at > ?", (key, now)).fetchone()
+        if row is None:
+            return None
+        # A write per hit would take the WAL writer lock and serialize readers
+        # across processes; access times are batched instead
+        with self._touch_lock:
+            self._touched[key] = now
+            due = now - self._flushed_at >= QUERY_CACHE_TOUCH_SECONDS
+        if due:
+            try:
+                db.execute("BEGIN IMMEDIATE")
+                self._flush_touched(db)
+                db.execute("COMMIT")
+            except sqlite3.OperationalError:
+                # Busy: the next set() or flush writes them
+                if db.in_transaction:
+                    db.execute("ROLLBACK")
+        return pickle.loads(row[0])
+
+    def _flush_touched(self, db):
+        # Inside a write transaction
+        with self._touch_lock:
+            touched, self._touched = self._touched, {}
+            self._flushed_at = time.time()
+        db.executemany("UPDATE entries SET last_access = ? WHERE key = ?",
+                       [(t, k) for k, t in touched.items()])
+
+    def set(self, key, value, tables=(), ttl=QUERY_CACHE_TTL):
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(blob) > self.max_bytes:
+            return
+        now = time.time()
+        db = self._conn()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, expires_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, blob, len(blob), now + ttl, now),
+            )
+            db.executemany("INSERT OR IGNORE INTO entry_tables (table_name, key) VALUES (?, ?)",
+                           [(t, key) for t in tables])
+            self._flush_touched(db)
+            self._evict(db, now)
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+
+    def _evict(self, db, now):
+        db.execute("DELETE FROM entries WHERE expires_at <= ?", (now,))
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total > self.max_bytes:
+            # Least recently used first until we are back under the bound
+            for key, size in db.execute("SELECT key, size FROM entries ORDER BY last_access").fetchall():
+                db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                total -= size
+                if total <= self.max_bytes:
+                    break
+        db.execute("DELETE FROM entry_tables WHERE key NOT IN (SELECT key FROM entries)")
+
+    def invalidate_tables(self, tables):
+        db = self._conn()
+        marks = ",".join("?" * len(tables))
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.execute(f"DELETE FROM entries WHERE key IN (SELECT key FROM entry_tables WHERE table_name IN ({marks}))", tables)
+            db.execute(f"DELETE FROM entry_tables WHERE table_name IN ({marks})", tables)
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+
+    def clear(self):
+        db = self._conn()
+        db.execute("DELETE FROM entries")
+        db.execute("DELETE FROM entry_tables")
+
+
+class RedisCache:
+    # Size bound and LRU come from the server: run it with
+    # maxmemory <bytes> and maxmemory-policy allkeys-lru.
+
+    def __init__(self, url, max_bytes=QUERY_CACHE_MAX_BYTES, prefix="vle:qc:"):
+        if redis is None:
+            raise RuntimeError("QUERY_CACHE_URL is a redis:// URL but the redis package is not installed")
+        self.client = redis.Redis.from_url(url)
+        self.max_bytes = max_bytes
+        self.prefix = prefix
+
+    def get(self, key):
+        blob = self.client.get(self.prefix + key)
+        return pickle.loads(blob) if blob is not None else None
+
+    def set(self, key, value, tables=(), ttl=QUERY_CACHE_TTL):
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(blob) > self.max_bytes:
+            return
+        pipe = self.client.pipeline()
+        pipe.set(self.prefix + key, blob, ex=ttl)
+        for t in tables:
+            pipe.sadd(f"{self.prefix}table:{t}", key)
+            pipe.expire(f"{self.prefix}table:{t}", ttl * 2)
+        pipe.execute()
+
+    def invalidate_tables(self, tables):
+        for t in tables:
+            tkey = f"{self.prefix}table:{t}"
+            keys = self.client.smembers(tkey)
+            pipe = self.client.pipeline()
+            for k in keys:
+                pipe.delete(self.prefix + k.decode())
+            pipe.delete(tkey)
+            pipe.execute()
+
+    def clear(self):
+        for k in self.client.scan_iter(self.prefix + "*"):
+            self.client.delete(k)
+
+
+_backend = None
+_backend_failed = False
+_backend_lock = threading.Lock()
+
+
+def lookup(key):
+    # Cached frame, or None on a miss, when disabled, or when the backend fails
+    cache = backend()
+    if cache is None:
+        return None
+    try:
+        return cache.get(key)
+    except Exception as e:
+        log.warning("query cache read failed, using the database: %s", e)
+        return None
+
+
+def store(key, df, tables=()):
+    cache = backend()
+    if cache is None:
+        return
+    try:
+        cache.set(key, df, tables)
+    except Exception as e:
+        log.warning("query cache write failed: %s", e)
+
+
+def _open():
+    if QUERY_CACHE_URL.startswith("sqlite:///"):
+        return SQLiteCache(QUERY_CACHE_URL[len("sqlite:///"):])
+    if QUERY_CACHE_URL.startswith(("redis://", "rediss://", "unix://")):
+        return RedisCache(QUERY_CACHE_URL)
+    raise ValueError(f"unsupported QUERY_CACHE_URL: {QUERY_CACHE_URL}")
+
+
+def backend():
+    # The configured cache, or None when QUERY_CACHE_URL is unset or the
+    # backend cannot be opened (bad URL, missing redis package, unwritable
+    # file); that is logged once and the process runs without the cache
+    global _backend, _backend_failed
+    if not QUERY_CACHE_URL or _backend_failed:
+        return None
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None and not _backend_failed:
+                try:
+                    _backend = _open()
+                except Exception as e:
+                    _backend_failed = True
+                    log.warning("query cache disabled, QUERY_CACHE_URL=%s: %s", QUERY_CACHE_URL, e)
+    return _backend
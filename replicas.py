@@ -0,0 +1,179 @@
+"""Read-replica routing for config.get_df.
+
+With DB_REPLICA_URLS set (comma separated DSNs), read queries are sent to a
+replica picked round-robin or by lowest measured latency
+(DB_REPLICA_STRATEGY=round_robin|least_latency). A background thread checks
+every replica each DB_REPLICA_CHECK_SECONDS; replicas that are unreachable or
+whose replication lag exceeds DB_REPLICA_MAX_LAG seconds are skipped, and when
+none is usable the query goes to the primary (DB_URL). Writes and
+consistency-sensitive reads pass primary=True to get_df.
+
+Try it with two local Postgres instances holding the same data:
+
+    $env:DATABASE_URL="postgresql://postgres@localhost:5432/tubes"
+    $env:DB_REPLICA_URLS="postgresql://postgres@localhost:5433/tubes"
+    python replicas.py status
+    python replicas.py route --queries 100
+"""
+import argparse
+import itertools
+import logging
+import os
+import threading
+import time
+from collections import Counter
+
+import psycopg
+from psycopg.conninfo import conninfo_to_dict
+from psycopg_pool import PoolTimeout
+
+import metrics
+
+log = logging.getLogger(__name__)
+
+REPLICA_URLS = [u.strip() for u in os.environ.get("DB_REPLICA_URLS", "").split(",") if u.strip()]
+REPLICA_STRATEGY = os.environ.get("DB_REPLICA_STRATEGY", "round_robin")
+REPLICA_MAX_LAG = float(os.environ.get("DB_REPLICA_MAX_LAG", 30))
+REPLICA_CHECK_SECONDS = float(os.environ.get("DB_REPLICA_CHECK_SECONDS", 5))
+
+# Replay lag in seconds; 0 when the standby has replayed everything it
+# received (an idle primary would otherwise look like growing lag), and 0 on
+# a server that is not in recovery at all. NULL when the WAL receiver is not
+# streaming: received and replayed LSNs then freeze at the same value and
+# would report 0 forever. Reading pg_stat_wal_receiver.status needs
+# pg_read_all_stats (or pg_monitor) for the checking role.
+LAG_QUERY = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() THEN 0
+    WHEN NOT EXISTS (SELECT 1 FROM pg_stat_wal_receiver WHERE status = 'streaming') THEN NULL
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+END
+"""
+
+
+def describe(dsn):
+    # host:port/dbname, without credentials, for logs and the debug panel
+    info = conninfo_to_dict(dsn)
+    return f"{info.get('host', 'localhost')}:{info.get('port', 5432)}/{info.get('dbname', '')}"
+
+
+class Replica:
+
+    def __init__(self, dsn, pool):
+        self.dsn = dsn
+        self.pool = pool
+        self.name = describe(dsn)
+        self.healthy = False
+        self.lag = None
+        self.latency = None     # EWMA of the health-check round trip, seconds
+        self.error = None
+        self.checked_at = None
+        self.served = 0
+
+
+class ReplicaRouter:
+
+    def __init__(self, dsns, make_pool, strategy=REPLICA_STRATEGY, max_lag=REPLICA_MAX_LAG,
+                 check_seconds=REPLICA_CHECK_SECONDS):
+        self.replicas = [Replica(dsn, make_pool(dsn)) for dsn in dsns]
+        self.strategy = strategy
+        self.max_lag = max_lag
+        self.check_seconds = check_seconds
+        self.primary_fallbacks = 0
+        self._rr = itertools.count()
+        self._lock = threading.Lock()
+        self._checker = None
+
+    def check(self):
+        for r in self.replicas:
+            started = time.perf_counter()
+            try:
+                if r.pool.closed:
+                    r.pool.open()
+                with r.pool.connection() as conn:
+                    lag = conn.execute(LAG_QUERY).fetchone()[0]
+                elapsed = time.perf_counter() - started
+                r.latency = elapsed if r.latency is None else 0.8 * r.latency + 0.2 * elapsed
+                if lag is None:
+                    r.healthy, r.lag, r.error = False, None, "WAL receiver not streaming"
+                    log.warning("replica %s has no streaming WAL receiver, using others/primary", r.name)
+                else:
+                    r.lag, r.error = float(lag), None
+                    r.healthy = r.lag <= self.max_lag
+                    if not r.healthy:
+                        log.warning("replica %s lags %.1fs (max %.0fs), using others/primary",
+                                    r.name, r.lag, self.max_lag)
+            except (psycopg.Error, PoolTimeout) as e:
+                r.healthy, r.error = False, str(e)
+                log.warning("replica %s unavailable: %s", r.name, e)
+            r.checked_at = time.time()
+            metrics.set_gauge("vle_replica_healthy", {"replica": r.name}, int(r.healthy),
+                              "1 if the replica is used for reads")
+            if r.lag is not None:
+                metrics.set_gauge("vle_replica_lag_seconds", {"replica": r.name}, r.lag, "Replication replay lag")
+
+    def _check_loop(self):
+        while True:
+            try:
+                self.check()
+            except Exception:
+                log.exception("replica check failed")
+            time.sleep(self.check_seconds)
+
+    def _ensure_checker(self):
+        # Started on first use; until the first check completes reads go to
+        # the primary, so startup never waits on replica connections
+        if self._checker is None:
+            with self._lock:
+                if self._checker is None:
+                    self._checker = threading.Thread(target=self._check_loop, name="replica-check", daemon=True)
+                    self._checker.start()
+
+    def pick(self):
+        # A healthy replica, or None for the primary
+        if not self.replicas:
+            return None
+        self._ensure_checker()
+        healthy = [r for r in self.replicas if r.healthy]
+        if not healthy:
+            self.primary_fallbacks += 1
+            return None
+        if self.strategy == "least_latency":
+            replica = min(healthy, key=lambda r: r.latency)
+        else:
+            replica = healthy[next(self._rr) % len(healthy)]
+        replica.served += 1
+        return replica
+
+    def mark_failed(self, replica, error):
+        # Out of rotation until the next successful check
+        replica.healthy, replica.error = False, str(error)
+        log.warning("replica %s failed a query, falling back to primary: %s", replica.name, error)
+
+    def status(self):
+        return [{"replica": r.name, "healthy": r.healthy, "lag_seconds": r.lag,
+                 "latency_ms": round(r.latency * 1000, 1) if r.latency is not None else None,
+                 "served": r.served, "checked_at": r.checked_at, "error": r.error}
+                for r in self.replicas]
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Inspect read-replica routing")
+    ap.add_argument("command", choices=["status", "route"])
+    ap.add_argument("--queries", type=int, default=100, help="reads to route (route command)")
+    args = ap.parse_args()
+
+    import config
+
+    config.router.check()
+    for row in config.router.status():
+        print(row)
+    if args.command == "route":
+        ports = Counter()
+        for _ in range(args.queries):
+            df = config._query("SELECT inet_server_port() AS port")
+            ports[int(df["port"].iloc[0])] += 1
+        print(f"primary fallbacks: {config.router.primary_fallbacks}")
+        for port, n in sorted(ports.items()):
+            print(f"port {port}: {n} queries")
@@ -0,0 +1,152 @@
+"""Local Arrow snapshot of the dashboard datasets.
+
+When SNAPSHOT_DIR is set, the bootstrap and whole-table fetch_* functions in
+config.py are served from Arrow IPC files on local disk (memory-mapped, no
+network round trip). `export()` writes a new versioned snapshot directory and
+swaps the CURRENT pointer atomically, so readers never see a half-written set.
+
+    python snapshot.py export            # one-off export
+    python snapshot.py export --dir /data/snap
+"""
+import argparse
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.ipc as ipc
+
+log = logging.getLogger(__name__)
+
+SNAPSHOT_DIR = os.environ.get("SNAPSHOT_DIR")
+SNAPSHOT_REFRESH_SECONDS = float(os.environ.get("SNAPSHOT_REFRESH_SECONDS", 900))
+SNAPSHOT_KEEP = 2
+
+# snapshot dataset -> fetch_* function in config.py that produces it
+DATASETS = {
+    "students": "fetch_students",
+    "instructors": "fetch_instructors",
+    "presentations": "fetch_presentations",
+    "enrollments_all": "fetch_enrollments_all",
+    "final_scores_all": "fetch_final_scores_all",
+    "total_clicks_all": "fetch_total_clicks_all",
+    "students_by_module_counts": "fetch_students_by_module_counts",
+}
+
+_local = threading.local()
+_lock = threading.Lock()
+_frames = {}  # dataset -> (path, DataFrame) of the last load
+_refresher = None
+
+
+def enabled():
+    return bool(SNAPSHOT_DIR) and not getattr(_local, "bypass", False)
+
+
+def current_dir(root=None):
+    root = Path(root or SNAPSHOT_DIR)
+    try:
+        version = (root / "CURRENT").read_text().strip()
+    except FileNotFoundError:
+        return None
+    return root / version
+
+
+def load(name):
+    # Returns the dataset as a DataFrame, or None when snapshot mode is off or
+    # the dataset has not been exported yet (callers then query Postgres).
+    if not enabled():
+        return None
+    snap = current_dir()
+    if snap is None:
+        return None
+    path = snap / f"{name}.arrow"
+    cached = _frames.get(name)
+    if cached is not None and cached[0] == path:
+        return cached[1].copy(deep=False)
+    if not path.exists():
+        return None
+    # Memory-mapped read: Arrow buffers point straight into the page cache
+    table = ipc.open_file(pa.memory_map(str(path), "r")).read_all()
+    df = table.to_pandas(split_blocks=True)
+    _frames[name] = (path, df)
+    return df.copy(deep=False)
+
+
+def export(target=None):
+    import config
+
+    root = Path(target or SNAPSHOT_DIR or "snapshot")
+    root.mkdir(parents=True, exist_ok=True)
+    version = time.strftime("%Y%m%dT%H%M%S") + "-" + uuid.uuid4().hex[:6]
+    tmp = root / f".tmp-{version}"
+    tmp.mkdir()
+    started = time.perf_counter()
+    _local.bypass = True
+    try:
+        for name, fn in DATASETS.items():
+            df = getattr(config, fn)()
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            with pa.OSFile(str(tmp / f"{name}.arrow"), "wb") as sink:
+                with ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+    except Exception:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    finally:
+        _local.bypass = False
+
+    os.rename(tmp, root / version)
+    pointer = root / "CURRENT.tmp"
+    pointer.write_text(version)
+    os.replace(pointer, root / "CURRENT")
+    _prune(root)
+    log.info("snapshot %s exported in %.2fs", version, time.perf_counter() - started)
+    return root / version
+
+
+def _prune(root):
+    versions = sorted(p for p in root.iterdir() if p.is_dir() and not p.name.startswith("."))
+    for old in versions[:-SNAPSHOT_KEEP]:
+        # Open memory maps stay valid after unlink on POSIX
+        shutil.rmtree(old, ignore_errors=True)
+
+
+def _refresh_loop(interval):
+    while True:
+        time.sleep(interval)
+        try:
+            export()
+        except Exception:
+            log.exception("snapshot refresh failed; keeping previous snapshot")
+
+
+def start_refresher(interval=None):
+    # Background job that re-exports the snapshot every `interval` seconds.
+    global _refresher
+    with _lock:
+        if _refresher is not None and _refresher.is_alive():
+            return _refresher
+        if current_dir() is None:
+            export()
+        _refresher = threading.Thread(
+            target=_refresh_loop,
+            args=(interval or SNAPSHOT_REFRESH_SECONDS,),
+            name="snapshot-refresh",
+            daemon=True,
+        )
+        _refresher.start()
+        return _refresher
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Export the dashboard snapshot")
+    ap.add_argument("command", choices=["export"])
+    ap.add_argument("--dir", default=None, help="snapshot root (default: $SNAPSHOT_DIR or ./snapshot)")
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    print(export(args.dir))
@@ -0,0 +1,47 @@
+"""The Classes page frames through config_async, in non-snapshot mode.
+
+Needs a Postgres loaded with db.sql + migrations/ (e.g. via gen_data.py):
+
+    $env:TEST_DATABASE_URL="postgresql://postgres@localhost/tubes"
+    python -m pytest -q test_class_page.py
+"""
+import os
+
+import pytest
+
+DSN = os.environ.get("TEST_DATABASE_URL")
+pytestmark = pytest.mark.skipif(not DSN, reason="set TEST_DATABASE_URL to a loaded test database")
+
+if DSN:
+    os.environ["DATABASE_URL"] = DSN
+    os.environ.pop("SNAPSHOT_DIR", None)
+    os.environ.pop("QUERY_CACHE_URL", None)
+    import config
+    import config_async
+
+
+@pytest.fixture(scope="module")
+def pres_id():
+    df = config.fetch_presentations()
+    if df.empty:
+        pytest.skip("no presentations in the test database")
+    return int(df["presentation_id"].iloc[0])
+
+
+def test_class_page_frames_match_sync_fetches(pres_id):
+    # Same request as app.c_fetch_class_page
+    frames = config_async.gather_frames({name: (fn, pres_id) for name, fn in config.CLASS_PAGE_FETCHES.items()})
+    assert set(frames) == set(config.CLASS_PAGE_FETCHES)
+    for name, fn in config.CLASS_PAGE_FETCHES.items():
+        assert list(frames[name].columns) == list(fn(pres_id).columns), name
+    for name in ("score_hist", "final_hist"):
+        assert list(frames[name].columns) == ["bucket", "bin_start", "bin_end", "cnt"]
+        assert len(frames[name]) == 20
+
+
+def test_afetch_rejects_unmarked_reshaping_fetch():
+    def reshaped(presentation_id):
+        return config.fetch_assessments(presentation_id).rename(columns={"weight": "w"})
+
+    with pytest.raises(ValueError, match="post-processes"):
+        config_async.gather_frames({"x": (reshaped, 1)})
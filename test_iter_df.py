@@ -0,0 +1,39 @@
+"""iter_df chunks keep the same dtypes, so concatenating them keeps those.
+
+Needs no database: the casts come from the result schema alone.
+
+    python -m pytest -q test_iter_df.py
+"""
+from datetime import date
+from decimal import Decimal
+
+import pandas as pd
+
+import config
+
+# (name, type oid) as in cursor.description: int4, int2, int8, text, date, numeric
+COLUMNS = [("enrollment_id", 23), ("studied_credits", 21), ("total", 20), ("final_result", 25),
+           ("activity_date", 1082), ("avg_score", 1700)]
+
+
+def chunk(rows):
+    return pd.DataFrame.from_records(rows, columns=[name for name, _ in COLUMNS])
+
+
+def test_chunks_with_different_strings_concatenate_with_stable_dtypes():
+    cast = config.stream_dtypes(COLUMNS)
+    first = cast(chunk([(1, 60, 10, "Pass", date(2013, 10, 1), Decimal("71.5")),
+                        (2, 30, 20, "Fail", date(2013, 10, 2), Decimal("40.0"))]))
+    # Other strings, a NULL int and a NULL numeric in the second chunk
+    second = cast(chunk([(3, None, 30, "Withdrawn", date(2013, 10, 3), None),
+                         (4, 120, 40, "Distinction", None, Decimal("90.25"))]))
+
+    assert dict(first.dtypes) == dict(second.dtypes)
+    df = pd.concat([first, second], ignore_index=True)
+    assert dict(df.dtypes) == dict(first.dtypes)
+    assert str(df["enrollment_id"].dtype) == "Int32"
+    assert str(df["studied_credits"].dtype) == "Int16"
+    assert df["activity_date"].dtype == "datetime64[ns]"
+    assert df["avg_score"].dtype == "float64"
+    assert df["final_result"].tolist() == ["Pass", "Fail", "Withdrawn", "Distinction"]
+    assert df["studied_credits"].isna().tolist() == [False, False, True, False]
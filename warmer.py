@@ -0,0 +1,139 @@
+"""Background cache warmer for the Classes page.
+
+app.py records every class a user opens (record_view). A daemon thread then
+runs every WARM_INTERVAL_SECONDS and fills the caches behind the c_fetch_*
+wrappers for two groups of classes: the WARM_TOP_N most viewed ones (views
+decay with a half-life of WARM_HALF_LIFE_SECONDS) and those of the current
+semester. The first run happens at startup.
+
+The cached wrappers key their entries by cache window (CACHE_TTL seconds).
+Shortly before a window rolls over, the warmer also computes the next
+window's entries (refresh-ahead), so hot classes never go cold on expiry.
+
+With WARM_ACCESS_FILE set, view counts are saved there after every run and
+loaded at startup, so a fresh deploy warms the classes that were hot before
+it. WARM_CACHE=0 disables the warmer.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+import metrics
+
+log = logging.getLogger(__name__)
+
+WARM_CACHE = os.environ.get("WARM_CACHE", "1") != "0"
+WARM_INTERVAL_SECONDS = float(os.environ.get("WARM_INTERVAL_SECONDS", 60))
+WARM_TOP_N = int(os.environ.get("WARM_TOP_N", 10))
+WARM_HALF_LIFE_SECONDS = float(os.environ.get("WARM_HALF_LIFE_SECONDS", 86400))
+WARM_ACCESS_FILE = os.environ.get("WARM_ACCESS_FILE")
+
+_lock = threading.Lock()
+_views = {}  # presentation_id -> (decayed view score, last view time)
+_status = {"runs": 0, "last_run": None, "last_seconds": None, "warmed": [], "ahead": False,
+           "errors": 0, "last_error": None}
+_thread = None
+
+
+def _decay(score, age):
+    return score * 0.5 ** (max(age, 0) / WARM_HALF_LIFE_SECONDS)
+
+
+def record_view(presentation_id):
+    now = time.time()
+    pid = int(presentation_id)
+    with _lock:
+        score, last = _views.get(pid, (0.0, now))
+        _views[pid] = (_decay(score, now - last) + 1, now)
+
+
+def hot_presentations(n=WARM_TOP_N):
+    now = time.time()
+    with _lock:
+        scored = sorted(((_decay(score, now - last), pid) for pid, (score, last) in _views.items()), reverse=True)
+    return [pid for _, pid in scored[:n]]
+
+
+def _load():
+    if not WARM_ACCESS_FILE or not Path(WARM_ACCESS_FILE).exists():
+        return
+    try:
+        data = json.loads(Path(WARM_ACCESS_FILE).read_text())
+    except (OSError, ValueError) as e:
+        log.warning("ignoring unreadable %s: %s", WARM_ACCESS_FILE, e)
+        return
+    with _lock:
+        for pid, (score, last) in data.items():
+            _views.setdefault(int(pid), (float(score), float(last)))
+
+
+def _save():
+    if not WARM_ACCESS_FILE:
+        return
+    with _lock:
+        data = {str(pid): list(v) for pid, v in _views.items()}
+    tmp = Path(f"{WARM_ACCESS_FILE}.tmp")
+    try:
+        tmp.write_text(json.dumps(data))
+        os.replace(tmp, WARM_ACCESS_FILE)
+    except OSError as e:
+        log.warning("could not save %s: %s", WARM_ACCESS_FILE, e)
+
+
+def run_once(warm, current, ttl, interval=WARM_INTERVAL_SECONDS):
+    # warm(presentation_ids, ahead): fill the caches as they will be keyed
+    # `ahead` seconds from now; current(): presentation ids of the current semester
+    started = time.time()
+    try:
+        pids = list(dict.fromkeys([*hot_presentations(), *current()]))
+        warm(pids, 0)
+        # The next run may start after the window rolls over: fill the next
+        # window now (a second pass over it is all cache hits)
+        until_next = ttl - time.time() % ttl
+        ahead = until_next <= 2 * interval
+        if ahead:
+            warm(pids, until_next + 1)
+        with _lock:
+            _status.update(warmed=pids, ahead=ahead)
+    except Exception as e:
+        log.exception("cache warm-up failed")
+        with _lock:
+            _status["errors"] += 1
+            _status["last_error"] = str(e)
+    with _lock:
+        _status["runs"] += 1
+        _status["last_run"] = started
+        _status["last_seconds"] = round(time.time() - started, 3)
+        seconds, warmed = _status["last_seconds"], len(_status["warmed"])
+    metrics.set_gauge("vle_cache_warm_seconds", {}, seconds, "Duration of the last cache warmer run")
+    metrics.set_gauge("vle_cache_warm_presentations", {}, warmed, "Classes warmed by the last run")
+    _save()
+
+
+def _loop(warm, current, ttl, interval):
+    while True:
+        run_once(warm, current, ttl, interval)
+        time.sleep(interval)
+
+
+def start(warm, current, ttl, interval=WARM_INTERVAL_SECONDS):
+    # One warmer thread per process; the first run starts immediately
+    global _thread
+    with _lock:
+        if _thread is not None and _thread.is_alive():
+            return _thread
+    _load()
+    with _lock:
+        _thread = threading.Thread(target=_loop, args=(warm, current, ttl, interval),
+                                   name="cache-warmer", daemon=True)
+        _thread.start()
+        return _thread
+
+
+def status():
+    hot = hot_presentations()
+    with _lock:
+        return {**_status, "hot": hot, "running": _thread is not None and _thread.is_alive()}